@@ -0,0 +1,120 @@
+"""
+Recall vs latency of the embedding backends (torch, onnx, onnx-int8) on the bare_act.pdf corpus.
+
+The PDF is chunked exactly as ingestion does it; each backend then encodes every chunk and a
+set of queries, and retrieval is an exact cosine top-k over the chunk matrix, so only the
+encoder differs between rows. Queries are provision titles ("Dishonour of cheque for
+insufficiency, etc. of funds in the account"), and a hit counts as relevant when its chunk
+belongs to that provision. Reported per backend:
+  load_s            model load time
+  corpus_chunks_s   bulk encoding throughput (ingestion path)
+  query_p50/p95_ms  single-query encoding latency (request path)
+  recall@k          share of queries with a chunk of the right provision in the top k
+  overlap@k         mean share of the torch top k that the backend also returns
+
+    cd backend && python benchmarks/embedding_backends.py [--backends torch,onnx,onnx-int8] [--threads N] [--json out.json]
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import chunking  # noqa: E402
+import embeddings  # noqa: E402
+import ingestion  # noqa: E402
+
+DEFAULT_PDF = Path(__file__).resolve().parent.parent / "bare_act.pdf"
+
+
+def load_corpus(pdf: Path):
+    chunks = list(chunking.iter_structured_chunks(ingestion.iter_page_texts(pdf, workers=1)))
+    texts = [c["text"] for c in chunks]
+    # One query per titled provision; its relevant set is every chunk covering that provision
+    queries: Dict[str, set] = {}
+    for i, c in enumerate(chunks):
+        for section in filter(None, c["sections"].split(",")):
+            if c["title"] and section == c["section"]:
+                queries.setdefault(c["title"].rstrip(".—- "), set()).add(i)
+    return texts, list(queries.items())
+
+
+def _top_k(matrix: np.ndarray, q: np.ndarray, k: int) -> List[int]:
+    scores = matrix @ q
+    idx = np.argpartition(-scores, min(k, len(scores) - 1))[:k]
+    return idx[np.argsort(-scores[idx])].tolist()
+
+
+def run_backend(name: str, texts: List[str], queries, k: int, threads: int, batch_size: int) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    model = embeddings.load_embedder("all-MiniLM-L6-v2", name, threads)
+    load_s = time.perf_counter() - t0
+    model.encode(["warm-up"], convert_to_numpy=True)
+
+    t0 = time.perf_counter()
+    matrix = model.encode(texts, batch_size=batch_size, convert_to_numpy=True, normalize_embeddings=True)
+    corpus_s = time.perf_counter() - t0
+
+    latencies, results = [], []
+    for title, _ in queries:
+        t0 = time.perf_counter()
+        q = model.encode([title], convert_to_numpy=True, normalize_embeddings=True)[0]
+        latencies.append((time.perf_counter() - t0) * 1000)
+        results.append(_top_k(matrix, q, k))
+    latencies.sort()
+    return {
+        "backend": name,
+        "load_s": round(load_s, 3),
+        "corpus_chunks_s": round(len(texts) / corpus_s, 1),
+        "query_p50_ms": round(statistics.median(latencies), 2),
+        "query_p95_ms": round(latencies[int(0.95 * (len(latencies) - 1))], 2),
+        f"recall@{k}": round(sum(bool(set(r) & rel) for r, (_, rel) in zip(results, queries)) / len(queries), 4),
+        "_results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pdf", type=Path, default=DEFAULT_PDF)
+    parser.add_argument("--backends", default=",".join(embeddings.EMBED_BACKENDS))
+    parser.add_argument("--threads", type=int, default=0, help="intra-op threads, 0 = library default")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--max-queries", type=int, default=300)
+    parser.add_argument("--json", type=Path, help="also write the rows to this file")
+    args = parser.parse_args()
+
+    texts, queries = load_corpus(args.pdf)
+    queries = queries[:: max(1, len(queries) // args.max_queries)][: args.max_queries]
+    print(f"{len(texts)} chunks, {len(queries)} queries, k={args.k}, threads={args.threads or 'default'}")
+
+    rows = []
+    for name in args.backends.split(","):
+        try:
+            rows.append(run_backend(name.strip(), texts, queries, args.k, args.threads, args.batch_size))
+        except Exception as e:  # a backend whose runtime isn't installed is reported, not fatal
+            print(f"{name}: skipped ({e})")
+    reference = next((r["_results"] for r in rows if r["backend"] == "torch"), None)
+    for r in rows:
+        results = r.pop("_results")
+        if reference is not None:
+            r[f"overlap@{args.k}"] = round(
+                statistics.mean(len(set(a) & set(b)) / args.k for a, b in zip(results, reference)), 4
+            )
+
+    columns = ["backend", "load_s", "corpus_chunks_s", "query_p50_ms", "query_p95_ms", f"recall@{args.k}", f"overlap@{args.k}"]
+    print("".join(f"{c:>16}" for c in columns))
+    for r in rows:
+        print("".join(f"{r.get(c, '-')!s:>16}" for c in columns))
+    if args.json:
+        args.json.write_text(json.dumps({"chunks": len(texts), "queries": len(queries), "k": args.k, "rows": rows}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
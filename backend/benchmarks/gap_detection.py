@@ -0,0 +1,83 @@
+"""
+Micro-benchmark: per-request cost of gap detection on long prompts.
+
+Compares the original _detect_placeholders_or_gaps (reproduced verbatim: 12 pattern strings passed
+to re.search on every call, bool only) with what now runs per request:
+  gaps.needs_clarification  the same trigger rules, patterns compiled once; runs on every prompt
+  gaps.scan                 full extraction (placeholders and filled facts with spans); runs only
+                            when the clarifier or a notice template needs the facts
+The original code had no extraction pass, so scan() has no baseline of its own. It is a cost the
+clarification and template paths pay on top of the check, several times the check on long prompts,
+and it runs at most once per request.
+
+    cd backend && python benchmarks/gap_detection.py [--repeat N]
+"""
+import argparse
+import re
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import gaps  # noqa: E402
+
+
+def legacy_detect(text: str) -> bool:
+    # Simple gap detection from placeholders and common missing items
+    patterns = [
+        r"\[[^\]]+\]",  # [placeholder]
+        r"Invoice\s*#\s*\[", r"\b[0-9]{4}-[0-9]{2}-[0-9]{2}\b",  # date formats OK, but still run clarifier optionally
+        r"\bamount\b.*\b\[", r"\bdue date\b.*\b\[", r"\bcontract\b.*\bdate\b.*\b\[",
+        r"\bproperty address\b.*\b\[", r"\btrademark\b.*\b\[", r"\bregistration\b.*\b\[",
+        r"\bplatform\b.*\b\[", r"\bURL\b.*\b\[", r"\bjurisdiction\b.*\b\[",
+    ]
+    for p in patterns:
+        if re.search(p, text, flags=re.IGNORECASE):
+            return True
+    # Also short or very generic prompts
+    return len(text.strip()) < 80
+
+
+PARAGRAPH = (
+    "My client supplied web design and hosting services to the recipient under a services agreement. "
+    "Invoice no. INV-2024-117 for Rs. 1,45,000 was raised on 12 March 2025 and was due on 2025-04-11. "
+    "Despite reminders by email and phone the amount remains unpaid, and the recipient has stopped responding. "
+    "The recipient also continues to use our designs on https://example.com/shop without payment. "
+)
+
+
+def prompts():
+    complete = PARAGRAPH
+    # Without the ISO date nothing triggers, so every rule runs to the end of the prompt
+    no_trigger = PARAGRAPH.replace("2025-04-11", "11 April 2025")
+    with_gap = PARAGRAPH + "The contract date is [contract date] and the jurisdiction is [city]. "
+    for size in (500, 5_000, 50_000):
+        reps = max(1, size // len(complete))
+        name = f"{size // 1000 or 0.5}k chars"
+        yield f"{name}, ISO date", complete * reps
+        yield f"{name}, no trigger", no_trigger * reps
+        yield f"{name}, placeholder at end", complete * reps + with_gap
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    def per_call(fn, text):
+        return min(timeit.repeat(lambda: fn(text), number=args.repeat, repeat=3)) / args.repeat * 1e6
+
+    print(f"{'prompt':<36}{'original':>12}{'check':>12}{'scan':>12}{'scan/orig':>11}{'needs':>7}{'fields':>8}")
+    for label, text in prompts():
+        original, check, full = per_call(legacy_detect, text), per_call(gaps.needs_clarification, text), per_call(gaps.scan, text)
+        needs = gaps.needs_clarification(text)
+        assert needs == legacy_detect(text), label
+        print(
+            f"{label:<36}{original:>9.1f} us{check:>9.1f} us{full:>9.1f} us{full / original:>10.1f}x"
+            f"{str(needs):>7}{len(gaps.scan(text)['fields']):>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
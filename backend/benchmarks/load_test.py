@@ -0,0 +1,313 @@
+"""
+Load and latency benchmark for the API, run against the local mock Groq server.
+
+Starts benchmarks/mock_groq.py and the backend (uvicorn main:app) as subprocesses. The backend's
+Chroma store is seeded from bare_act.pdf on first use; the store directory is reused between
+runs. Each scenario then runs at each concurrency level as a closed loop (C workers issuing
+requests back to back):
+  notice    POST /generate-notice
+  clarify   POST /clarify
+  dynamic   POST /dynamic-draft, then a second turn on the same session with the answers
+  ingest    delete bare_act.pdf from the store and ingest it again (run once per repeat, not per level)
+For every scenario and level the report has p50/p95/p99 latency, requests/s, error count, and a
+per-stage breakdown parsed from the Server-Timing header. Reports are JSON, so runs can be compared.
+
+    cd backend && python benchmarks/load_test.py --concurrency 1,4,16 --requests 40 --out benchmarks/results/base.json
+    python benchmarks/load_test.py --compare benchmarks/results/base.json benchmarks/results/new.json
+
+Prompts get a unique reference number by default, so the embedding and retrieval caches don't
+hide the cold path; pass --repeat-prompts to measure the warm path instead.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_PDF = BACKEND_DIR / "bare_act.pdf"
+DEFAULT_STORE = Path(__file__).resolve().parent / ".store"
+
+PROMPTS = [
+    "My client supplied web design and hosting services to the recipient. Invoice no. INV-2024-117 for Rs. 1,45,000 dated 12 March 2025 remains unpaid despite reminders.",
+    "The tenant of my client's flat has not paid rent of Rs. 35,000 per month for the last four months under the lease agreement dated 1 June 2024.",
+    "A cheque no. 004512 for Rs. 2,50,000 issued by the recipient towards repayment of a loan was dishonoured on 3 February 2025 for insufficient funds.",
+    "The recipient is selling products under a mark deceptively similar to my client's registered trademark on an online marketplace.",
+    "The contractor abandoned construction of my client's house midway in breach of the building contract and has not returned the advance paid.",
+    "A former employee keeps sending threatening messages to my client and her family over WhatsApp and phone calls at odd hours.",
+]
+CLARIFY_PROMPTS = ["Unpaid invoice [amount] from client", "Tenant not paying rent", "Cheque bounced", "Someone copied my photos"]
+DETAILS = {"senderName": "Asha Rao", "senderAddress": "12 MG Road, Pune", "recipientName": "Kiran Traders", "recipientAddress": "4 Station Road, Mumbai"}
+STAGES_HEADER = "server-timing"
+
+Result = Tuple[float, bool, Dict[str, float]]  # (seconds, ok, stage ms)
+
+
+def _server_timing(header: str) -> Dict[str, float]:
+    stages: Dict[str, float] = {}
+    for part in (header or "").split(","):
+        name, _, rest = part.strip().partition(";")
+        if name and rest.startswith("dur="):
+            try:
+                stages[name] = stages.get(name, 0.0) + float(rest[4:])
+            except ValueError:
+                continue
+    return stages
+
+
+def _prompt(i: int, prompts: List[str], unique: bool) -> str:
+    text = prompts[i % len(prompts)]
+    return f"{text} Our reference is LM/{i:05d}." if unique else text
+
+
+async def _post(client: httpx.AsyncClient, path: str, body: Dict[str, Any]) -> Tuple[httpx.Response, float]:
+    t0 = time.perf_counter()
+    r = await client.post(path, json=body)
+    return r, time.perf_counter() - t0
+
+
+async def scenario_notice(client: httpx.AsyncClient, i: int, unique: bool) -> Result:
+    r, dt = await _post(client, "/generate-notice", {"prompt": _prompt(i, PROMPTS, unique), **DETAILS, "max_tokens": 1024})
+    return dt, r.status_code == 200, _server_timing(r.headers.get(STAGES_HEADER, ""))
+
+
+async def scenario_clarify(client: httpx.AsyncClient, i: int, unique: bool) -> Result:
+    r, dt = await _post(client, "/clarify", {"prompt": _prompt(i, CLARIFY_PROMPTS, unique), **DETAILS})
+    return dt, r.status_code == 200, _server_timing(r.headers.get(STAGES_HEADER, ""))
+
+
+async def scenario_dynamic(client: httpx.AsyncClient, i: int, unique: bool) -> Result:
+    body = {"prompt": _prompt(i, PROMPTS, unique), **DETAILS, "max_tokens": 1024}
+    r, dt = await _post(client, "/dynamic-draft", body)
+    stages = _server_timing(r.headers.get(STAGES_HEADER, ""))
+    if r.status_code == 200:
+        return dt, True, stages
+    detail = (r.json().get("detail") or {}) if r.status_code == 422 else {}
+    if not isinstance(detail, dict) or not detail.get("session_id"):
+        return dt, False, stages
+    answers = {q["id"]: "2025-01-15" if q.get("type") == "date" else "50000" if q.get("type") == "number" else "as stated"
+               for q in detail.get("questions") or []}
+    r2, dt2 = await _post(client, "/dynamic-draft", {"session_id": detail["session_id"], "answers": answers})
+    for stage, ms in _server_timing(r2.headers.get(STAGES_HEADER, "")).items():
+        stages[stage] = stages.get(stage, 0.0) + ms
+    return dt + dt2, r2.status_code == 200, stages
+
+
+SCENARIOS: Dict[str, Callable] = {"notice": scenario_notice, "clarify": scenario_clarify, "dynamic": scenario_dynamic}
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[idx]
+
+
+def summarize(results: List[Result], wall: float) -> Dict[str, Any]:
+    latencies = sorted(dt * 1000 for dt, _, _ in results)
+    stages: Dict[str, List[float]] = {}
+    for _, _, timing in results:
+        for stage, ms in timing.items():
+            stages.setdefault(stage, []).append(ms)
+    return {
+        "requests": len(results),
+        "errors": sum(1 for _, ok, _ in results if not ok),
+        "wall_s": round(wall, 3),
+        "rps": round(len(results) / wall, 2) if wall > 0 else 0.0,
+        "latency_ms": {
+            "p50": round(_percentile(latencies, 0.50), 1),
+            "p95": round(_percentile(latencies, 0.95), 1),
+            "p99": round(_percentile(latencies, 0.99), 1),
+            "mean": round(sum(latencies) / len(latencies), 1) if latencies else 0.0,
+        },
+        "stages_ms": {
+            stage: {"mean": round(sum(v) / len(v), 2), "p95": round(_percentile(sorted(v), 0.95), 2)}
+            for stage, v in sorted(stages.items())
+        },
+    }
+
+
+async def run_level(client: httpx.AsyncClient, scenario: Callable, concurrency: int, requests: int, unique: bool, offset: int) -> Dict[str, Any]:
+    counter = iter(range(offset, offset + requests))
+    results: List[Result] = []
+
+    async def worker():
+        for i in counter:
+            try:
+                results.append(await scenario(client, i, unique))
+            except Exception:
+                results.append((0.0, False, {}))
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(results, time.perf_counter() - t0)
+
+
+async def run_ingest(client: httpx.AsyncClient, pdf: Path, repeats: int) -> Dict[str, Any]:
+    results: List[Result] = []
+    throughput: List[Dict[str, Any]] = []
+    t_all = time.perf_counter()
+    for _ in range(repeats):
+        await client.post("/delete-source", json={"path": str(pdf)})
+        r, dt = await _post(client, "/ingest-path", {"path": str(pdf)})
+        body = r.json() if r.status_code == 200 else {}
+        results.append((dt, body.get("status") == "ok", {}))
+        if body.get("throughput"):
+            throughput.append({k: body["throughput"].get(k) for k in ("pages", "chunks", "pages_per_s", "chunks_per_s", "extract_s", "embed_s", "index_s")})
+    return {**summarize(results, time.perf_counter() - t_all), "throughput": throughput}
+
+
+async def seed_store(client: httpx.AsyncClient, pdf: Path) -> int:
+    stats = (await client.get("/stats")).json()
+    if stats.get("chunks"):
+        return stats["chunks"]
+    r = await client.post("/ingest-path", json={"path": str(pdf)})
+    r.raise_for_status()
+    return (await client.get("/stats")).json().get("chunks", 0)
+
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/ready")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.5)
+    raise RuntimeError("backend did not become ready in time")
+
+
+def start_servers(args) -> Tuple[List[subprocess.Popen], str]:
+    procs = []
+    mock_url = f"http://127.0.0.1:{args.mock_port}"
+    procs.append(subprocess.Popen(
+        [sys.executable, str(Path(__file__).with_name("mock_groq.py")), "--port", str(args.mock_port),
+         "--ttft-ms", str(args.ttft_ms), "--tokens-per-s", str(args.tokens_per_s),
+         "--completion-tokens", str(args.completion_tokens), "--error-rate", str(args.error_rate)],
+        cwd=BACKEND_DIR,
+    ))
+    env = {
+        **os.environ,
+        "GROQ_API_KEY": os.environ.get("GROQ_API_KEY") or "mock",
+        "GROQ_BASE_URL": mock_url,
+        "CHROMA_DIR": str(args.store),
+        "AUTO_INGEST_DIR": tempfile.mkdtemp(prefix="legalmind-bench-"),
+        "LLM_CACHE_BACKEND": args.llm_cache,
+    }
+    procs.append(subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(args.port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    ))
+    return procs, f"http://127.0.0.1:{args.port}"
+
+
+async def run(args) -> Dict[str, Any]:
+    procs: List[subprocess.Popen] = []
+    base_url = args.backend_url
+    if not base_url:
+        procs, base_url = start_servers(args)
+    try:
+        async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=httpx.Limits(max_connections=max(args.concurrency) * 2)) as client:
+            await wait_ready(client, args.startup_timeout)
+            chunks = await seed_store(client, args.pdf)
+            print(f"store ready: {chunks} chunks")
+            report: Dict[str, Any] = {
+                "started_at": datetime.now().isoformat(timespec="seconds"),
+                "host": {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count()},
+                "settings": {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items() if k != "compare"},
+                "store_chunks": chunks,
+                "scenarios": {},
+            }
+            offset = 0
+            for name in args.scenarios:
+                if name == "ingest":
+                    report["scenarios"]["ingest"] = await run_ingest(client, args.pdf, args.ingest_repeats)
+                    print(f"ingest: {report['scenarios']['ingest']['latency_ms']}")
+                    continue
+                levels = report["scenarios"].setdefault(name, {})
+                for c in args.concurrency:
+                    summary = await run_level(client, SCENARIOS[name], c, args.requests, not args.repeat_prompts, offset)
+                    offset += args.requests
+                    levels[str(c)] = summary
+                    lat = summary["latency_ms"]
+                    print(f"{name:<8} c={c:<4} p50={lat['p50']:>8} p95={lat['p95']:>8} p99={lat['p99']:>8} ms  "
+                          f"{summary['rps']:>7} req/s  errors={summary['errors']}")
+            report["metrics"] = (await client.get("/metrics")).text
+            return report
+    finally:
+        for p in procs:
+            p.terminate()
+        for p in procs:
+            try:
+                p.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                p.kill()
+
+
+def compare(old_path: Path, new_path: Path) -> None:
+    old, new = json.loads(old_path.read_text()), json.loads(new_path.read_text())
+
+    def delta(a: float, b: float) -> str:
+        return f"{(b - a) / a * 100:+.1f}%" if a else "n/a"
+
+    print(f"{'scenario':<10}{'c':>5}{'p50 ms':>20}{'p95 ms':>20}{'req/s':>20}")
+    for name, levels in new["scenarios"].items():
+        rows = {"-": levels} if name == "ingest" else levels
+        old_rows = {"-": old["scenarios"].get(name)} if name == "ingest" else old["scenarios"].get(name) or {}
+        for c, cur in rows.items():
+            prev = old_rows.get(c)
+            if not prev:
+                continue
+            cells = []
+            for a, b in ((prev["latency_ms"]["p50"], cur["latency_ms"]["p50"]), (prev["latency_ms"]["p95"], cur["latency_ms"]["p95"]), (prev["rps"], cur["rps"])):
+                cells.append(f"{a:>7} -> {b:<7}{delta(a, b):>6}")
+            print(f"{name:<10}{c:>5}" + "".join(f"{cell:>20}" for cell in cells))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenarios", default="notice,clarify,dynamic,ingest", type=lambda s: [x.strip() for x in s.split(",") if x.strip()])
+    parser.add_argument("--concurrency", default="1,4,16", type=lambda s: [int(x) for x in s.split(",")])
+    parser.add_argument("--requests", type=int, default=40, help="requests per scenario and concurrency level")
+    parser.add_argument("--ingest-repeats", type=int, default=1)
+    parser.add_argument("--repeat-prompts", action="store_true", help="reuse prompts so the query caches get hits")
+    parser.add_argument("--pdf", type=Path, default=DEFAULT_PDF)
+    parser.add_argument("--store", type=Path, default=DEFAULT_STORE, help="Chroma dir for the benchmark backend (seeded once)")
+    parser.add_argument("--backend-url", help="use an already running backend instead of starting one")
+    parser.add_argument("--port", type=int, default=8790)
+    parser.add_argument("--mock-port", type=int, default=8765)
+    parser.add_argument("--ttft-ms", type=float, default=300)
+    parser.add_argument("--tokens-per-s", type=float, default=250)
+    parser.add_argument("--completion-tokens", type=int, default=400)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-cache", default="off", help="LLM_CACHE_BACKEND for the backend under test")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--startup-timeout", type=float, default=600)
+    parser.add_argument("--out", type=Path, help="write the JSON report here")
+    parser.add_argument("--compare", nargs=2, type=Path, metavar=("OLD", "NEW"), help="compare two reports and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    args.pdf = args.pdf.resolve()
+    args.store = args.store.resolve()
+    report = asyncio.run(run(args))
+    out = args.out or Path(__file__).resolve().parent / "results" / f"load_{datetime.now():%Y%m%d_%H%M%S}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2))
+    print(f"report: {out}")
+
+
+if __name__ == "__main__":
+    main()
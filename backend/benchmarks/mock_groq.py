@@ -0,0 +1,142 @@
+"""
+Local stand-in for the Groq chat-completions API, for load tests without quota or network jitter.
+
+Serves POST /openai/v1/chat/completions (the path the groq SDK calls) in plain and streaming
+(SSE) form. Each reply waits `--ttft-ms`, then emits tokens at `--tokens-per-s`; a "token" is one
+word. The reply is shaped like what the backend expects for the prompt it got:
+  controller prompts     -> "ask" JSON on the first turn, "draft" JSON once answers are present
+  clarifier prompts      -> {"questions": [...]}
+  template free text     -> "Background / Facts:" and "Legal Basis:" sections
+  anything else          -> a notice of about --completion-tokens words
+`--error-rate` answers that share of calls with 429 and a retry-after header.
+
+    cd backend && python benchmarks/mock_groq.py --port 8765 --ttft-ms 300 --tokens-per-s 250
+    GROQ_BASE_URL=http://127.0.0.1:8765 GROQ_API_KEY=mock uvicorn main:app
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from typing import Any, Dict, List
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+SETTINGS: Dict[str, Any] = {"ttft_ms": 300.0, "tokens_per_s": 250.0, "completion_tokens": 400, "error_rate": 0.0, "retry_after": 1}
+
+app = FastAPI()
+
+_FILLER = (
+    "My client states that the recipient has failed to discharge the obligations owed despite repeated "
+    "reminders and is hereby called upon to remedy the default within the time stated below failing which "
+    "my client shall initiate appropriate civil and criminal proceedings at the recipient's risk as to costs"
+).split()
+
+
+def _words(n: int) -> str:
+    return " ".join(_FILLER[i % len(_FILLER)] for i in range(max(1, n)))
+
+
+def _reply(messages: List[Dict[str, str]], max_tokens: int) -> str:
+    text = "\n".join(str(m.get("content") or "") for m in messages)
+    n = min(max_tokens, SETTINGS["completion_tokens"])
+    if "STRICT OUTPUT" in text:
+        if "Known factual answers" in text or "New answers" in text:
+            notice = "LEGAL NOTICE\n\n" + _words(n - 20)
+            return json.dumps({"stage": "draft", "notice": notice, "used_answers": {}})
+        return json.dumps({
+            "stage": "ask",
+            "rationale": "Key facts are missing.",
+            "missing_fields": ["amount_due", "original_due"],
+            "questions": [
+                {"id": "amount_due", "label": "Amount due", "placeholder": "e.g., 50000", "required": True, "type": "number"},
+                {"id": "original_due", "label": "Original due date", "placeholder": "YYYY-MM-DD", "required": True, "type": "date"},
+            ],
+        })
+    if "Return JSON only" in text:
+        return json.dumps({"questions": [
+            {"id": "amount_due", "label": "Amount due", "placeholder": "e.g., 50000", "required": True, "type": "number"},
+            {"id": "original_due", "label": "Original due date", "placeholder": "YYYY-MM-DD", "required": True, "type": "date"},
+            {"id": "jurisdiction", "label": "Jurisdiction", "placeholder": "e.g., Mumbai", "required": False, "type": "text"},
+        ]})
+    if "Output only the requested sections" in text:
+        half = max(1, n // 2)
+        return f"Background / Facts:\n{_words(half)}\n\nLegal Basis:\n- Indian Contract Act, 1872 — Section 73: {_words(half)}"
+    return "LEGAL NOTICE\n\n" + _words(n)
+
+
+def _usage(messages: List[Dict[str, str]], reply: str) -> Dict[str, int]:
+    prompt = sum(len(str(m.get("content") or "").split()) for m in messages)
+    completion = len(reply.split())
+    return {"prompt_tokens": prompt, "completion_tokens": completion, "total_tokens": prompt + completion}
+
+
+@app.post("/openai/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    if SETTINGS["error_rate"] and random.random() < SETTINGS["error_rate"]:
+        return JSONResponse(
+            status_code=429,
+            content={"error": {"message": "Rate limit reached (mock)", "type": "tokens", "code": "rate_limit_exceeded"}},
+            headers={"retry-after": str(SETTINGS["retry_after"])},
+        )
+    messages = body.get("messages") or []
+    model = body.get("model") or "mock"
+    reply = _reply(messages, int(body.get("max_tokens") or 1024))
+    usage = _usage(messages, reply)
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+    per_token = 1.0 / max(1e-6, SETTINGS["tokens_per_s"])
+    await asyncio.sleep(SETTINGS["ttft_ms"] / 1000)
+
+    if not body.get("stream"):
+        await asyncio.sleep(per_token * usage["completion_tokens"])
+        return {
+            "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+            "usage": usage,
+        }
+
+    async def events():
+        pieces = reply.split(" ")
+        step = 4  # words per chunk
+        for i in range(0, len(pieces), step):
+            text = " ".join(pieces[i:i + step]) + (" " if i + step < len(pieces) else "")
+            chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                     "choices": [{"index": 0, "delta": {"content": text}, "finish_reason": None}]}
+            yield f"data: {json.dumps(chunk)}\n\n"
+            await asyncio.sleep(per_token * step)
+        final = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                 "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "x_groq": {"id": completion_id, "usage": usage}}
+        yield f"data: {json.dumps(final)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok", **SETTINGS}
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--ttft-ms", type=float, default=SETTINGS["ttft_ms"])
+    parser.add_argument("--tokens-per-s", type=float, default=SETTINGS["tokens_per_s"])
+    parser.add_argument("--completion-tokens", type=int, default=SETTINGS["completion_tokens"])
+    parser.add_argument("--error-rate", type=float, default=SETTINGS["error_rate"])
+    parser.add_argument("--retry-after", type=int, default=SETTINGS["retry_after"])
+    args = parser.parse_args()
+    SETTINGS.update(ttft_ms=args.ttft_ms, tokens_per_s=args.tokens_per_s, completion_tokens=args.completion_tokens,
+                    error_rate=args.error_rate, retry_after=args.retry_after)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+In-process BM25 index over the chunk store, used next to Chroma for hybrid retrieval.
+
+Postings are kept in memory and persisted as JSON beside the Chroma store. The index is
+updated incrementally as chunks are upserted or deleted, and reloaded when another worker
+process has rewritten the file (see refresh()). It also keeps a section-number
+map, so explicit statutory references ("Section 138", "Article 21A", "s. 43") resolve
+straight to the chunks that carry that provision.
+"""
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or shall that the this to was were which with".split()
+)
+# "Section 138", "sec. 43A", "s. 420", "u/s 138", "Article 21", "Art. 226", "Order XXI", "Rule 5"
+SECTION_REF_RE = re.compile(
+    r"\b(?:sections?|secs?\.?|ss?\.|u/s\.?|articles?|arts?\.?|order|rule)\s*(\d{1,4}[a-z]{0,3}|[ivxlc]+)\b",
+    re.IGNORECASE,
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _WORD_RE.findall((text or "").lower()) if t not in _STOPWORDS]
+
+
+def section_refs(query: str) -> List[str]:
+    return [m.lower() for m in SECTION_REF_RE.findall(query or "")]
+
+
+class BM25Index:
+    def __init__(self, path: Optional[Path] = None, k1: float = 1.5, b: float = 0.75):
+        self.path = Path(path) if path else None
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._postings: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self._doc_len: Dict[str, int] = {}
+        self._doc_source: Dict[str, str] = {}
+        self._doc_sections: Dict[str, List[str]] = {}
+        self._sections: Dict[str, Set[str]] = defaultdict(set)
+        self._total_len = 0
+        self._dirty = False
+        # (mtime_ns, size) of the file as last loaded or saved
+        self._stamp: Optional[Tuple[int, int]] = None
+        if self.path and self.path.exists():
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self._doc_len)
+
+    def _file_stamp(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = self.path.stat()
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def stale(self) -> bool:
+        """True when the file on disk differs from what this process last loaded or saved."""
+        return bool(self.path) and not self._dirty and self._file_stamp() != self._stamp
+
+    def refresh(self) -> bool:
+        """Reload from disk if another process saved since; unsaved local changes are never dropped."""
+        with self._lock:
+            if not self.stale():
+                return False
+            self._reset()
+            self._load()
+            return True
+
+    def _reset(self) -> None:
+        self._postings.clear()
+        self._doc_len.clear()
+        self._doc_source.clear()
+        self._doc_sections.clear()
+        self._sections.clear()
+        self._total_len = 0
+
+    def _load(self) -> None:
+        self._stamp = self._file_stamp()
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except Exception:
+            return
+        for doc_id, (length, source, sections) in data.get("docs", {}).items():
+            self._doc_len[doc_id] = length
+            self._doc_source[doc_id] = source
+            self._doc_sections[doc_id] = sections
+            self._total_len += length
+            for s in sections:
+                self._sections[s].add(doc_id)
+        for term, posting in data.get("postings", {}).items():
+            self._postings[term] = posting
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {
+                "docs": {d: [self._doc_len[d], self._doc_source.get(d, ""), self._doc_sections.get(d, [])] for d in self._doc_len},
+                "postings": self._postings,
+            }
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(data, separators=(",", ":")), encoding="utf-8")
+            os.replace(tmp, self.path)
+            self._stamp = self._file_stamp()
+            self._dirty = False
+
+    def add(self, doc_id: str, text: str, source: str = "", sections: Iterable[str] = ()) -> None:
+        terms = tokenize(text)
+        with self._lock:
+            if doc_id in self._doc_len:
+                self._remove({doc_id})
+            for term, tf in Counter(terms).items():
+                self._postings[term][doc_id] = tf
+            self._doc_len[doc_id] = len(terms)
+            self._total_len += len(terms)
+            self._doc_source[doc_id] = source
+            secs = [s.lower() for s in sections if s]
+            self._doc_sections[doc_id] = secs
+            for s in secs:
+                self._sections[s].add(doc_id)
+            self._dirty = True
+
+    def _remove(self, doc_ids: Set[str]) -> None:
+        doc_ids = {d for d in doc_ids if d in self._doc_len}
+        if not doc_ids:
+            return
+        for doc_id in doc_ids:
+            self._total_len -= self._doc_len.pop(doc_id)
+            self._doc_source.pop(doc_id, None)
+            for s in self._doc_sections.pop(doc_id, []):
+                self._sections[s].discard(doc_id)
+                if not self._sections[s]:
+                    del self._sections[s]
+        # Postings are keyed by term, so removal is one pass over them per batch of ids
+        for term in list(self._postings):
+            posting = self._postings[term]
+            for doc_id in doc_ids.intersection(posting):
+                del posting[doc_id]
+            if not posting:
+                del self._postings[term]
+        self._dirty = True
+
+    def remove(self, doc_ids: Iterable[str]) -> None:
+        with self._lock:
+            self._remove(set(doc_ids))
+
+    def remove_source(self, source: str) -> None:
+        with self._lock:
+            self.remove([d for d, s in self._doc_source.items() if s == source])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._reset()
+            self._dirty = True
+
+    def search(self, query: str, k: int = 10, restrict: Optional[Set[str]] = None) -> List[Tuple[str, float]]:
+        """Top-k (doc_id, score) by BM25. `restrict` limits scoring to a set of doc ids."""
+        terms = tokenize(query)
+        with self._lock:
+            n = len(self._doc_len)
+            if not n or not terms:
+                return []
+            avg_len = self._total_len / n
+            scores: Dict[str, float] = defaultdict(float)
+            for term in set(terms):
+                posting = self._postings.get(term)
+                if not posting:
+                    continue
+                idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+                for doc_id, tf in posting.items():
+                    if restrict is not None and doc_id not in restrict:
+                        continue
+                    dl = self._doc_len.get(doc_id, 0)
+                    scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * dl / avg_len))
+        return sorted(scores.items(), key=lambda x: x[1], reverse=True)[:k]
+
+    def section_matches(self, query: str, k: int = 10) -> List[str]:
+        """Chunks carrying a section explicitly referenced in the query, best lexical match first."""
+        with self._lock:
+            candidates: Set[str] = set()
+            for ref in section_refs(query):
+                candidates |= self._sections.get(ref, set())
+        if not candidates:
+            return []
+        ranked = [d for d, _ in self.search(query, k=k, restrict=candidates)]
+        # Chunks that only match on the section number still count
+        ranked += sorted(candidates - set(ranked))
+        return ranked[:k]
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], weights: Optional[List[float]] = None, k: int = 60) -> List[str]:
+    """Merge ranked id lists: score(d) = sum_i w_i / (k + rank_i(d))."""
+    weights = weights or [1.0] * len(rankings)
+    scores: Dict[str, float] = defaultdict(float)
+    for ranking, w in zip(rankings, weights):
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] += w / (k + rank + 1)
+    return sorted(scores, key=lambda d: scores[d], reverse=True)
@@ -0,0 +1,243 @@
+"""
+Structure-aware chunking for bare acts.
+
+Pages are read as one continuous stream of lines, so provisions that straddle a page break stay
+together. Running page numbers and the footnote block at the bottom of each page are dropped.
+Text is grouped into provisions (section / article headings like "26. Freedom to manage
+religious affairs.—"), and each provision is split into sentence units that never cross a
+sub-section or clause boundary. Units are packed into chunks up to a token budget, with a
+sentence-level overlap between consecutive chunks of the same provision. Very small provisions
+(e.g. repealed sections) are merged with their neighbours.
+"""
+import os
+import re
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "240"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "32"))
+CHUNK_MIN_TOKENS = int(os.getenv("CHUNK_MIN_TOKENS", "48"))
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+# "26. Freedom to manage religious affairs.—", "3[31A. Saving of laws ...", "138. Dishonour of cheque ..."
+_SECTION_RE = re.compile(r"^(?:\d{1,2}\[)?(\d{1,3}[A-Z]{0,3})\.\s+(?:\d{1,2}\[|\[)?([A-Z][^\n]*)$")
+_PART_RE = re.compile(r"^(PART|CHAPTER)\s+([IVXLC]+[A-Z]?)\b\.?\s*(.*)$")
+_SCHEDULE_RE = re.compile(r"^(?:THE\s+)?([A-Z]+\s+)?SCHEDULE\b")
+# Block starts inside a provision: "(1)", "1[(1A)", "(a)", "(iii)", provisos and explanations
+_BLOCK_RE = re.compile(r"^(?:\d{1,2}\[)?(?:\(\d+[A-Z]?\)|\([a-z]{1,4}\)|Provided\b|Explanation\b|Illustrations?\b)")
+_ACT_RE = re.compile(r"^(THE\s+[A-Z][A-Z ,.'()&-]*?(?:ACT|CODE|SANHITA|ADHINIYAM)(?:,?\s*\d{4})?|THE CONSTITUTION OF INDIA)\s*$")
+_PAGE_NO_RE = re.compile(r"^\d{1,4}$")
+_FOOTNOTE_RE = re.compile(r"^\d{1,2}\.\s")
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.;:])\s+(?=[A-Z(\d])")
+
+
+def count_tokens(text: str) -> int:
+    """Cheap local token estimate (words and punctuation). Close to, but below, WordPiece counts."""
+    return len(_TOKEN_RE.findall(text))
+
+
+def _clean_page(text: str) -> List[str]:
+    lines = text.splitlines()
+    # Footnotes follow a long whitespace-only separator line near the bottom of the page
+    for i in range(len(lines) - 1, -1, -1):
+        if len(lines[i]) >= 20 and not lines[i].strip():
+            rest = [l for l in lines[i + 1:] if l.strip()]
+            if rest and _FOOTNOTE_RE.match(rest[0].strip()):
+                lines = lines[:i]
+            break
+    out = [l.strip() for l in lines if l.strip()]
+    if out and _PAGE_NO_RE.match(out[0]):
+        out = out[1:]
+    return out
+
+
+def detect_act_name(lines: Iterable[str]) -> Optional[str]:
+    for line in lines:
+        m = _ACT_RE.match(line.strip())
+        if m:
+            return " ".join(m.group(1).split()).title().replace("Of India", "of India")
+    return None
+
+
+def _split_units(text: str, count: Callable[[str], int], max_tokens: int) -> List[Tuple[str, int]]:
+    """Split a block into sentences; sentences longer than the budget are cut into word windows."""
+    units: List[Tuple[str, int]] = []
+    for sentence in _SENTENCE_SPLIT_RE.split(text):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        n = count(sentence)
+        if n <= max_tokens:
+            units.append((sentence, n))
+            continue
+        words = sentence.split()
+        step = max(1, int(len(words) * max_tokens / n))
+        for i in range(0, len(words), step):
+            piece = " ".join(words[i:i + step])
+            units.append((piece, count(piece)))
+    return units
+
+
+class _Provision:
+    def __init__(self, number: str, title: str, part: str, chapter: str, page: int):
+        self.number = number
+        self.title = title
+        self.part = part
+        self.chapter = chapter
+        self.page_start = page
+        # list of blocks; each block is a list of (page, line)
+        self.blocks: List[List[Tuple[int, str]]] = []
+
+    def add_line(self, page: int, line: str, new_block: bool) -> None:
+        if new_block or not self.blocks:
+            self.blocks.append([])
+        self.blocks[-1].append((page, line))
+
+    @property
+    def is_listing(self) -> bool:
+        # Real provisions read "26. Title.—Text"; entries in the table of contents and in
+        # schedule lists ("21. Fisheries.") have no dash after the heading
+        head = " ".join(l for _, l in (self.blocks[0] if self.blocks else [])[:2])
+        return "—" not in head
+
+
+def _join_lines(lines: List[str]) -> str:
+    text = " ".join(lines)
+    # Re-join words hyphenated across line breaks ("Vice -\nPresident")
+    return re.sub(r"(\w)\s*-\s+(?=[A-Z]?[a-z])", r"\1-", text)
+
+
+def iter_structured_chunks(
+    pages: Iterable[Tuple[int, str]],
+    act_name: Optional[str] = None,
+    max_tokens: int = CHUNK_MAX_TOKENS,
+    overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+    min_tokens: int = CHUNK_MIN_TOKENS,
+    count: Callable[[str], int] = count_tokens,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yield chunk dicts from (page_index, text) pairs:
+      {"text", "tokens", "page_start", "page_end", "act", "provision_type", "section", "sections", "title", "part", "chapter"}
+    Page indexes are 0-based, as given. Empty strings stand in for unknown values (Chroma metadata can't hold None).
+    """
+    state = {"act": act_name or "", "part": "", "chapter": "", "act_detected": False}
+    provision: Optional[_Provision] = None
+    pending: Optional[Dict[str, Any]] = None  # small chunk waiting to be merged with the next one
+
+    def provision_type() -> str:
+        return "Article" if "constitution" in state["act"].lower() else "Section"
+
+    def emit(p: _Provision) -> Iterator[Dict[str, Any]]:
+        heading = f"{provision_type()} {p.number}. {p.title}" if p.number else (p.title or "")
+        units: List[Tuple[str, int, int, int]] = []  # (text, tokens, page_start, page_end)
+        for block in p.blocks:
+            text = _join_lines([l for _, l in block])
+            for u, n in _split_units(text, count, max_tokens - min(max_tokens // 4, count(heading) + 2)):
+                units.append((u, n, block[0][0], block[-1][0]))
+        if not units:
+            return
+        current: List[Tuple[str, int, int, int]] = []
+        used = 0
+        prefix = ""
+        prefix_tokens = 0
+        for unit in units:
+            if current and used + prefix_tokens + unit[1] > max_tokens:
+                yield make_chunk(p, current, prefix)
+                prefix = f"{heading} (contd.)" if heading else ""
+                prefix_tokens = count(prefix) if prefix else 0
+                carry: List[Tuple[str, int, int, int]] = []
+                carried = 0
+                for u in reversed(current):
+                    if carried + u[1] > overlap_tokens:
+                        break
+                    carry.insert(0, u)
+                    carried += u[1]
+                current, used = carry, carried
+            current.append(unit)
+            used += unit[1]
+        if current:
+            yield make_chunk(p, current, prefix)
+
+    def make_chunk(p: _Provision, units: List[Tuple[str, int, int, int]], prefix: str) -> Dict[str, Any]:
+        body = " ".join(u[0] for u in units)
+        text = f"{prefix}\n{body}" if prefix else body
+        number = "" if p.is_listing else p.number
+        return {
+            "text": text,
+            "tokens": sum(u[1] for u in units) + (count(prefix) if prefix else 0),
+            "page_start": units[0][2],
+            "page_end": units[-1][3],
+            "act": state["act"],
+            "provision_type": provision_type() if number else "",
+            "section": number,
+            "sections": number,
+            "title": p.title,
+            "part": p.part,
+            "chapter": p.chapter,
+        }
+
+    def merge(a: Dict[str, Any], b: Dict[str, Any]) -> Dict[str, Any]:
+        sections = [s for s in (a["sections"] + "," + b["sections"]).split(",") if s]
+        return {
+            **a,
+            "text": a["text"] + "\n" + b["text"],
+            "tokens": a["tokens"] + b["tokens"],
+            "page_end": b["page_end"],
+            "provision_type": a["provision_type"] or b["provision_type"],
+            "section": a["section"] or b["section"],
+            "sections": ",".join(dict.fromkeys(sections)),
+            "title": a["title"] if a["section"] else b["title"],
+        }
+
+    def flush(p: Optional[_Provision]) -> Iterator[Dict[str, Any]]:
+        nonlocal pending
+        if p is None:
+            return
+        for chunk in emit(p):
+            if pending is not None:
+                if pending["tokens"] + chunk["tokens"] <= max_tokens:
+                    chunk = merge(pending, chunk)
+                    pending = None
+                else:
+                    yield pending
+                    pending = None
+            if chunk["tokens"] < min_tokens:
+                pending = chunk
+            else:
+                yield chunk
+
+    for page_no, raw in pages:
+        lines = _clean_page(raw or "")
+        if not state["act_detected"]:
+            detected = detect_act_name(lines[:15])
+            if detected:
+                state["act"] = detected
+                state["act_detected"] = True
+        for line in lines:
+            m_part = _PART_RE.match(line)
+            if m_part or _SCHEDULE_RE.match(line):
+                yield from flush(provision)
+                if m_part and m_part.group(1) == "PART":
+                    state["part"] = f"Part {m_part.group(2)}"
+                    state["chapter"] = ""
+                elif m_part:
+                    state["chapter"] = f"Chapter {m_part.group(2)}"
+                else:
+                    state["part"], state["chapter"] = line.title(), ""
+                provision = _Provision("", line, state["part"], state["chapter"], page_no)
+                provision.add_line(page_no, line, True)
+                continue
+            m_sec = _SECTION_RE.match(line)
+            if m_sec:
+                yield from flush(provision)
+                title = re.split(r"\s*\.?\s*[—–]", m_sec.group(2), maxsplit=1)[0].strip().rstrip(".")
+                provision = _Provision(m_sec.group(1), title, state["part"], state["chapter"], page_no)
+                provision.add_line(page_no, line, True)
+                continue
+            if provision is None:
+                provision = _Provision("", "", state["part"], state["chapter"], page_no)
+            provision.add_line(page_no, line, bool(_BLOCK_RE.match(line)))
+    yield from flush(provision)
+    if pending is not None:
+        yield pending
@@ -0,0 +1,185 @@
+"""
+Local matter-type classifier, used before falling back to the LLM clarifier.
+
+The matter type is scored two ways:
+- keyword rules;
+- nearest-centroid over sentence embeddings of a handful of labeled example prompts (the same MiniLM
+  encoder the store uses; centroids are computed once, lazily).
+
+Both scores are blended. Rules carry the decision and the centroids confirm it or break ties, so an
+embedding match alone never reaches a confident score. Fields already stated in the prompt come
+from gaps.scan and aren't asked for again.
+"""
+import re
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+import notice_templates
+
+
+RULE_WEIGHT = 0.5
+CENTROID_TEMPERATURE = 0.05  # softmax temperature over centroid cosine similarities
+
+# Most specific first; the order also breaks ties between rule-only matches
+MATTER_RULES: Dict[str, re.Pattern] = {
+    "cheque_bounce": re.compile(
+        r"\bcheque\b.*\b(bounced?|dishono(u)?r(ed)?|returned)\b|\bcheck\b.*\bbounced?\b|\bsection 138\b|\bn\.?i\.? act\b", re.I | re.S),
+    "rent_default": re.compile(r"\b(rent|tenant|tenancy|lease|landlord|lessee|evict(ion)?)\b", re.I),
+    "overdue_invoice": re.compile(r"\b(invoices?|overdue|unpaid bills?|outstanding (payment|dues|amount)|payment)\b", re.I),
+    "copyright": re.compile(r"\b(copyright(ed)?|dmca|pirat(ed|ing|cy))\b", re.I),
+    "trademark": re.compile(r"\b(trade ?marks?|brand name|passing off|deceptively similar)\b", re.I),
+    "contract_breach": re.compile(r"\b(contract|agreement|breach|non-performance|deliverables?)\b", re.I),
+    "harassment": re.compile(r"\b(harass(ment|ing|ed)?|stalk(ing|ed)?|threat(s|en(ed|ing)?)?|intimidat(e|ion|ing))\b", re.I),
+}
+
+EXAMPLES: Dict[str, List[str]] = {
+    "overdue_invoice": [
+        "Client has not paid our invoice for web design services and it is now 60 days overdue",
+        "Outstanding payment for goods supplied last quarter remains unpaid despite reminders",
+        "Recover unpaid bills from a customer who stopped responding after delivery of the software",
+        "Our consultancy fees under three invoices are pending beyond the agreed credit period",
+        "Send a payment reminder notice for overdue dues of INR 2 lakh for printing work",
+    ],
+    "rent_default": [
+        "Tenant has not paid rent for the last three months for my flat",
+        "Landlord notice to lessee for rent arrears and breach of the lease agreement",
+        "Tenant defaulted on monthly rent and is refusing to vacate the premises",
+        "Commercial shop tenant owes rent and maintenance charges since April",
+        "Notice to evict a tenant for non-payment of rent under the rental agreement",
+    ],
+    "cheque_bounce": [
+        "Cheque given by the debtor bounced due to insufficient funds",
+        "Notice under section 138 of the Negotiable Instruments Act for dishonour of cheque",
+        "The post-dated cheque issued for loan repayment was returned unpaid by the bank",
+        "Cheque for INR 1.5 lakh was dishonoured with remark funds insufficient",
+        "Security cheque deposited by us bounced and the drawer is not answering calls",
+    ],
+    "copyright": [
+        "A website copied my photographs without permission and is selling prints",
+        "Someone uploaded my online course videos to YouTube, pirated content",
+        "Competitor reproduced the text of our blog articles on their site",
+        "My song is being used in advertisements without a license",
+        "Send a takedown notice for infringing copies of my ebook",
+    ],
+    "trademark": [
+        "Another company is using a brand name deceptively similar to our registered trademark",
+        "A seller on Amazon uses our logo and mark on counterfeit products",
+        "Passing off of our restaurant name by a new outlet in the same city",
+        "Cease and desist use of our registered trade mark in their domain name",
+        "A competitor copied our product packaging and brand",
+    ],
+    "contract_breach": [
+        "Vendor failed to deliver the software modules as per the signed services agreement",
+        "The contractor abandoned the construction work midway in breach of contract",
+        "Supplier did not meet the delivery schedule in our supply agreement",
+        "Partner violated the non-compete clause of our agreement",
+        "Service provider breached the service level terms of the contract",
+    ],
+    "harassment": [
+        "A former colleague keeps calling and sending threatening messages",
+        "Neighbour is harassing my family and making threats",
+        "Recovery agents are harassing me with abusive calls at odd hours",
+        "Someone is stalking me online and posting defamatory comments",
+        "Ex-partner is sending intimidating messages on WhatsApp",
+    ],
+}
+
+
+def _q(id: str, label: str, placeholder: str = "", type: str = "text", required: bool = True) -> Dict[str, Any]:
+    return {"id": id, "label": label, "placeholder": placeholder, "type": type, "required": required}
+
+
+# Questions for matter types without a notice template; templated types ask for their template fields
+QUESTIONS: Dict[str, List[Dict[str, Any]]] = {
+    "copyright": [
+        _q("work_description", "Describe the Copyrighted Work", "e.g., 10 product photos, SKU set A"),
+        _q("infringement_location", "Where is it Infringing (URL/platform/store)?", "URL or platform", "url"),
+        _q("first_noticed", "When did you first notice the infringement?", "YYYY-MM-DD", "date", False),
+    ],
+    "trademark": [
+        _q("mark", "Trademark Name or Mark", "e.g., LEGALMIND"),
+        _q("registration_no", "Registration Number (if any)", "e.g., 1234567", "text", False),
+        _q("infringement_location", "Where is it used (URL/platform/marketplace)?", "URL or location", "url"),
+    ],
+    "contract_breach": [
+        _q("contract_title", "Contract Title/Description", "e.g., Services Agreement"),
+        _q("contract_date", "Contract Date", "YYYY-MM-DD", "date"),
+        _q("breach_details", "Breach Details", "e.g., failed delivery by 2024-08-10"),
+    ],
+    "harassment": [
+        _q("incident_dates", "Incident Dates/Range", "e.g., 2025-08-01 to 2025-08-10", "text"),
+        _q("channels", "Communication Channels Used", "e.g., phone calls, WhatsApp"),
+        _q("location", "Location(s) of Incidents", "e.g., outside residence", "text", False),
+    ],
+}
+
+
+def keyword_matter(text: str) -> Optional[str]:
+    for matter, pattern in MATTER_RULES.items():
+        if pattern.search(text or ""):
+            return matter
+    return None
+
+
+def questions_for(matter: str, facts: Optional[Dict[str, str]] = None, required_only: bool = False) -> List[Dict[str, Any]]:
+    """Questions for the fields of `matter` not covered by `facts`."""
+    facts = facts or {}
+    if matter in notice_templates.MATTERS:
+        qs = notice_templates.questions_for(matter, facts)
+    else:
+        qs = [dict(q) for q in QUESTIONS.get(matter, []) if not facts.get(q["id"])]
+    return [q for q in qs if q["required"]] if required_only else qs
+
+
+class MatterClassifier:
+    def __init__(self, encode: Callable[[List[str]], Sequence[Sequence[float]]], examples: Optional[Dict[str, List[str]]] = None):
+        self.encode = encode
+        self.examples = examples or EXAMPLES
+        self._labels: List[str] = list(self.examples)
+        self._centroids: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    def _get_centroids(self) -> np.ndarray:
+        if self._centroids is None:
+            with self._lock:
+                if self._centroids is None:
+                    rows = []
+                    for label in self._labels:
+                        vecs = _normalize(np.asarray(self.encode(self.examples[label]), dtype=np.float32))
+                        rows.append(vecs.mean(axis=0))
+                    self._centroids = _normalize(np.vstack(rows))
+        return self._centroids
+
+    def classify(self, text: str, embedding: Optional[Sequence[float]] = None) -> Dict[str, Any]:
+        """
+        Returns {"matter_type", "confidence", "scores", "rules"}. `embedding` is the prompt's
+        sentence embedding; without it only the keyword rules are used.
+        """
+        rules = [m for m in self._labels if m in MATTER_RULES and MATTER_RULES[m].search(text or "")]
+        # Several rules matching share the rule weight; rule order breaks exact ties
+        rule_score = {m: (1.0 / len(rules) if m in rules else 0.0) for m in self._labels}
+        probs = {m: 0.0 for m in self._labels}
+        if embedding is not None:
+            q = _normalize(np.asarray(embedding, dtype=np.float32)[None, :])[0]
+            sims = self._get_centroids() @ q
+            exp = np.exp((sims - sims.max()) / CENTROID_TEMPERATURE)
+            probs = dict(zip(self._labels, (exp / exp.sum()).tolist()))
+            weight = RULE_WEIGHT
+        else:
+            weight = 1.0
+        scores = {m: weight * rule_score[m] + (1 - weight) * probs[m] for m in self._labels}
+        order = {m: i for i, m in enumerate(rules)}
+        best = max(self._labels, key=lambda m: (scores[m], -order.get(m, len(order))))
+        return {
+            "matter_type": best if scores[best] > 0 else None,
+            "confidence": round(scores[best], 4),
+            "scores": {m: round(s, 4) for m, s in sorted(scores.items(), key=lambda x: -x[1])},
+            "rules": rules,
+        }
+
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    return x / np.where(norms == 0, 1.0, norms)
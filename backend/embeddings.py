@@ -0,0 +1,185 @@
+"""
+Embedding model loading with a selectable inference backend.
+
+  torch      fp32 PyTorch (the default)
+  onnx       fp32 ONNX Runtime graph exported for the model
+  onnx-int8  dynamically quantized (int8) ONNX graph for the host CPU
+
+All three use the same tokenizer and pooling through SentenceTransformer, so vectors stay in the
+same space and an existing store does not need re-ingesting; benchmarks/embedding_backends.py
+measures how much retrieval moves. The ONNX backends need `optimum[onnxruntime]`.
+
+EmbeddingBatcher coalesces concurrent single-query encodes into one batched encode call.
+"""
+import asyncio
+import platform
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from sentence_transformers import SentenceTransformer
+
+
+EMBED_BACKENDS = ("torch", "onnx", "onnx-int8")
+
+
+def _cpu_flags() -> str:
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("flags"):
+                    return line
+    except OSError:
+        pass
+    return ""
+
+
+def quantized_onnx_file() -> str:
+    """The pre-quantized graph in the model repo that matches this CPU's int8 instructions."""
+    if platform.machine().lower() in ("arm64", "aarch64"):
+        return "onnx/model_qint8_arm64.onnx"
+    flags = _cpu_flags()
+    if "avx512_vnni" in flags:
+        return "onnx/model_qint8_avx512_vnni.onnx"
+    if "avx512f" in flags:
+        return "onnx/model_qint8_avx512.onnx"
+    return "onnx/model_quint8_avx2.onnx"
+
+
+def _onnx_model_kwargs(file_name: Optional[str], threads: int) -> Dict[str, Any]:
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    if threads > 0:
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+    kwargs: Dict[str, Any] = {"provider": "CPUExecutionProvider", "session_options": options}
+    if file_name:
+        kwargs["file_name"] = file_name
+    return kwargs
+
+
+def load_embedder(model_name: str, backend: str = "torch", threads: int = 0, onnx_file: Optional[str] = None) -> SentenceTransformer:
+    """
+    Load `model_name` on CPU with the given backend. `threads` > 0 caps intra-op threads
+    (torch.set_num_threads for PyTorch, the ONNX Runtime session options otherwise).
+    `onnx_file` overrides which graph in the model repo is used by the ONNX backends.
+    """
+    backend = (backend or "torch").lower()
+    if backend not in EMBED_BACKENDS:
+        raise ValueError(f"Unknown embedding backend {backend!r}; expected one of {', '.join(EMBED_BACKENDS)}")
+    if backend == "torch":
+        if threads > 0:
+            import torch
+
+            torch.set_num_threads(threads)
+        return SentenceTransformer(model_name, device="cpu")
+    file_name = onnx_file or (quantized_onnx_file() if backend == "onnx-int8" else None)
+    return SentenceTransformer(
+        model_name,
+        device="cpu",
+        backend="onnx",
+        model_kwargs=_onnx_model_kwargs(file_name, threads),
+    )
+
+
+
+class EmbeddingBatcher:
+    """
+    Micro-batching for query embeddings. Callers await embed(text); pending texts are collected for
+    up to `window_ms` (or until `max_batch` are waiting), encoded with one `encode(texts)` call run
+    through `run`, and each caller's future is resolved with its row. While a batch is encoding,
+    new requests keep queueing, so under load batches grow on their own. `window_ms <= 0` or
+    `max_batch <= 1` turns batching off (one encode per call).
+    """
+
+    def __init__(
+        self,
+        encode: Callable[[List[str]], List[List[float]]],
+        run: Callable[..., Awaitable[Any]],
+        window_ms: float = 3.0,
+        max_batch: int = 32,
+    ):
+        self.encode = encode
+        self.run = run
+        self.window = max(0.0, window_ms) / 1000
+        self.max_batch = max(1, int(max_batch))
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # The loop only keeps weak references to tasks, so running batches are held here
+        self._tasks: Set[asyncio.Task] = set()
+        self._in_flight = 0
+        self.requests = 0
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+        self.max_queue_depth = 0
+        self.encode_seconds = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0 and self.max_batch > 1
+
+    async def embed(self, text: str) -> List[float]:
+        self.requests += 1
+        if not self.enabled:
+            return (await self._encode([text]))[0]
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pending.append((text, fut))
+        self.max_queue_depth = max(self.max_queue_depth, len(self._pending))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await fut
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._pending:
+            batch, self._pending = self._pending[: self.max_batch], self._pending[self.max_batch:]
+            task = asyncio.ensure_future(self._run_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _encode(self, texts: List[str]) -> List[List[float]]:
+        self._in_flight += 1
+        t0 = time.perf_counter()
+        try:
+            return await self.run(self.encode, texts)
+        finally:
+            self._in_flight -= 1
+            self.encode_seconds += time.perf_counter() - t0
+            self.batches += 1
+            self.items += len(texts)
+            self.largest_batch = max(self.largest_batch, len(texts))
+
+    async def _run_batch(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        # Identical texts in one window are encoded once
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        try:
+            rows = dict(zip(texts, await self._encode(texts)))
+        except Exception as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        for text, fut in batch:
+            if not fut.done():  # the caller may have been cancelled meanwhile
+                fut.set_result(rows[text])
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "window_ms": round(self.window * 1000, 3),
+            "max_batch": self.max_batch,
+            "queue_depth": len(self._pending),
+            "max_queue_depth": self.max_queue_depth,
+            "in_flight_batches": self._in_flight,
+            "requests": self.requests,
+            "batches": self.batches,
+            "mean_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "mean_encode_ms": round(self.encode_seconds / self.batches * 1000, 2) if self.batches else 0.0,
+        }
@@ -0,0 +1,153 @@
+"""
+Single-pass gap detection and field extraction for matter descriptions.
+
+needs_clarification() is the per-request check: the original trigger rules (a bracketed
+placeholder, an ISO date, a keyword followed by an open bracket, or a very short prompt), each
+pattern compiled once and the bracket ones skipped when the prompt has no "[". It decides whether
+anything more is needed.
+
+scan() does the full extraction, and callers run it only when the clarifier or a notice template
+needs the facts. All patterns are compiled into one alternation with named groups and the prompt is
+scanned with a single finditer. Each match is either a placeholder ("[invoice number]") or a filled
+fact (amount, date, invoice/cheque/registration number, URL), reported with its span. Placeholders
+and dates are then tied to a field id (the ids the clarifier and the notice templates use) by
+looking at the few words around them. The full scan costs several times the check (see
+benchmarks/gap_detection.py), which is why it isn't run on every prompt.
+"""
+import re
+from typing import Any, Dict, List, Optional
+
+_MONTHS = r"(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)"
+
+# Order matters where alternatives could overlap: URLs first so nothing inside a link is taken apart
+_PATTERNS = [
+    ("placeholder", r"\[[^\[\]]+\]"),
+    ("url", r"\bhttps?://[^\s)>\]]+"),
+    ("invoice_number", r"\binvoice\s*(?:no\.?|number|#)?\s*[:#]?\s*(?P<invoice_number_v>[A-Z0-9][A-Z0-9/-]*\d[A-Z0-9/-]*)|\b(?P<invoice_number_v2>INV[-/]?\d[\w/-]*)"),
+    ("cheque_number", r"\bcheque\s*(?:no\.?|number|#)\s*[:#]?\s*(?P<cheque_number_v>\d{6})\b"),
+    ("registration_no", r"\b(?:registration|reg\.?|application)\s*(?:no\.?|number|#)\s*[:#]?\s*(?P<registration_no_v>\d{5,10})\b"),
+    ("amount", r"(?:₹|\brs\.?|\binr)\s*(?P<amount_v>\d[\d,]*(?:\.\d+)?)(?P<amount_unit>\s*(?:lakhs?|crores?|k)\b)?"),
+    ("date", r"\b(?P<date_v>\d{4}-\d{2}-\d{2}|\d{1,2}[/.-]\d{1,2}[/.-]\d{2,4}|\d{1,2}(?:st|nd|rd|th)?\s+" + _MONTHS
+             + r",?\s+\d{4}|" + _MONTHS + r"\s+\d{1,2}(?:st|nd|rd|th)?,?\s+\d{4})\b"),
+]
+# Every alternative starts at "[" or at a word start with one of these characters; checking that first
+# lets the engine skip most positions without trying each alternative
+_START_GATE = r"(?:(?=\[)|(?=[₹0-9hicrajfmsond])(?<!\w))"
+SCAN_RE = re.compile(_START_GATE + "(?:" + "|".join(f"(?P<{kind}>{pattern})" for kind, pattern in _PATTERNS) + ")", re.IGNORECASE)
+# Nothing in SCAN_RE can match without a bracket, a digit or a URL
+_MAYBE_RE = re.compile(r"[\[\d]|https?://", re.IGNORECASE)
+
+# The clarification triggers. All but the ISO date need a "[", so without one they are skipped; the
+# keyword ones (".*" to an open bracket) are slow on long prompts
+_ISO_DATE_TRIGGER = re.compile(r"\b[0-9]{4}-[0-9]{2}-[0-9]{2}\b")
+_BRACKET_TRIGGERS = [re.compile(p, re.IGNORECASE) for p in (
+    r"\[[^\]]+\]",
+    r"Invoice\s*#\s*\[",
+    r"\bamount\b.*\b\[", r"\bdue date\b.*\b\[", r"\bcontract\b.*\bdate\b.*\b\[",
+    r"\bproperty address\b.*\b\[", r"\btrademark\b.*\b\[", r"\bregistration\b.*\b\[",
+    r"\bplatform\b.*\b\[", r"\bURL\b.*\b\[", r"\bjurisdiction\b.*\b\[",
+)]
+
+# Which field a date fills, from the words just before it. The keywords are a cheap substring
+# pre-check so the regex only runs when it can match.
+_DATE_CONTEXT = [
+    ("dishonour_date", ("dishono", "bounce", "returned"), re.compile(r"(dishono(u)?r|bounced?|returned)\w*\W+(\w+\W+){0,3}$", re.I)),
+    ("cheque_date", ("dated",), re.compile(r"cheque\b.*\bdated\W+$", re.I)),
+    ("original_due", ("due",), re.compile(r"\bdue\b\W+(\w+\W+){0,3}$", re.I)),
+    ("invoice_date", ("dated",), re.compile(r"invoice\b.*\bdated\W+$", re.I)),
+    ("lease_date", ("dated",), re.compile(r"(lease|rent(al)? agreement)\b.*\bdated\W+$", re.I)),
+    ("contract_date", ("dated",), re.compile(r"(contract|agreement)\b.*\bdated\W+$", re.I)),
+]
+# Which field a placeholder stands for, from its text or the words just before it (first hit wins)
+_PLACEHOLDER_FIELDS = [
+    ("invoice_number", re.compile(r"invoice", re.I)),
+    ("cheque_number", re.compile(r"cheque\s*(no|number|#)", re.I)),
+    ("amount_due", re.compile(r"amount|sum|dues|rs\.?|inr|₹", re.I)),
+    ("original_due", re.compile(r"due date|due on|payable by", re.I)),
+    ("property_address", re.compile(r"property|premises|flat|address", re.I)),
+    ("registration_no", re.compile(r"registration", re.I)),
+    ("mark", re.compile(r"trade ?mark|brand", re.I)),
+    ("infringement_location", re.compile(r"url|link|platform|website|marketplace", re.I)),
+    ("contract_date", re.compile(r"contract.*date|agreement.*date", re.I)),
+    ("jurisdiction", re.compile(r"jurisdiction|court|city", re.I)),
+]
+SHORT_PROMPT_CHARS = 80
+
+
+def _field_for_placeholder(inner: str, before: str) -> Optional[str]:
+    for field, pattern in _PLACEHOLDER_FIELDS:
+        if pattern.search(inner):
+            return field
+    tail = before[-40:]
+    for field, pattern in _PLACEHOLDER_FIELDS:
+        if pattern.search(tail):
+            return field
+    return None
+
+
+def needs_clarification(text: str) -> bool:
+    """True when the prompt has placeholders, an ISO date to confirm, or is very short."""
+    text = text or ""
+    if "[" in text and any(p.search(text) for p in _BRACKET_TRIGGERS):
+        return True
+    return bool(_ISO_DATE_TRIGGER.search(text)) or len(text.strip()) < SHORT_PROMPT_CHARS
+
+
+def scan(text: str, needs: Optional[bool] = None) -> Dict[str, Any]:
+    """
+    Scan a prompt once. Returns
+      {"placeholders": [{"text", "field", "span"}],
+       "fields": {field_id: {"value", "span"}},     first occurrence of each field
+       "matches": [{"kind", "value", "span"}],       every filled fact, in order
+       "needs_clarification": bool}
+    Pass `needs` when needs_clarification(text) has already been called, so it isn't run twice.
+    """
+    text = text or ""
+    placeholders: List[Dict[str, Any]] = []
+    fields: Dict[str, Dict[str, Any]] = {}
+    matches: List[Dict[str, Any]] = []
+    for m in (SCAN_RE.finditer(text) if _MAYBE_RE.search(text) else ()):
+        kind = m.lastgroup
+        span = [m.start(), m.end()]
+        if kind == "placeholder":
+            placeholders.append({
+                "text": m.group(0),
+                "field": _field_for_placeholder(m.group(0).strip("[]"), text[max(0, m.start() - 40):m.start()]),
+                "span": span,
+            })
+            continue
+        if kind == "amount":
+            value = f"INR {m.group('amount_v')}{(' ' + m.group('amount_unit').strip()) if m.group('amount_unit') else ''}"
+            field = "amount_due"
+        elif kind == "date":
+            value = m.group("date_v")
+            before = text[max(0, m.start() - 60):m.start()]
+            low = before.lower()
+            field = next((
+                f for f, keywords, pattern in _DATE_CONTEXT
+                if f not in fields and any(k in low for k in keywords) and pattern.search(before)
+            ), None)
+        elif kind == "url":
+            value = m.group(0).rstrip(".,")
+            field = "infringement_location"
+        elif kind == "invoice_number":
+            value = (m.group("invoice_number_v") or m.group("invoice_number_v2")).rstrip(".,")
+            field = kind
+        else:
+            value = m.group(f"{kind}_v")
+            field = kind
+        matches.append({"kind": kind, "value": value, "span": span})
+        if field and field not in fields:
+            fields[field] = {"value": value, "span": span}
+    return {
+        "placeholders": placeholders,
+        "fields": fields,
+        "matches": matches,
+        # ISO dates still trigger the clarifier so it can confirm what they refer to; so do very short prompts
+        "needs_clarification": needs_clarification(text) if needs is None else needs,
+    }
+
+
+def filled(result: Dict[str, Any]) -> Dict[str, str]:
+    """{field_id: value} from a scan() result."""
+    return {field: m["value"] for field, m in result["fields"].items()}
@@ -0,0 +1,429 @@
+"""
+PDF ingestion pipeline: parallel page extraction -> structure-aware chunking -> batched embedding -> batched Chroma writes.
+
+Page extraction runs in a process pool. This module is what the workers import, so it must stay
+lightweight (no model loading, no env checks). Chunks are streamed through the pipeline in
+bounded batches, so peak memory depends on the batch sizes, not on the size of the document.
+"""
+import contextlib
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from pypdf import PdfReader
+
+import chunking
+
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(max(1, min(4, (os.cpu_count() or 2) - 1)))))
+INGEST_PAGES_PER_TASK = int(os.getenv("INGEST_PAGES_PER_TASK", "8"))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+INGEST_ADD_BATCH_SIZE = int(os.getenv("INGEST_ADD_BATCH_SIZE", "256"))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+class IngestManifest:
+    """
+    JSON record of what has been indexed, kept next to the Chroma store:
+
+      {"sources": {"<resolved path>": {
+          "file_hash": "...", "source_label": "...", "bytes": 123, "pages": 256, "ingested_at": "...",
+          "chunks": {"<chunk content hash>": "<chunk id>"}}}}
+
+    Chunk ids are f"{file_hash[:16]}-{chunk offset:06d}" for the file version that first wrote
+    the chunk. Entries written by the older page-based layout ("pages": {page: [hash, id_prefix, n]})
+    are still understood so their chunks can be replaced.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.RLock()
+        self._data: Dict[str, Any] = {"sources": {}}
+        # (mtime_ns, size) of the file as last loaded or saved
+        self._stamp: Optional[Tuple[int, int]] = None
+        self._load()
+
+    def _file_stamp(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = self.path.stat()
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _load(self) -> None:
+        self._stamp = self._file_stamp()
+        self._data = {"sources": {}}
+        if self._stamp is not None:
+            try:
+                self._data = json.loads(self.path.read_text(encoding="utf-8"))
+                self._data.setdefault("sources", {})
+            except Exception:
+                self._data = {"sources": {}}
+
+    def _save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self._data), encoding="utf-8")
+        os.replace(tmp, self.path)
+        self._stamp = self._file_stamp()
+
+    def stale(self) -> bool:
+        """True when the file on disk differs from what this process last loaded or saved."""
+        return self._file_stamp() != self._stamp
+
+    def refresh(self) -> bool:
+        """Reload from disk if another process saved since."""
+        with self._lock:
+            if not self.stale():
+                return False
+            self._load()
+            return True
+
+    def sources(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._data["sources"])
+
+    def get(self, source: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._data["sources"].get(source)
+
+    def find_hash(self, file_hash: str) -> Optional[str]:
+        with self._lock:
+            for source, entry in self._data["sources"].items():
+                if entry.get("file_hash") == file_hash:
+                    return source
+        return None
+
+    def put(self, source: str, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self._data["sources"][source] = entry
+            self._save()
+
+    def remove(self, source: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._data["sources"].pop(source, None)
+            if entry is not None:
+                self._save()
+            return entry
+
+    def summary(self) -> Dict[str, Any]:
+        """Per-source chunk counts, total source bytes and the last ingest time, without touching the store."""
+        with self._lock:
+            sources = {
+                source: {
+                    "source_label": entry.get("source_label"),
+                    "chunks": len(indexed_ids(entry)),
+                    "bytes": entry.get("bytes", 0),
+                    "pages": entry.get("pages", 0),
+                    "ingested_at": entry.get("ingested_at"),
+                }
+                for source, entry in self._data["sources"].items()
+            }
+        times = [s["ingested_at"] for s in sources.values() if s["ingested_at"]]
+        return {
+            "sources": sources,
+            "chunks": sum(s["chunks"] for s in sources.values()),
+            "bytes": sum(s["bytes"] for s in sources.values()),
+            "last_ingested_at": max(times) if times else None,
+        }
+
+
+@contextlib.contextmanager
+def file_lock(path: Path, blocking: bool = True) -> Iterator[bool]:
+    """
+    Exclusive advisory lock on `path`, held across worker processes (and across threads, since each
+    holder opens the file itself). With `blocking=False`, yields False instead of waiting when it is held.
+    Without fcntl (Windows) there is nothing to lock against and it always yields True.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a") as f:
+        if fcntl is None:
+            yield True
+            return
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def chunk_ids(id_prefix: str, page_no: int, n_chunks: int) -> List[str]:
+    # Ids of the older page-based layout
+    return [f"{id_prefix}-{page_no:05d}-{i:03d}" for i in range(n_chunks)]
+
+
+def indexed_ids(entry: Optional[Dict[str, Any]]) -> Dict[str, str]:
+    """Map of chunk hash -> chunk id for a manifest entry (legacy page entries get synthetic keys)."""
+    if not entry:
+        return {}
+    if "chunks" in entry:
+        return dict(entry["chunks"])
+    out: Dict[str, str] = {}
+    for page, (_, id_prefix, n) in entry.get("pages", {}).items():
+        for cid in chunk_ids(id_prefix, int(page), n):
+            out[f"legacy:{cid}"] = cid
+    return out
+
+
+def file_sha256(path: Path, block_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def _extract_page_range(pdf_path: str, start: int, end: int) -> List[Tuple[int, str]]:
+    # Runs inside a worker process; each task opens its own reader
+    reader = PdfReader(pdf_path)
+    return [(i, reader.pages[i].extract_text() or "") for i in range(start, end)]
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn, not fork: the server process holds threads (and model weights) that must not be forked
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def iter_page_texts(pdf_path: Path, workers: int = INGEST_WORKERS, pages_per_task: int = INGEST_PAGES_PER_TASK) -> Iterator[Tuple[int, str]]:
+    """Yield (page_index, text) in page order, extracting ranges of pages in parallel."""
+    reader = PdfReader(str(pdf_path))
+    num_pages = len(reader.pages)
+    pages_per_task = max(1, pages_per_task)
+    if workers <= 1 or num_pages <= pages_per_task:
+        for i in range(num_pages):
+            yield i, reader.pages[i].extract_text() or ""
+        return
+
+    pool = _get_pool(workers)
+    ranges = [(s, min(s + pages_per_task, num_pages)) for s in range(0, num_pages, pages_per_task)]
+    # Keep only a small window of ranges in flight so extracted text doesn't pile up ahead of indexing
+    window = workers * 2
+    pending = [pool.submit(_extract_page_range, str(pdf_path), s, e) for s, e in ranges[:window]]
+    next_range = len(pending)
+    try:
+        while pending:
+            fut = pending.pop(0)
+            if next_range < len(ranges):
+                s, e = ranges[next_range]
+                pending.append(pool.submit(_extract_page_range, str(pdf_path), s, e))
+                next_range += 1
+            yield from fut.result()
+    finally:
+        for fut in pending:
+            fut.cancel()
+
+
+def remove_source(source: str, collection, manifest: IngestManifest, lexical=None) -> int:
+    """Delete every chunk of an indexed source. Returns the number of chunks removed."""
+    ids = list(indexed_ids(manifest.get(source)).values())
+    for i in range(0, len(ids), INGEST_ADD_BATCH_SIZE):
+        collection.delete(ids=ids[i:i + INGEST_ADD_BATCH_SIZE])
+    # Chunks written before the manifest existed carry random ids; match them by source
+    collection.delete(where={"source": source})
+    manifest.remove(source)
+    if lexical is not None:
+        lexical.remove_source(source)
+        lexical.save()
+    return len(ids)
+
+
+def _discard(ids: List[str], keep: set, collection, lexical, batch_size: int) -> None:
+    """Best-effort removal of chunks written by a failed ingest; ids still in `keep` are left alone."""
+    ids = [cid for cid in ids if cid not in keep]
+    if lexical is not None:
+        lexical.remove(ids)
+    try:
+        for i in range(0, len(ids), batch_size):
+            collection.delete(ids=ids[i:i + batch_size])
+    except Exception:
+        pass
+
+
+def ingest_pdf(
+    pdf_path: Path,
+    collection,
+    encode: Callable[[List[str], int], List[List[float]]],
+    manifest: IngestManifest,
+    source_label: Optional[str] = None,
+    embed_batch_size: int = EMBED_BATCH_SIZE,
+    add_batch_size: int = INGEST_ADD_BATCH_SIZE,
+    workers: int = INGEST_WORKERS,
+    count_tokens: Callable[[str], int] = chunking.count_tokens,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    lexical=None,
+    source: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Stream a PDF into the collection and return throughput stats.
+    `encode(texts, batch_size)` must return one embedding per text.
+    `progress(stats)`, if given, is called with running counters after every page and every write.
+    `lexical`, if given, is a bm25.BM25Index kept in step with the collection.
+    `source` is the key the file is indexed under (default: its path), e.g. an upload's stable name.
+
+    Idempotent: a file whose hash is already indexed is skipped, and a changed file only
+    re-embeds the chunks whose text changed. Stale chunks are deleted afterwards.
+    """
+    started = time.perf_counter()
+    source = source or str(pdf_path)
+    label = source_label or pdf_path.stem
+    file_hash = file_sha256(pdf_path)
+
+    indexed_as = manifest.find_hash(file_hash)
+    if indexed_as is not None:
+        return {"pages": 0, "chunks": 0, "skipped": True, "indexed_as": indexed_as, "file_hash": file_hash,
+                "seconds": round(time.perf_counter() - started, 3)}
+
+    previous = manifest.get(source)
+    if previous is None:
+        # Chunks from before the manifest existed (random uuid ids) would otherwise be duplicated
+        collection.delete(where={"source": source})
+        if lexical is not None:
+            lexical.remove_source(source)
+    old_chunks = indexed_ids(previous)
+    id_prefix = file_hash[:16]
+    new_chunks: Dict[str, str] = {}
+    written: List[str] = []
+
+    timings = {"extract_s": 0.0, "embed_s": 0.0, "index_s": 0.0}
+    stats = {"pages": 0, "chunks": 0, "chunks_unchanged": 0, "chunks_deleted": 0}
+    batch: List[Tuple[str, str, Dict[str, Any]]] = []
+
+    def flush():
+        if not batch:
+            return
+        docs = [doc for _, doc, _ in batch]
+        t0 = time.perf_counter()
+        embeddings = encode(docs, embed_batch_size)
+        t1 = time.perf_counter()
+        # Recorded before the write, so a batch that fails halfway is cleaned up too
+        written.extend(cid for cid, _, _ in batch)
+        collection.upsert(
+            ids=[cid for cid, _, _ in batch],
+            documents=docs,
+            embeddings=embeddings,
+            metadatas=[meta for _, _, meta in batch],
+        )
+        if lexical is not None:
+            for cid, doc, meta in batch:
+                lexical.add(cid, doc, source=source, sections=meta["sections"].split(","))
+        timings["embed_s"] += t1 - t0
+        timings["index_s"] += time.perf_counter() - t1
+        stats["chunks"] += len(batch)
+        batch.clear()
+        if progress:
+            progress(dict(stats))
+
+    def timed_pages():
+        pages = iter_page_texts(pdf_path, workers=workers)
+        while True:
+            t0 = time.perf_counter()
+            try:
+                page = next(pages)
+            except StopIteration:
+                return
+            timings["extract_s"] += time.perf_counter() - t0
+            stats["pages"] += 1
+            if progress:
+                progress(dict(stats))
+            yield page
+
+    seen: Dict[str, int] = {}
+    try:
+        for offset, chunk in enumerate(chunking.iter_structured_chunks(timed_pages(), act_name=label, count=count_tokens)):
+            meta = {
+                "source": source,
+                "source_label": label,
+                "page": chunk["page_start"] + 1,
+                "page_end": chunk["page_end"] + 1,
+                "act": chunk["act"],
+                "provision_type": chunk["provision_type"],
+                "section": chunk["section"],
+                "sections": chunk["sections"],
+                "title": chunk["title"],
+                "part": chunk["part"],
+                "chapter": chunk["chapter"],
+            }
+            digest = _text_hash(json.dumps([chunk["text"], meta], sort_keys=True))
+            # Identical chunks (repeated boilerplate) still need distinct keys
+            seen[digest] = seen.get(digest, 0) + 1
+            key = digest if seen[digest] == 1 else f"{digest}:{seen[digest]}"
+            if key in old_chunks:
+                new_chunks[key] = old_chunks[key]  # unchanged chunk: keep it as it is
+                stats["chunks_unchanged"] += 1
+                continue
+            cid = f"{id_prefix}-{offset:06d}"
+            new_chunks[key] = cid
+            batch.append((cid, chunk["text"], meta))
+            if len(batch) >= add_batch_size:
+                flush()
+        flush()
+    except Exception:
+        # The manifest still describes the previous version of the file: take out what this run
+        # wrote so the collection and BM25 index match it again, then report the original error
+        _discard(written, set(old_chunks.values()), collection, lexical, add_batch_size)
+        raise
+
+    # Drop chunks that changed or disappeared
+    stale = [cid for key, cid in old_chunks.items() if key not in new_chunks]
+    for i in range(0, len(stale), add_batch_size):
+        collection.delete(ids=stale[i:i + add_batch_size])
+    if lexical is not None:
+        lexical.remove(stale)
+        lexical.save()
+    stats["chunks_deleted"] = len(stale)
+    if progress:
+        progress(dict(stats))
+
+    manifest.put(source, {
+        "file_hash": file_hash,
+        "source_label": label,
+        "bytes": pdf_path.stat().st_size,
+        "pages": stats["pages"],
+        "ingested_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "chunks": new_chunks,
+    })
+
+    elapsed = time.perf_counter() - started
+    return {
+        **stats,
+        "skipped": False,
+        "file_hash": file_hash,
+        "seconds": round(elapsed, 3),
+        "pages_per_s": round(stats["pages"] / elapsed, 2) if elapsed > 0 else 0.0,
+        "chunks_per_s": round(stats["chunks"] / elapsed, 2) if elapsed > 0 else 0.0,
+        **{k: round(v, 3) for k, v in timings.items()},
+    }
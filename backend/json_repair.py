@@ -0,0 +1,172 @@
+"""
+Tolerant parsing of the JSON objects the LLM is asked to return.
+
+Models told to return "JSON only" still wrap it in ``` fences, add a sentence before or after it,
+leave trailing commas, or put raw newlines and unescaped quotes inside long strings such as the
+notice text. loads_object() takes the first balanced {...} in the reply and, when json rejects it,
+repairs those defects and tries again. ObjectScanner finds that object incrementally, so a streamed
+reply is scanned once, as the tokens arrive, instead of again at the end.
+"""
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+_DECODER = json.JSONDecoder()
+_VALID_ESCAPES = set('"\\/bfnrt')
+_CONTROL_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t", "\b": "\\b", "\f": "\\f"}
+_HEX = set("0123456789abcdefABCDEF")
+
+
+class MalformedJSON(ValueError):
+    pass
+
+
+class ObjectScanner:
+    """Tracks the first top-level {...} in text fed piece by piece, skipping braces inside strings."""
+
+    def __init__(self):
+        self.buffer = ""
+        self.start: Optional[int] = None
+        self.end: Optional[int] = None
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    @property
+    def complete(self) -> bool:
+        return self.end is not None
+
+    def feed(self, text: str) -> bool:
+        """Add text; returns True once the object has closed."""
+        self.buffer += text
+        buf, i = self.buffer, self._pos
+        while self.end is None and i < len(buf):
+            ch = buf[i]
+            if self.start is None:
+                if ch == "{":
+                    self.start, self._depth = i, 1
+            elif self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self.end = i + 1
+            i += 1
+        self._pos = i
+        return self.end is not None
+
+    def text(self) -> str:
+        """The object, or everything from its opening brace when it never closed."""
+        if self.start is None:
+            return self.buffer
+        return self.buffer[self.start:self.end]
+
+
+def repair(text: str) -> str:
+    """
+    Fix what models commonly get wrong: trailing commas, raw control characters and invalid escapes
+    inside strings, and double quotes inside a string that were never escaped. A quote ends a string
+    only when what follows it can follow a string: : } ] or the end of the text, or a comma and then
+    the next key (or, in an array, the next value).
+    """
+    out: List[str] = []
+    containers: List[str] = []
+    in_string = False
+    i, n = 0, len(text)
+    while i < n:
+        ch = text[i]
+        if in_string:
+            if ch == "\\":
+                nxt = text[i + 1:i + 2]
+                if nxt in _VALID_ESCAPES and nxt:
+                    out.append(text[i:i + 2])
+                    i += 2
+                elif nxt == "u" and len(text) >= i + 6 and set(text[i + 2:i + 6]) <= _HEX:
+                    out.append(text[i:i + 6])
+                    i += 6
+                else:
+                    out.append("\\\\")
+                    i += 1
+                continue
+            if ch == '"':
+                j = i + 1
+                while j < n and text[j] in " \t\r\n":
+                    j += 1
+                if _closes_string(text, j, containers[-1:] == ["["]):
+                    in_string = False
+                    out.append(ch)
+                else:
+                    out.append('\\"')
+            elif ch < " ":
+                out.append(_CONTROL_ESCAPES.get(ch, f"\\u{ord(ch):04x}"))
+            else:
+                out.append(ch)
+            i += 1
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in "{[":
+            containers.append(ch)
+        elif ch in "}]":
+            if containers:
+                containers.pop()
+            k = len(out) - 1
+            while k >= 0 and out[k] in (" ", "\t", "\r", "\n"):
+                k -= 1
+            if k >= 0 and out[k] == ",":
+                del out[k]
+        out.append(ch)
+        i += 1
+    return "".join(out)
+
+
+def _closes_string(text: str, j: int, in_array: bool) -> bool:
+    n = len(text)
+    if j >= n or text[j] in ":}]":
+        return True
+    if text[j] != ",":
+        return False
+    k = j + 1
+    while k < n and text[k] in " \t\r\n":
+        k += 1
+    return k >= n or text[k] in '"}]' or (in_array and text[k] in '{[-0123456789tfn')
+
+
+def parse_scanned(scanner: ObjectScanner) -> Tuple[Dict[str, Any], bool]:
+    """(object, repaired) for the object a scanner found. Raises MalformedJSON when it can't be read."""
+    if scanner.start is None:
+        raise MalformedJSON("No JSON object in model output.")
+    candidate = scanner.text()
+    try:
+        return _DECODER.raw_decode(candidate)[0], False
+    except json.JSONDecodeError as e:
+        error = e
+    try:
+        # raw_decode ignores anything after the object, e.g. commentary the scanner couldn't cut off
+        return _DECODER.raw_decode(repair(candidate))[0], True
+    except json.JSONDecodeError:
+        raise MalformedJSON(f"Malformed JSON in model output: {error}") from error
+
+
+def loads_object(text: str) -> Tuple[Dict[str, Any], bool]:
+    """(object, repaired) for the first JSON object in `text`. Raises MalformedJSON when there is none or it is unreadable."""
+    stripped = text.strip()
+    if stripped.startswith("{"):
+        try:
+            data = json.loads(stripped)
+            if isinstance(data, dict):
+                return data, False
+        except json.JSONDecodeError:
+            pass
+    scanner = ObjectScanner()
+    scanner.feed(text)
+    return parse_scanned(scanner)
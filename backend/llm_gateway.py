@@ -0,0 +1,411 @@
+"""
+Resilient access to the Groq chat-completions API.
+
+- One pooled httpx.AsyncClient (keep-alive, bounded connections) shared by every call.
+- A deadline per call that covers all attempts, and a timeout per attempt.
+- Retries with full jitter on 429, 5xx, timeouts and connection errors, waiting out retry-after
+  when the server sends it.
+- Optional hedging: when an attempt is slower than the model's observed p95, an identical second
+  request is sent and the first answer wins.
+- A client-side token bucket (requests and tokens per minute) sized to the Groq tier, so bursts
+  queue locally instead of coming back as 429s.
+- An ordered list of fallback models, tried when a model keeps failing or is unavailable.
+
+When every model and attempt has failed, LLMUnavailable is raised with the last error and the
+server's retry-after, if any. Client errors (bad request, auth) are raised as they are.
+
+TaskRouter maps each kind of call (clarify, controller, draft) to its own model list,
+max_tokens ceiling, timeout and concurrency pool. It also learns a tighter max_tokens per task
+from the completion lengths it observes.
+"""
+import asyncio
+import math
+import random
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Sequence
+
+import httpx
+from groq import APIConnectionError, APIStatusError, AsyncGroq
+
+import metrics
+
+RETRIES = "legalmind_llm_retries_total"
+HEDGES = "legalmind_llm_hedges_total"
+FALLBACKS = "legalmind_llm_fallbacks_total"
+RATE_LIMIT_WAIT = "legalmind_llm_rate_limit_wait_seconds"
+TRUNCATED = "legalmind_llm_truncated_total"
+metrics.REGISTRY.describe(RETRIES, "counter", "LLM attempts retried, by model and reason")
+metrics.REGISTRY.describe(HEDGES, "counter", "Hedged LLM requests, by model and which request won")
+metrics.REGISTRY.describe(FALLBACKS, "counter", "Calls moved on to a fallback model")
+metrics.REGISTRY.describe(RATE_LIMIT_WAIT, "histogram", "Time spent waiting on the client-side rate limiter")
+metrics.REGISTRY.describe(TRUNCATED, "counter", "Completions cut off at a learned max_tokens cap, by task")
+
+# Errors that mean this model can't serve the request at all, so the next model is tried right away
+_MODEL_ERROR_CODES = {"model_not_found", "model_decommissioned", "model_terminated", "context_length_exceeded"}
+_HEDGE_MIN_SAMPLES = 20
+
+
+class LLMUnavailable(Exception):
+    def __init__(self, message: str, retry_after: Optional[float] = None, last_error: Optional[BaseException] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.last_error = last_error
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """The retry-after header of an API error, in seconds, or None."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return max(0.0, float(headers.get("retry-after")))
+    except (TypeError, ValueError):
+        return None
+
+
+def estimate_tokens(messages: Sequence[Dict[str, str]]) -> int:
+    # ~4 characters per token is close enough for rate limiting
+    return sum(len(str(m.get("content") or "")) for m in messages) // 4 + 4 * len(messages)
+
+
+class TokenBucket:
+    """Requests-per-minute and tokens-per-minute buckets. A limit of 0 disables that bucket."""
+
+    def __init__(self, rpm: float = 0, tpm: float = 0):
+        self.rpm = max(0.0, rpm)
+        self.tpm = max(0.0, tpm)
+        self._requests = self.rpm
+        self._tokens = self.tpm
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.rpm or self.tpm)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed, self._updated = now - self._updated, now
+        if self.rpm:
+            self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+        if self.tpm:
+            self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+
+    def _wait_for(self, tokens: int) -> float:
+        wait_r = max(0.0, 1 - self._requests) * 60 / self.rpm if self.rpm else 0.0
+        wait_t = max(0.0, tokens - self._tokens) * 60 / self.tpm if self.tpm else 0.0
+        return max(wait_r, wait_t)
+
+    def _take(self, tokens: int) -> None:
+        if self.rpm:
+            self._requests -= 1
+        if self.tpm:
+            self._tokens -= tokens
+
+    async def acquire(self, tokens: int) -> float:
+        """Wait until a request of `tokens` fits; returns the seconds waited."""
+        if not self.enabled:
+            return 0.0
+        tokens = min(tokens, int(self.tpm)) if self.tpm else tokens
+        waited = 0.0
+        async with self._lock:  # first come, first served
+            while True:
+                self._refill()
+                wait = self._wait_for(tokens)
+                if wait <= 0:
+                    self._take(tokens)
+                    return waited
+                await asyncio.sleep(wait)
+                waited += wait
+
+    def try_acquire(self, tokens: int) -> bool:
+        if not self.enabled:
+            return True
+        self._refill()
+        if self._lock.locked() or self._wait_for(tokens) > 0:
+            return False
+        self._take(tokens)
+        return True
+
+    def refund(self, tokens: int) -> None:
+        """Give back the part of an estimate the call didn't use."""
+        if self.tpm and tokens > 0:
+            self._tokens = min(self.tpm, self._tokens + tokens)
+
+
+class LLMGateway:
+    def __init__(
+        self,
+        api_key: str,
+        base_url: Optional[str] = None,
+        models: Sequence[str] = (),
+        max_connections: int = 64,
+        timeout: float = 60.0,
+        deadline: float = 120.0,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 20.0,
+        hedge: bool = False,
+        hedge_min_s: float = 2.0,
+        limiter: Optional[TokenBucket] = None,
+    ):
+        self.models = [m for m in models if m]
+        self.timeout = timeout
+        self.deadline = deadline
+        self.max_retries = max(0, max_retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.hedge_min_s = hedge_min_s
+        self.limiter = limiter or TokenBucket()
+        self.http = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=httpx.Timeout(timeout, connect=10.0),
+        )
+        # Retries are done here, not in the SDK, so they share the deadline and fallback list
+        self.client = AsyncGroq(api_key=api_key, base_url=base_url, http_client=self.http, max_retries=0, timeout=timeout)
+        self._latencies: Dict[str, Deque[float]] = {}
+
+    async def aclose(self) -> None:
+        await self.http.aclose()
+
+    def hedge_delay(self, model: str) -> Optional[float]:
+        """Seconds after which a hedge is sent: the model's p95 latency (at least hedge_min_s)."""
+        samples = self._latencies.get(model)
+        if not self.hedge or not samples or len(samples) < _HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(samples)
+        return max(self.hedge_min_s, ordered[int(0.95 * (len(ordered) - 1))])
+
+    def _backoff(self, attempt: int, error: BaseException) -> float:
+        server = retry_after_seconds(error)
+        if server is not None:
+            return server
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def _attempt(self, model: str, messages: List[Dict[str, str]], timeout: float, params: Dict[str, Any]):
+        t0 = time.monotonic()
+        resp = await self.client.chat.completions.create(messages=messages, model=model, timeout=timeout, **params)
+        self._latencies.setdefault(model, deque(maxlen=200)).append(time.monotonic() - t0)
+        return resp
+
+    async def _hedged(self, model: str, messages: List[Dict[str, str]], timeout: float, params: Dict[str, Any], estimate: int):
+        first = asyncio.ensure_future(self._attempt(model, messages, timeout, params))
+        tasks = {first}
+        started = [first]
+        try:
+            delay = self.hedge_delay(model)
+            if delay is not None and delay < timeout:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                # Only hedge when the limiter has room right now; a hedge must not queue behind other calls
+                if not done and self.limiter.try_acquire(estimate):
+                    started.append(asyncio.ensure_future(self._attempt(model, messages, timeout, params)))
+                    tasks.add(started[-1])
+            error: Optional[BaseException] = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if len(started) > 1:
+                            metrics.REGISTRY.inc(HEDGES, model=model, winner="first" if task is first else "hedge")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in started:
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    task.exception()  # mark a losing request's error as handled
+
+    def _classify(self, error: BaseException) -> str:
+        """'retry', 'next_model' or 'raise'."""
+        if isinstance(error, (asyncio.TimeoutError, APIConnectionError)):
+            return "retry"
+        if isinstance(error, APIStatusError):
+            code = ""
+            body = getattr(error, "body", None)
+            if isinstance(body, dict):
+                err = body.get("error") if isinstance(body.get("error"), dict) else body
+                code = str(err.get("code") or "")
+            if error.status_code == 429 or error.status_code >= 500:
+                return "retry"
+            if error.status_code in (404, 413) or code in _MODEL_ERROR_CODES:
+                return "next_model"
+        return "raise"
+
+    async def _call(self, messages: List[Dict[str, str]], models: Optional[Sequence[str]], deadline: Optional[float],
+                    timeout: Optional[float], max_tokens: int, open_call):
+        models = [m for m in (models or self.models) if m]
+        deadline_at = time.monotonic() + (deadline or self.deadline)
+        estimate = estimate_tokens(messages) + max_tokens
+        last_error: Optional[BaseException] = None
+        for index, model in enumerate(models):
+            if index:
+                metrics.REGISTRY.inc(FALLBACKS, model=model)
+            for attempt in range(self.max_retries + 1):
+                remaining = deadline_at - time.monotonic()
+                if remaining <= 0:
+                    raise LLMUnavailable("LLM deadline exceeded", retry_after_seconds(last_error) if last_error else None, last_error)
+                try:
+                    waited = await asyncio.wait_for(self.limiter.acquire(estimate), remaining)
+                except asyncio.TimeoutError:
+                    raise LLMUnavailable("LLM deadline exceeded waiting for the rate limiter", None, last_error)
+                if self.limiter.enabled:
+                    metrics.REGISTRY.observe(RATE_LIMIT_WAIT, waited)
+                remaining = deadline_at - time.monotonic()
+                try:
+                    return await asyncio.wait_for(open_call(model, min(timeout or self.timeout, remaining), estimate), remaining)
+                except Exception as e:
+                    action = self._classify(e)
+                    if action == "raise":
+                        raise
+                    last_error = e
+                    if action == "next_model" or attempt == self.max_retries:
+                        break
+                    delay = self._backoff(attempt, e)
+                    if time.monotonic() + delay >= deadline_at:
+                        break
+                    reason = str(getattr(e, "status_code", "")) or type(e).__name__
+                    metrics.REGISTRY.inc(RETRIES, model=model, reason=reason)
+                    await asyncio.sleep(delay)
+        raise LLMUnavailable(
+            f"LLM unavailable after retries ({', '.join(models)}): {last_error}",
+            retry_after_seconds(last_error) if last_error else None,
+            last_error,
+        )
+
+    async def complete(self, messages: List[Dict[str, str]], max_tokens: int, models: Optional[Sequence[str]] = None,
+                       deadline: Optional[float] = None, timeout: Optional[float] = None, **params):
+        """A chat completion (the SDK response object); `params` go to chat.completions.create."""
+        params = {"max_tokens": max_tokens, **params}
+
+        async def open_call(model: str, attempt_timeout: float, estimate: int):
+            resp = await self._hedged(model, messages, attempt_timeout, params, estimate)
+            usage = getattr(resp, "usage", None)
+            if usage is not None and getattr(usage, "total_tokens", None):
+                self.limiter.refund(estimate - int(usage.total_tokens))
+            return resp
+
+        return await self._call(messages, models, deadline, timeout, max_tokens, open_call)
+
+    async def stream(self, messages: List[Dict[str, str]], max_tokens: int, models: Optional[Sequence[str]] = None,
+                     deadline: Optional[float] = None, timeout: Optional[float] = None, **params) -> AsyncIterator[Any]:
+        """
+        Streamed chat completion chunks. Retries and fallbacks apply until the first chunk arrives;
+        after that an error ends the stream. Streams are not hedged.
+        """
+        params = {"max_tokens": max_tokens, "stream": True, **params}
+
+        async def open_call(model: str, attempt_timeout: float, estimate: int):
+            stream = await self._attempt(model, messages, attempt_timeout, params)
+            try:
+                iterator = stream.__aiter__()
+                try:
+                    first = await iterator.__anext__()
+                except StopAsyncIteration:
+                    first = None
+            except BaseException:
+                # Failed or cancelled by wait_for: hand the connection back before any retry
+                await _close_stream(stream)
+                raise
+            return first, iterator, stream
+
+        first, iterator, stream = await self._call(messages, models, deadline, timeout, max_tokens, open_call)
+        try:
+            if first is None:
+                return
+            yield first
+            async for chunk in iterator:
+                yield chunk
+        finally:
+            # Also runs when the consumer stops early (aclose), e.g. the client disconnected
+            await _close_stream(stream)
+
+
+async def _close_stream(stream) -> None:
+    close = getattr(stream, "close", None)
+    if close is None:
+        return
+    try:
+        await close()
+    except Exception:
+        pass
+
+
+class TaskRouter:
+    """
+    Per-task routing: routes = {task: {"model", "max_tokens", "timeout", "concurrency"}}. A task's
+    model list is its own model, then the shared fallbacks (deduplicated).
+
+    With `adaptive` on, each task keeps its recent completion lengths. Once `min_samples` are in, a
+    call's max_tokens is capped at p99 * `headroom` (at least `floor`, never above what the caller
+    asked for), so a notice that averages 1,200 tokens stops reserving 4,096. A completion that hits
+    the cap is recorded at the full requested length, which pushes the cap back up.
+    """
+
+    def __init__(self, routes: Dict[str, Dict[str, Any]], fallbacks: Sequence[str] = (), adaptive: bool = True,
+                 headroom: float = 1.25, min_samples: int = 30, floor: int = 256, window: int = 500):
+        self.routes = routes
+        self.fallbacks = [m for m in fallbacks if m]
+        self.adaptive = adaptive
+        self.headroom = headroom
+        self.min_samples = min_samples
+        self.floor = floor
+        self._lengths: Dict[str, Deque[int]] = {task: deque(maxlen=window) for task in routes}
+        self._truncated: Dict[str, int] = {task: 0 for task in routes}
+        self._semaphores = {task: asyncio.Semaphore(max(1, int(r.get("concurrency") or 1))) for task, r in routes.items()}
+
+    def models(self, task: str) -> List[str]:
+        return list(dict.fromkeys([self.routes[task]["model"], *self.fallbacks]))
+
+    def timeout(self, task: str) -> Optional[float]:
+        return self.routes[task].get("timeout")
+
+    def semaphore(self, task: str) -> asyncio.Semaphore:
+        return self._semaphores[task]
+
+    def learned_cap(self, task: str) -> Optional[int]:
+        lengths = self._lengths[task]
+        if not self.adaptive or len(lengths) < self.min_samples:
+            return None
+        ordered = sorted(lengths)
+        return max(self.floor, math.ceil(ordered[int(0.99 * (len(ordered) - 1))] * self.headroom))
+
+    def limit(self, task: str, requested: Optional[int] = None) -> int:
+        """The caller's max_tokens (or the route's ceiling), never above the ceiling."""
+        ceiling = int(self.routes[task]["max_tokens"])
+        return min(int(requested), ceiling) if requested else ceiling
+
+    def max_tokens(self, task: str, requested: Optional[int] = None) -> int:
+        """The max_tokens to send: limit() capped by the learned limit."""
+        limit = self.limit(task, requested)
+        cap = self.learned_cap(task)
+        return min(limit, cap) if cap else limit
+
+    def observe(self, task: str, completion_tokens: Optional[int], finish_reason: Optional[str], sent: int, requested: int) -> bool:
+        """Record one completion. Returns True when it was cut off by the learned cap (not by the caller's limit)."""
+        truncated = finish_reason == "length" and sent < requested
+        if truncated:
+            self._truncated[task] += 1
+            metrics.REGISTRY.inc(TRUNCATED, task=task)
+            self._lengths[task].append(requested)
+        elif completion_tokens:
+            self._lengths[task].append(int(completion_tokens))
+        return truncated
+
+    def stats(self) -> Dict[str, Any]:
+        out = {}
+        for task, route in self.routes.items():
+            ordered = sorted(self._lengths[task])
+            out[task] = {
+                "models": self.models(task),
+                "max_tokens": route["max_tokens"],
+                "timeout": route.get("timeout"),
+                "concurrency": route.get("concurrency"),
+                "learned_max_tokens": self.learned_cap(task),
+                "samples": len(ordered),
+                "p50_tokens": ordered[len(ordered) // 2] if ordered else None,
+                "p99_tokens": ordered[int(0.99 * (len(ordered) - 1))] if ordered else None,
+                "truncated": self._truncated[task],
+            }
+        return out
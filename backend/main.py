@@ -1,47 +1,456 @@
 from fastapi import FastAPI, Request, UploadFile, File, Form, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, AsyncIterator, Tuple
 import os
 from pathlib import Path
 from dotenv import load_dotenv
-import uuid
 from datetime import datetime
 import json
 import re
+import shutil
+import uuid
+import asyncio
+import contextlib
+import contextvars
+import copy
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+_import_started = time.perf_counter()
 
 # Import your existing logic
 import chromadb
+import numpy as np
+from groq import APIStatusError
 from sentence_transformers import SentenceTransformer
-from groq import Groq
-from pypdf import PdfReader
+
+import bm25
+import classifier
+import embeddings
+import gaps
+import ingestion
+import json_repair
+import llm_gateway
+import metrics
+import notice_archive
+import notice_templates
+import sessions
+from cache import TTLCache, CompletionCache, MemoryCacheBackend, SQLiteCacheBackend
 
 # Load env
 load_dotenv()
 DB_DIR = os.getenv("CHROMA_DIR", "./chroma_store")
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 GROQ_MODEL = os.getenv("GROQ_MODEL", "mixtral-8x7b-32768")
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL") or None  # e.g. benchmarks/mock_groq.py for load tests
+
+# LLM gateway: one pooled client; each call gets LLM_DEADLINE_S across all attempts and LLM_TIMEOUT_S
+# per attempt, retries with jitter on 429/5xx (waiting out retry-after), then the fallback models in
+# order. LLM_HEDGE sends a second request when one runs past the model's observed p95.
+# LLM_RATE_LIMIT_RPM / _TPM should match the Groq tier (0 = no client-side limit).
+LLM_FALLBACK_MODELS = [m.strip() for m in os.getenv("LLM_FALLBACK_MODELS", "").split(",") if m.strip()]
+LLM_TIMEOUT_S = float(os.getenv("LLM_TIMEOUT_S", "60"))
+LLM_DEADLINE_S = float(os.getenv("LLM_DEADLINE_S", "120"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "64"))
+LLM_HEDGE = os.getenv("LLM_HEDGE", "0").lower() in ("1", "true", "yes")
+LLM_HEDGE_MIN_S = float(os.getenv("LLM_HEDGE_MIN_S", "2"))
+LLM_RATE_LIMIT_RPM = float(os.getenv("LLM_RATE_LIMIT_RPM", "0"))
+LLM_RATE_LIMIT_TPM = float(os.getenv("LLM_RATE_LIMIT_TPM", "0"))
+
+# Per-task model routing: LLM_<TASK>_MODEL / _MAX_TOKENS / _TIMEOUT_S / _CONCURRENCY for clarify,
+# controller (decide or draft) and draft (notices and template sections). Each task falls back to LLM_FALLBACK_MODELS, then GROQ_MODEL. With
+# LLM_ADAPTIVE_MAX_TOKENS the max_tokens sent is capped at the observed p99 output length * headroom.
+LLM_SMALL_MODEL = os.getenv("LLM_SMALL_MODEL", "llama-3.1-8b-instant")
+_LLM_TASK_DEFAULTS = {
+    "clarify": {"model": LLM_SMALL_MODEL, "max_tokens": 700, "timeout": 20.0, "concurrency": 16},
+    "controller": {"model": GROQ_MODEL, "max_tokens": 4096, "timeout": LLM_TIMEOUT_S, "concurrency": 16},
+    "draft": {"model": GROQ_MODEL, "max_tokens": 4096, "timeout": LLM_TIMEOUT_S, "concurrency": 16},
+}
+LLM_ROUTES = {
+    task: {
+        "model": os.getenv(f"LLM_{task.upper()}_MODEL", d["model"]),
+        "max_tokens": int(os.getenv(f"LLM_{task.upper()}_MAX_TOKENS", str(d["max_tokens"]))),
+        "timeout": float(os.getenv(f"LLM_{task.upper()}_TIMEOUT_S", str(d["timeout"]))),
+        "concurrency": int(os.getenv(f"LLM_{task.upper()}_CONCURRENCY", str(d["concurrency"]))),
+    }
+    for task, d in _LLM_TASK_DEFAULTS.items()
+}
+LLM_ADAPTIVE_MAX_TOKENS = os.getenv("LLM_ADAPTIVE_MAX_TOKENS", "1").lower() in ("1", "true", "yes")
+LLM_MAX_TOKENS_HEADROOM = float(os.getenv("LLM_MAX_TOKENS_HEADROOM", "1.25"))
+LLM_MAX_TOKENS_MIN_SAMPLES = int(os.getenv("LLM_MAX_TOKENS_MIN_SAMPLES", "30"))
+LLM_MAX_TOKENS_FLOOR = int(os.getenv("LLM_MAX_TOKENS_FLOOR", "256"))
+
+# JSON replies (controller, clarifier) ask for response_format=json_object on non-streamed
+# calls. A model that rejects the parameter is remembered and asked without it from then on.
+LLM_JSON_MODE = os.getenv("LLM_JSON_MODE", "1").lower() in ("1", "true", "yes")
+
+# Concurrency: blocking work (embedding, Chroma, PDF parsing) runs on a bounded
+# thread pool; each stage has its own cap so one stage can't hog the pool.
+BLOCKING_POOL_SIZE = int(os.getenv("BLOCKING_POOL_SIZE", "32"))
+STAGE_CONCURRENCY = {
+    "embed": int(os.getenv("EMBED_CONCURRENCY", "4")),
+    "retrieve": int(os.getenv("RETRIEVE_CONCURRENCY", "8")),
+    "llm": int(os.getenv("LLM_CONCURRENCY", "32")),
+    "ingest": int(os.getenv("INGEST_CONCURRENCY", "1")),
+    "archive": int(os.getenv("ARCHIVE_CONCURRENCY", "2")),
+    "prompt": int(os.getenv("PROMPT_CONCURRENCY", "8")),
+    "upload": int(os.getenv("UPLOAD_CONCURRENCY", "4")),
+}
+
+# Background ingestion jobs run on their own small pool so they can't starve request handling
+INGEST_MAX_JOBS = int(os.getenv("INGEST_MAX_JOBS", "1"))
+INGEST_QUEUE_LIMIT = int(os.getenv("INGEST_QUEUE_LIMIT", "16"))
+INGEST_JOB_HISTORY = int(os.getenv("INGEST_JOB_HISTORY", "200"))
+UPLOAD_CHUNK_BYTES = 1 << 20
+
+# Batch notice generation: items per request, concurrent LLM calls per batch, retries on 429
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+BATCH_MAX_RETRIES = int(os.getenv("BATCH_MAX_RETRIES", "3"))
+
+# Template fast path for well-specified common matters: "off", "hybrid" (LLM writes only the
+# free-text sections) or "strict" (no LLM call). Off by default so notices keep coming from the
+# LLM unless a deployment, or a request's template_mode, opts in.
+TEMPLATE_MODE = os.getenv("TEMPLATE_MODE", "off").lower()
+TEMPLATE_LLM_MAX_TOKENS = int(os.getenv("TEMPLATE_LLM_MAX_TOKENS", "600"))
+
+# Local clarifier: matter type from keyword rules + nearest-centroid embeddings. The LLM
+# clarifier only runs when the local confidence is below CLASSIFIER_MIN_CONFIDENCE.
+LOCAL_CLARIFIER = os.getenv("LOCAL_CLARIFIER", "1").lower() in ("1", "true", "yes")
+CLASSIFIER_MIN_CONFIDENCE = float(os.getenv("CLASSIFIER_MIN_CONFIDENCE", "0.6"))
+
+# /dynamic-draft sessions: retrieval and the controller conversation are kept server-side, so later
+# turns send only new answers. Past SESSION_MAX_TURNS the prompt is rebuilt from scratch to bound it.
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory").lower()  # memory | sqlite
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", str(Path(DB_DIR) / "sessions.sqlite3"))
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "1000"))
+SESSION_TTL = float(os.getenv("SESSION_TTL", "3600"))
+SESSION_MAX_TURNS = int(os.getenv("SESSION_MAX_TURNS", "6"))
+
+# Notice archive: drafts from /generate-notice (single and batch) and /dynamic-draft are kept in
+# SQLite (FTS5) with their metadata, clarifications and context ids, for keyword search and
+# "similar past notices" lookups.
+NOTICE_ARCHIVE = os.getenv("NOTICE_ARCHIVE", "1").lower() in ("1", "true", "yes")
+NOTICE_ARCHIVE_PATH = os.getenv("NOTICE_ARCHIVE_PATH", str(Path(DB_DIR) / "notices.sqlite3"))
+NOTICE_SIMILAR_MIN_SCORE = float(os.getenv("NOTICE_SIMILAR_MIN_SCORE", "0.5"))
+
+# Query embeddings are micro-batched: concurrent encodes arriving within EMBED_BATCH_WINDOW_MS (or until
+# EMBED_MAX_BATCH are waiting) run as one batched encode. A window of 0 disables batching.
+EMBED_BATCH_WINDOW_MS = float(os.getenv("EMBED_BATCH_WINDOW_MS", "3"))
+EMBED_MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", "32"))
+
+# Query caches: embeddings are keyed by normalized text; retrieval results also by k and store version
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "2048"))
+EMBED_CACHE_TTL = float(os.getenv("EMBED_CACHE_TTL", "3600"))
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", "1024"))
+RETRIEVAL_CACHE_TTL = float(os.getenv("RETRIEVAL_CACHE_TTL", "600"))
+# /stats walks DB_DIR for its size only after a store write or once this many seconds have passed
+STORE_BYTES_TTL_S = float(os.getenv("STORE_BYTES_TTL_S", "300"))
+
+# Hybrid retrieval: vector hits fused with BM25 and section-number matches (reciprocal-rank fusion)
+HYBRID_RETRIEVAL = os.getenv("HYBRID_RETRIEVAL", "1").lower() in ("1", "true", "yes")
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "3"))  # candidates per ranker = k * this
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+# Context packing: prompt context is trimmed and packed to a token budget (counted with the local
+# WordPiece tokenizer), so prompt size and prefill time stay predictable
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+CLARIFY_CONTEXT_TOKEN_BUDGET = int(os.getenv("CLARIFY_CONTEXT_TOKEN_BUDGET", "600"))
+CONTEXT_MAX_TOKENS_PER_HIT = int(os.getenv("CONTEXT_MAX_TOKENS_PER_HIT", "400"))
+CONTEXT_DEDUP_THRESHOLD = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.92"))
+
+# Completion cache: "memory", "sqlite" or "off". TTLs are per task (seconds, 0 disables that task).
+LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "memory").lower()
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", str(Path(DB_DIR) / "llm_cache.sqlite3"))
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "512"))
+LLM_CACHE_TTLS = {
+    "clarify": float(os.getenv("LLM_CACHE_TTL_CLARIFY", "86400")),
+    "controller": float(os.getenv("LLM_CACHE_TTL_CONTROLLER", "3600")),
+    "notice": float(os.getenv("LLM_CACHE_TTL_NOTICE", "3600")),
+}
+# Send "X-LLM-Cache: bypass" (or "Cache-Control: no-cache") to force a fresh completion
+LLM_CACHE_BYPASS_HEADER = "x-llm-cache"
 
 if not GROQ_API_KEY:
     # Fail fast with a clear error to the frontend
     raise RuntimeError("GROQ_API_KEY not found in environment. Add it to your .env")
 
-# Embedding model
-embedder = SentenceTransformer("all-MiniLM-L6-v2")
+# Startup: the embedder and the Chroma collection are loaded lazily (first use or background
+# warm-up), so importing this module is fast. With PRELOAD_MODELS=1 the embedder is loaded at
+# import instead, so `gunicorn -k uvicorn.workers.UvicornWorker --preload -w N main:app` loads the
+# weights once in the master and shares them copy-on-write with the forked workers. The Chroma
+# client and the SQLite stores (sessions, LLM cache, notice archive) are always opened per worker,
+# on first use (SQLite handles must not cross a fork).
+EMBED_MODEL_NAME = "all-MiniLM-L6-v2"
+# Embedding inference backend: "torch" (fp32), "onnx" (fp32 ONNX Runtime) or "onnx-int8" (dynamic-quantized
+# ONNX). EMBED_THREADS caps intra-op threads (0 = library default). Compare backends on the ingested
+# corpus with benchmarks/embedding_backends.py before switching.
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "torch").lower()
+EMBED_THREADS = int(os.getenv("EMBED_THREADS", "0"))
+EMBED_ONNX_FILE = os.getenv("EMBED_ONNX_FILE") or None  # override the ONNX graph file within the model repo
+PRELOAD_MODELS = os.getenv("PRELOAD_MODELS", "0").lower() in ("1", "true", "yes")
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "1").lower() in ("1", "true", "yes")
+
+_embedder: Optional[SentenceTransformer] = None
+_collection = None
+_embedder_lock = threading.Lock()
+_collection_lock = threading.Lock()
+_warmup_done = threading.Event()
+_warmup_error: Optional[str] = None
+# Seconds spent per startup stage, reported by /ready
+_startup_timings: Dict[str, float] = {}
+
+
+def _get_embedder() -> SentenceTransformer:
+    global _embedder
+    if _embedder is None:
+        with _embedder_lock:
+            if _embedder is None:
+                t0 = time.perf_counter()
+                _embedder = embeddings.load_embedder(EMBED_MODEL_NAME, EMBED_BACKEND, EMBED_THREADS, EMBED_ONNX_FILE)
+                _startup_timings["embedder_load_s"] = round(time.perf_counter() - t0, 3)
+    return _embedder
+
+
 class ChromaEmbeddingFunction:
     def __call__(self, input):
-        return embedder.encode(input, convert_to_numpy=True).tolist()
+        return _get_embedder().encode(input, convert_to_numpy=True).tolist()
     def name(self):
-        return "all-MiniLM-L6-v2"
+        return EMBED_MODEL_NAME
+
+
+def _get_collection():
+    global _collection
+    if _collection is None:
+        with _collection_lock:
+            if _collection is None:
+                t0 = time.perf_counter()
+                client = chromadb.PersistentClient(path=DB_DIR)
+                _collection = client.get_or_create_collection(
+                    name="legal-notices",
+                    embedding_function=ChromaEmbeddingFunction()
+                )
+                _startup_timings["store_open_s"] = round(time.perf_counter() - t0, 3)
+    return _collection
+
+
+if PRELOAD_MODELS:
+    _get_embedder()
 
-client = chromadb.PersistentClient(path=DB_DIR)
-collection = client.get_or_create_collection(
-    name="legal-notices",
-    embedding_function=ChromaEmbeddingFunction()
+ingest_manifest = ingestion.IngestManifest(Path(DB_DIR) / "ingest_manifest.json")
+lexical_index = bm25.BM25Index(Path(DB_DIR) / "bm25_index.json")
+session_store = sessions.SessionStore(
+    SESSION_CACHE_SIZE, SESSION_TTL, path=SESSION_DB_PATH if SESSION_BACKEND == "sqlite" else None
 )
+archive = notice_archive.NoticeArchive(NOTICE_ARCHIVE_PATH) if NOTICE_ARCHIVE else None
+matter_classifier = classifier.MatterClassifier(encode=lambda texts: _encode_batch(texts, 32))
+
+llm = llm_gateway.LLMGateway(
+    GROQ_API_KEY,
+    base_url=GROQ_BASE_URL,
+    models=[GROQ_MODEL, *LLM_FALLBACK_MODELS],
+    max_connections=LLM_MAX_CONNECTIONS,
+    timeout=LLM_TIMEOUT_S,
+    deadline=LLM_DEADLINE_S,
+    max_retries=LLM_MAX_RETRIES,
+    hedge=LLM_HEDGE,
+    hedge_min_s=LLM_HEDGE_MIN_S,
+    limiter=llm_gateway.TokenBucket(LLM_RATE_LIMIT_RPM, LLM_RATE_LIMIT_TPM),
+)
+llm_router = llm_gateway.TaskRouter(
+    LLM_ROUTES,
+    fallbacks=[*LLM_FALLBACK_MODELS, GROQ_MODEL],
+    adaptive=LLM_ADAPTIVE_MAX_TOKENS,
+    headroom=LLM_MAX_TOKENS_HEADROOM,
+    min_samples=LLM_MAX_TOKENS_MIN_SAMPLES,
+    floor=LLM_MAX_TOKENS_FLOOR,
+)
+# Cache task -> routing task
+_LLM_TASKS = {"clarify": "clarify", "controller": "controller", "notice": "draft"}
+_json_mode_unsupported: set = set()
+
+if LLM_CACHE_BACKEND == "sqlite":
+    llm_cache: Optional[CompletionCache] = CompletionCache(SQLiteCacheBackend(LLM_CACHE_PATH), ttls=LLM_CACHE_TTLS)
+elif LLM_CACHE_BACKEND == "memory":
+    llm_cache = CompletionCache(MemoryCacheBackend(LLM_CACHE_SIZE), ttls=LLM_CACHE_TTLS)
+else:
+    llm_cache = None
+
+_embedding_cache = TTLCache(EMBED_CACHE_SIZE, EMBED_CACHE_TTL)
+_retrieval_cache = TTLCache(RETRIEVAL_CACHE_SIZE, RETRIEVAL_CACHE_TTL)
+# Bumped whenever chunks are written so cached retrieval results go stale
+_store_version = 0
+# Whether the store held any chunks at warm-up or the last version bump; /health reports it without touching the store
+_store_has_chunks = False
+
+
+def _bump_store_version() -> None:
+    global _store_version, _store_has_chunks
+    _store_version += 1
+    _retrieval_cache.clear()
+    _store_has_chunks = _ensure_non_empty_store()
+
+
+def _sync_store() -> None:
+    # Every worker process keeps its own copy of the manifest and BM25 index; pick up the others' writes
+    if ingest_manifest.refresh() | lexical_index.refresh():
+        _bump_store_version()
+
+
+def _store_changed() -> bool:
+    # Two stats, cheap enough for the event loop; the reload itself runs on the pool
+    return ingest_manifest.stale() or lexical_index.stale()
 
-groq_client = Groq(api_key=GROQ_API_KEY)
+
+@contextlib.contextmanager
+def _store_writer():
+    """Serialize index writes across worker processes, starting from whatever the others last wrote."""
+    with ingestion.file_lock(Path(DB_DIR) / "ingest.lock"):
+        _sync_store()
+        try:
+            yield
+        finally:
+            # A failed ingest can leave unsaved BM25 changes, and refresh() never drops those
+            lexical_index.save()
+
+
+_blocking_pool = ThreadPoolExecutor(max_workers=BLOCKING_POOL_SIZE, thread_name_prefix="blocking")
+_ingest_pool = ThreadPoolExecutor(max_workers=max(1, INGEST_MAX_JOBS), thread_name_prefix="ingest")
+_stage_semaphores = {stage: asyncio.Semaphore(max(1, n)) for stage, n in STAGE_CONCURRENCY.items()}
+
+
+async def _run_blocking(stage: str, fn, *args, **kwargs):
+    """Run a blocking call on the worker pool, bounded by the stage's concurrency limit."""
+    async with _stage_semaphores[stage]:
+        loop = asyncio.get_running_loop()
+        # In the request's context, so stage timings recorded by `fn` reach its Server-Timing header
+        ctx = contextvars.copy_context()
+        return await loop.run_in_executor(_blocking_pool, ctx.run, functools.partial(fn, *args, **kwargs))
+
+
+def _llm_cache_allowed(request: Optional[Request]) -> bool:
+    if request is None:
+        return True
+    if request.headers.get(LLM_CACHE_BYPASS_HEADER, "").strip().lower() in ("bypass", "off", "no-cache"):
+        return False
+    return "no-cache" not in request.headers.get("cache-control", "").lower()
+
+
+async def _routed_complete(messages: List[Dict[str, str]], task: str, models: List[str], max_tokens: int, params: Dict[str, Any]):
+    limit = llm_router.limit(task, max_tokens)
+    sent = llm_router.max_tokens(task, max_tokens)
+    async with _stage_semaphores["llm"], llm_router.semaphore(task):
+        with metrics.timed("llm"):
+            resp = await llm.complete(messages, max_tokens=sent, models=models, timeout=llm_router.timeout(task), **params)
+            usage = getattr(resp, "usage", None)
+            if llm_router.observe(task, getattr(usage, "completion_tokens", None), resp.choices[0].finish_reason, sent, limit):
+                # Cut off by the learned cap rather than the caller's limit: redo once with the full limit
+                metrics.record_usage(usage, task)
+                resp = await llm.complete(messages, max_tokens=limit, models=models, timeout=llm_router.timeout(task), **params)
+    metrics.record_usage(getattr(resp, "usage", None), task)
+    return resp
+
+
+def _api_error_body(error: APIStatusError) -> Dict[str, Any]:
+    body = getattr(error, "body", None)
+    if not isinstance(body, dict):
+        return {}
+    return body.get("error") if isinstance(body.get("error"), dict) else body
+
+
+async def _chat_complete(messages: List[Dict[str, str]], max_tokens: int, temperature: float = 0.1, top_p: float = 0.9, cache_task: Optional[str] = None, use_cache: bool = True, json_mode: bool = False) -> str:
+    task = _LLM_TASKS.get(cache_task or "", "draft")
+    models = llm_router.models(task)
+    cache_key = None
+    if llm_cache is not None and cache_task:
+        cache_key = CompletionCache.make_key(models[0], messages, max_tokens=max_tokens, temperature=temperature, top_p=top_p)
+        if use_cache:
+            cached = llm_cache.get(cache_key)
+            if cached is not None:
+                return cached
+    params: Dict[str, Any] = {"temperature": temperature, "top_p": top_p}
+    if json_mode and LLM_JSON_MODE and models[0] not in _json_mode_unsupported:
+        params["response_format"] = {"type": "json_object"}
+    try:
+        resp = await _routed_complete(messages, task, models, max_tokens, params)
+    except APIStatusError as e:
+        if "response_format" not in params or e.status_code != 400:
+            raise
+        err = _api_error_body(e)
+        if err.get("code") == "json_validate_failed" and isinstance(err.get("failed_generation"), str):
+            # JSON mode refused the model's reply; the tolerant parser usually still reads it
+            return err["failed_generation"].strip()
+        if "response_format" not in f"{err.get('message') or ''} {err.get('param') or ''} {e}":
+            raise
+        _json_mode_unsupported.add(models[0])
+        params.pop("response_format")
+        resp = await _routed_complete(messages, task, models, max_tokens, params)
+    text = (resp.choices[0].message.content or "").strip()
+    # A bypassed call still refreshes the cached entry. A fallback model's reply is stored under that
+    # model, so it is never served later as if the primary model had written it.
+    if cache_key and text:
+        answered = getattr(resp, "model", None) or models[0]
+        if answered != models[0]:
+            cache_key = CompletionCache.make_key(answered, messages, max_tokens=max_tokens, temperature=temperature, top_p=top_p)
+        llm_cache.set(cache_key, text, task=cache_task)
+    return text
+
+
+async def _chat_stream(messages: List[Dict[str, str]], max_tokens: int, temperature: float = 0.1, top_p: float = 0.9, cache_task: Optional[str] = None, use_cache: bool = True) -> AsyncIterator[str]:
+    """Yield content deltas as the model produces them. Holds an LLM slot for the whole stream."""
+    task = _LLM_TASKS.get(cache_task or "", "draft")
+    models = llm_router.models(task)
+    cache_key = None
+    if llm_cache is not None and cache_task:
+        cache_key = CompletionCache.make_key(models[0], messages, max_tokens=max_tokens, temperature=temperature, top_p=top_p)
+        if use_cache:
+            cached = llm_cache.get(cache_key)
+            if cached is not None:
+                yield cached
+                return
+    parts: List[str] = []
+    limit = llm_router.limit(task, max_tokens)
+    sent = llm_router.max_tokens(task, max_tokens)
+    usage = finish_reason = answered = None
+    async with _stage_semaphores["llm"], llm_router.semaphore(task):
+        with metrics.timed("llm"):
+            started = time.perf_counter()
+            # aclosing: a consumer that stops early closes the stream (and its HTTP connection) right away
+            async with contextlib.aclosing(llm.stream(messages, max_tokens=sent, models=models, timeout=llm_router.timeout(task), temperature=temperature, top_p=top_p)) as chunks:
+                async for chunk in chunks:
+                    # Groq reports usage on the last chunk, under x_groq
+                    usage = getattr(getattr(chunk, "x_groq", None), "usage", None) or usage
+                    answered = answered or getattr(chunk, "model", None)
+                    if not chunk.choices:
+                        continue
+                    finish_reason = chunk.choices[0].finish_reason or finish_reason
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        if not parts:
+                            metrics.record("llm_ttft", time.perf_counter() - started)
+                        parts.append(delta)
+                        yield delta
+    metrics.record_usage(usage, task)
+    # A streamed answer can't be redone once sent; a cut-off one still raises the learned cap
+    llm_router.observe(task, getattr(usage, "completion_tokens", None), finish_reason, sent, limit)
+    # Only complete streams are cached, stored in the same form _chat_complete would return
+    text = "".join(parts).strip()
+    if cache_key and text:
+        if answered and answered != models[0]:
+            cache_key = CompletionCache.make_key(answered, messages, max_tokens=max_tokens, temperature=temperature, top_p=top_p)
+        llm_cache.set(cache_key, text, task=cache_task)
+
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
 
 app = FastAPI()
 app.add_middleware(
@@ -50,8 +459,28 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
+
+@app.middleware("http")
+async def _request_timing(request: Request, call_next):
+    """
+    Per-request stage timings as a Server-Timing header, plus request histograms for /metrics.
+    Streaming responses send headers first, so their header covers only the work done before
+    the stream starts (retrieval, clarification); the stage histograms still get everything.
+    """
+    timings = metrics.start_request()
+    t0 = time.perf_counter()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - t0
+    route = getattr(request.scope.get("route"), "path", "unmatched")
+    metrics.REGISTRY.observe(metrics.REQUEST_SECONDS, elapsed, route=route, method=request.method)
+    metrics.REGISTRY.inc(metrics.REQUESTS, route=route, method=request.method, status=response.status_code)
+    response.headers["Server-Timing"] = metrics.server_timing({**timings, "total": elapsed})
+    return response
+
+
 class NoticeRequest(BaseModel):
     prompt: str
     senderName: str
@@ -63,9 +492,37 @@ class NoticeRequest(BaseModel):
     urgency: Optional[str] = ""
     k: Optional[int] = 6
     max_tokens: Optional[int] = 4096
+    context_budget: Optional[int] = None  # prompt-context token budget (defaults to CONTEXT_TOKEN_BUDGET)
+    template_mode: Optional[str] = None  # overrides TEMPLATE_MODE for this request
+    matter_type: Optional[str] = None    # skip matter detection: overdue_invoice | rent_default | cheque_bounce
     clarifications: Optional[Dict[str, str]] = None  # NEW: user-provided answers to follow-up questions
 
 
+class BatchNoticeItem(BaseModel):
+    id: Optional[str] = None
+    recipientName: str
+    recipientAddress: Optional[str] = ""
+    deadline: Optional[str] = None       # overrides the shared deadline
+    fields: Optional[Dict[str, str]] = None  # per-recipient facts, e.g. amount, invoice_number
+
+
+class BatchNoticeRequest(BaseModel):
+    prompt: str                          # shared matter description
+    senderName: str
+    senderAddress: Optional[str] = ""
+    jurisdiction: Optional[str] = ""
+    deadline: Optional[str] = ""
+    urgency: Optional[str] = ""
+    k: Optional[int] = 6
+    max_tokens: Optional[int] = 2048
+    context_budget: Optional[int] = None
+    clarifications: Optional[Dict[str, str]] = None  # facts shared by every item
+    template_mode: Optional[str] = None
+    matter_type: Optional[str] = None
+    concurrency: Optional[int] = None
+    items: List[BatchNoticeItem]
+
+
 class ClarifyRequest(BaseModel):
     prompt: str
     senderName: Optional[str] = ""
@@ -79,7 +536,8 @@ class ClarifyRequest(BaseModel):
 
 
 class DynamicRequest(BaseModel):
-    prompt: str
+    prompt: Optional[str] = ""            # required unless session_id is given
+    session_id: Optional[str] = None      # continue a session; prompt, details and context come from it
     senderName: Optional[str] = ""
     recipientName: Optional[str] = ""
     senderAddress: Optional[str] = ""     # NEW
@@ -90,55 +548,142 @@ class DynamicRequest(BaseModel):
     answers: Optional[Dict[str, str]] = None  # accumulated user answers from prior turns
     k: Optional[int] = 6
     max_tokens: Optional[int] = 4096
+    context_budget: Optional[int] = None  # prompt-context token budget (defaults to CONTEXT_TOKEN_BUDGET)
+    template_mode: Optional[str] = None  # overrides TEMPLATE_MODE for this request
+    matter_type: Optional[str] = None    # skip matter detection: overdue_invoice | rent_default | cheque_bounce
 
 
-def _chunk_text_words(text: str, max_words: int = 250) -> List[str]:
-    words = text.split()
-    chunks = []
-    for i in range(0, len(words), max_words):
-        chunk = " ".join(words[i:i + max_words]).strip()
-        if chunk:
-            chunks.append(chunk)
-    return chunks
+class SimilarNoticesRequest(BaseModel):
+    prompt: str
+    k: Optional[int] = 5
+    matter_type: Optional[str] = None    # only notices archived under this matter type
+    min_score: Optional[float] = None    # cosine similarity floor (defaults to NOTICE_SIMILAR_MIN_SCORE)
 
 
-def _extract_pdf_text_chunks(pdf_path: Path, max_words: int = 250) -> List[str]:
-    chunks: List[str] = []
-    reader = PdfReader(str(pdf_path))
-    for page in reader.pages:
-        text = page.extract_text() or ""
-        if not text.strip():
-            continue
-        for c in _chunk_text_words(text, max_words=max_words):
-            chunks.append(c)
-    return chunks
+def _encode_batch(texts: List[str], batch_size: int) -> List[List[float]]:
+    return _get_embedder().encode(texts, batch_size=batch_size, convert_to_numpy=True).tolist()
+
+
+def _count_tokens(text: str) -> int:
+    # WordPiece count from the embedder's own tokenizer, so chunk budgets match what it will embed
+    return len(_get_embedder().tokenizer.tokenize(text))
 
 
-def _ingest_pdf(pdf_path: Path, source_label: Optional[str] = None) -> int:
+def _ingest_pdf(pdf_path: Path, source_label: Optional[str] = None, progress=None, source: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Ingest one PDF through the batched pipeline. Returns throughput stats (pages, chunks, pages/s, chunks/s, ...).
+    Re-ingesting an unchanged file is a no-op ("skipped": true).
+    """
     if not pdf_path.exists() or not pdf_path.is_file():
         raise FileNotFoundError(f"No file found at: {pdf_path}")
-    chunks = _extract_pdf_text_chunks(pdf_path)
-    if not chunks:
-        return 0
-    ids = [str(uuid.uuid4()) for _ in chunks]
-    metadatas = [{
-        "source": str(pdf_path),
-        "source_label": source_label or pdf_path.stem,
-    }] * len(chunks)
-    collection.add(ids=ids, documents=chunks, metadatas=metadatas)
-    return len(chunks)
+    result: Dict[str, Any] = {}
+    with _store_writer():
+        try:
+            result = ingestion.ingest_pdf(pdf_path, _get_collection(), _encode_batch, ingest_manifest, source_label=source_label, count_tokens=_count_tokens, progress=progress, lexical=lexical_index, source=source)
+            return result
+        finally:
+            # Even a partial ingest may have written chunks
+            if not result.get("skipped"):
+                _bump_store_version()
+
+
+def _remove_source(source: str) -> int:
+    with _store_writer():
+        try:
+            return ingestion.remove_source(source, _get_collection(), ingest_manifest, lexical=lexical_index)
+        finally:
+            _bump_store_version()
 
 
 def _ensure_non_empty_store() -> bool:
+    # Metadata only: a count, no embedding and no ANN search
     try:
-        results = collection.query(query_texts=["__ping__"], n_results=1)
-        docs = results.get("documents") or []
-        return bool(docs and docs[0])
+        return _get_collection().count() > 0
     except Exception:
-        # If we cannot query, assume empty so we attempt auto-ingest
+        # If we cannot read the store, assume empty so we attempt auto-ingest
         return False
 
 
+_embedding_dimension: Optional[int] = None
+
+
+def _hnsw_params(collection) -> Dict[str, Any]:
+    params = dict((getattr(collection, "configuration_json", None) or {}).get("hnsw") or {})
+    # Older Chroma releases keep HNSW settings as "hnsw:*" collection metadata
+    params.update({k.split(":", 1)[1]: v for k, v in (collection.metadata or {}).items() if k.startswith("hnsw:")})
+    return params
+
+
+def _dir_bytes(path: Path) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                continue
+    return total
+
+
+# (store version, monotonic time, bytes) of the last DB_DIR walk
+_store_bytes_cache: Tuple[int, float, int] = (-1, 0.0, 0)
+
+
+def _store_bytes() -> int:
+    # The SQLite stores kept in DB_DIR (sessions, LLM cache, archive) grow without bumping the store version, hence the TTL too
+    global _store_bytes_cache
+    version, at, size = _store_bytes_cache
+    if version != _store_version or time.monotonic() - at > STORE_BYTES_TTL_S:
+        version, at = _store_version, time.monotonic()
+        size = _dir_bytes(Path(DB_DIR))
+        _store_bytes_cache = (version, at, size)
+    return size
+
+
+def _store_stats() -> Dict[str, Any]:
+    """Exact index statistics from collection metadata and the ingest manifest; never embeds or searches."""
+    global _embedding_dimension
+    _sync_store()
+    collection = _get_collection()
+    count = collection.count()
+    if _embedding_dimension is None and count:
+        # One stored row gives the dimension without loading the embedder
+        row = collection.get(limit=1, include=["embeddings"]).get("embeddings")
+        if row is not None and len(row):
+            _embedding_dimension = len(row[0])
+    manifest = ingest_manifest.summary()
+    return {
+        "chunks": count,
+        "sources": manifest["sources"],
+        "source_count": len(manifest["sources"]),
+        "source_bytes": manifest["bytes"],
+        "store_bytes": _store_bytes(),
+        "embedding_dimension": _embedding_dimension,
+        "embedding_model": EMBED_MODEL_NAME,
+        "hnsw": _hnsw_params(collection),
+        "last_ingested_at": manifest["last_ingested_at"],
+    }
+
+
+def _rebuild_lexical_index(page_size: int = 1000) -> int:
+    """Build the BM25 index from the collection (stores created before hybrid retrieval existed)."""
+    collection = _get_collection()
+    with _store_writer():
+        lexical_index.clear()
+        offset = 0
+        while True:
+            page = collection.get(limit=page_size, offset=offset, include=["documents", "metadatas"])
+            ids = page.get("ids") or []
+            if not ids:
+                break
+            for doc_id, doc, meta in zip(ids, page.get("documents") or [], page.get("metadatas") or []):
+                meta = meta or {}
+                lexical_index.add(doc_id, doc or "", source=meta.get("source", ""), sections=str(meta.get("sections") or "").split(","))
+            offset += len(ids)
+        lexical_index.save()
+    return offset
+
+
 def _auto_ingest_from_dir():
     auto_dir = os.getenv("AUTO_INGEST_DIR", str(Path(__file__).parent / "data"))
     folder = Path(auto_dir)
@@ -147,67 +692,288 @@ def _auto_ingest_from_dir():
             folder.mkdir(parents=True, exist_ok=True)
         except Exception:
             return
-    if _ensure_non_empty_store():
-        return
-    # Ingest all PDFs if store appears empty
-    for pdf in folder.glob("*.pdf"):
+    # Ingestion is idempotent, so every startup just picks up new or changed PDFs
+    pdfs = sorted(folder.glob("*.pdf"))
+    for pdf in pdfs:
         try:
-            _ingest_pdf(pdf)
+            _ingest_pdf(pdf.resolve())
         except Exception:
             continue
+    # Drop sources from this folder whose files were removed
+    present = {str(p.resolve()) for p in pdfs}
+    root = str(folder.resolve())
+    for source in ingest_manifest.sources():
+        if Path(source).parent == Path(root) and source not in present:
+            try:
+                _remove_source(source)
+            except Exception:
+                continue
+
+
+def _warm_up():
+    """Load the model and store, then auto-ingest. Runs in a background thread; /ready reports when it's done."""
+    global _warmup_error, _store_has_chunks
+    t0 = time.perf_counter()
+    try:
+        t = time.perf_counter()
+        _get_embedder().encode(["warm-up"], convert_to_numpy=True)
+        _startup_timings["embedder_warm_s"] = round(time.perf_counter() - t, 3)
+        _get_collection()
+        _store_has_chunks = _ensure_non_empty_store()
+        # With several workers, one rebuilds and auto-ingests; the rest pick the result up through _sync_store
+        with ingestion.file_lock(Path(DB_DIR) / "warmup.lock", blocking=False) as leader:
+            if not leader:
+                return
+            _sync_store()
+            if HYBRID_RETRIEVAL and len(lexical_index) == 0 and _get_collection().count() > 0:
+                t = time.perf_counter()
+                _rebuild_lexical_index()
+                _startup_timings["lexical_rebuild_s"] = round(time.perf_counter() - t, 3)
+            t = time.perf_counter()
+            _auto_ingest_from_dir()
+            _startup_timings["auto_ingest_s"] = round(time.perf_counter() - t, 3)
+    except Exception as e:
+        _warmup_error = str(e)
+    finally:
+        _startup_timings["warmup_total_s"] = round(time.perf_counter() - t0, 3)
+        _warmup_done.set()
 
 
 @app.on_event("startup")
 def on_startup():
-    _auto_ingest_from_dir()
+    if WARMUP_ON_STARTUP:
+        threading.Thread(target=_warm_up, name="warm-up", daemon=True).start()
+    else:
+        _warmup_done.set()
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    _ingest_pool.shutdown(wait=False, cancel_futures=True)
+    ingestion.shutdown_pool()
+
+
+@app.on_event("shutdown")
+async def close_llm_client():
+    await llm.aclose()
+
+
+@app.on_event("shutdown")
+async def flush_archive():
+    # Notices already returned to clients still get their archive record
+    if _archive_tasks:
+        await asyncio.wait(list(_archive_tasks), timeout=10)
 
 
 @app.get("/health")
 async def health():
+    # Liveness only: never waits on warm-up or on a stage semaphore
+    if _warmup_done.is_set() and _store_changed():
+        # Another worker ingested; its writes reach this one's flag through _sync_store
+        await asyncio.get_running_loop().run_in_executor(_blocking_pool, _sync_store)
     return {
         "status": "ok",
         "model": GROQ_MODEL,
         "db_path": str(Path(DB_DIR).resolve()),
-        "store_ready": _ensure_non_empty_store(),
+        "store_ready": _warmup_done.is_set() and _store_has_chunks,
     }
 
 
-def _format_context_for_prompt(hits):
-    parts = []
-    for i, h in enumerate(hits, 1):
-        src = h.get("metadata", {}).get("source_label") or h.get("metadata", {}).get("source") or "unknown"
-        parts.append(f"[{i}] Source: {src}\n{h['document']}")
-    return "\n\n".join(parts)
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 200 once the embedder, store and auto-ingest warm-up have finished, 503 before that."""
+    body = {
+        "ready": _warmup_done.is_set() and _warmup_error is None,
+        "warming_up": not _warmup_done.is_set(),
+        "error": _warmup_error,
+        "preloaded": PRELOAD_MODELS,
+        "embedder_loaded": _embedder is not None,
+        "embed_backend": EMBED_BACKEND,
+        "store_open": _collection is not None,
+        "timings": _startup_timings,
+    }
+    return JSONResponse(status_code=200 if body["ready"] else 503, content=body)
+
+
+_SENTENCE_RE = re.compile(r"(?<=[.;:])\s+")
+
+
+def _public_hits(hits: List[dict]) -> List[dict]:
+    # Embeddings ride along for context packing but aren't part of the API response
+    return [{k: v for k, v in h.items() if k != "embedding"} for h in hits]
+
+
+def _hit_header(i: int, h: dict) -> str:
+    meta = h.get("metadata", {}) or {}
+    src = meta.get("source_label") or meta.get("source") or "unknown"
+    # Structured chunks carry the Act and provision, which helps the model cite precisely
+    ref = ", ".join(x for x in (
+        meta.get("act") or "",
+        f"{meta.get('provision_type') or 'Section'} {meta['sections'].replace(',', ', ')}" if meta.get("sections") else "",
+    ) if x)
+    return f"[{i}] Source: {src}{' (' + ref + ')' if ref else ''}"
+
+
+def _trim_to_relevant(text: str, query_terms: set, max_tokens: int) -> str:
+    """Keep the opening sentence plus the sentences sharing terms with the query, in order, within max_tokens."""
+    sentences = [x for x in _SENTENCE_RE.split(text.strip()) if x]
+    if not sentences:
+        return ""
+    if query_terms:
+        keep = [i for i, sent in enumerate(sentences) if i == 0 or query_terms & set(bm25.tokenize(sent))]
+        if len(keep) == 1:
+            keep = list(range(len(sentences)))  # nothing matched: fall back to the leading text
+    else:
+        keep = list(range(len(sentences)))
+    out: List[str] = []
+    used = 0
+    prev = -1
+    for i in keep:
+        n = _count_tokens(sentences[i])
+        if used + n > max_tokens:
+            if not out:
+                words = sentences[i].split()
+                out.append(" ".join(words[:max(1, int(len(words) * max_tokens / max(n, 1)))]) + " …")
+            break
+        out.append(("… " if prev >= 0 and i != prev + 1 else "") + sentences[i])
+        used += n
+        prev = i
+    return " ".join(out)
+
+
+@metrics.timed("prompt")
+def _pack_context(hits: List[dict], query: str = "", budget: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Pack retrieved hits into the prompt context within a token budget:
+    near-duplicates (embedding cosine >= CONTEXT_DEDUP_THRESHOLD) are dropped, each hit is trimmed
+    to the sentences relevant to the query, and hits are added in rank order until the budget is spent.
+    """
+    budget = budget if budget and budget > 0 else CONTEXT_TOKEN_BUDGET
+    query_terms = set(bm25.tokenize(query))
+    parts: List[str] = []
+    kept_vecs: List[np.ndarray] = []
+    used = 0
+    duplicates = 0
+    for h in hits:
+        emb = h.get("embedding")
+        if emb is not None:
+            vec = np.asarray(emb, dtype=np.float32)
+            norm = float(np.linalg.norm(vec)) or 1.0
+            vec = vec / norm
+            if any(float(vec @ other) >= CONTEXT_DEDUP_THRESHOLD for other in kept_vecs):
+                duplicates += 1
+                continue
+        header = _hit_header(len(parts) + 1, h)
+        remaining = budget - used - _count_tokens(header)
+        if remaining < 32:
+            break
+        body = _trim_to_relevant(h.get("document") or "", query_terms, min(CONTEXT_MAX_TOKENS_PER_HIT, remaining))
+        if not body:
+            continue
+        block = f"{header}\n{body}"
+        parts.append(block)
+        used += _count_tokens(block)
+        if emb is not None:
+            kept_vecs.append(vec)
+    return {
+        "text": "\n\n".join(parts),
+        "tokens": used,
+        "hits_used": len(parts),
+        "duplicates_dropped": duplicates,
+        "budget": budget,
+    }
 
 
-def _retrieve(prompt: str, k: int = 4):
-    try:
-        results = collection.query(query_texts=[prompt], n_results=k)
-    except Exception:
-        return []
+async def _packed_context(hits: List[dict], query: str = "", budget: Optional[int] = None) -> Dict[str, Any]:
+    # Tokenizing and trimming are CPU work and the first call loads the embedder: keep them off the loop
+    return await _run_blocking("prompt", _pack_context, hits, query, budget)
+
+
+def _context_metadata(packed: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "context_tokens": packed["tokens"],
+        "context_budget": packed["budget"],
+        "context_hits_used": packed["hits_used"],
+        "context_duplicates_dropped": packed["duplicates_dropped"],
+    }
+
+
+def _normalize_query(text: str) -> str:
+    # all-MiniLM-L6-v2 is uncased, so case folding doesn't change the embedding
+    return " ".join((text or "").split()).lower()
+
+
+embed_batcher = embeddings.EmbeddingBatcher(
+    encode=lambda texts: _encode_batch(texts, EMBED_MAX_BATCH),
+    run=lambda fn, texts: _run_blocking("embed", fn, texts),
+    window_ms=EMBED_BATCH_WINDOW_MS,
+    max_batch=EMBED_MAX_BATCH,
+)
+
+
+def _search_store(query: str, embedding: List[float], k: int) -> List[dict]:
+    """Vector search, fused with BM25 and section-number matches when hybrid retrieval is on."""
+    collection = _get_collection()
+    hybrid = HYBRID_RETRIEVAL and len(lexical_index) > 0
+    n_candidates = k * max(1, HYBRID_CANDIDATES) if hybrid else k
+    results = collection.query(query_embeddings=[embedding], n_results=n_candidates, include=["documents", "metadatas", "embeddings"])
     docs = results.get("documents") or [[]]
     ids = results.get("ids") or [[]]
     metas = results.get("metadatas") or [[]]
-    hits = []
+    embs = results.get("embeddings")
+    embs = embs[0] if embs is not None and len(embs) else None
+    by_id: Dict[str, dict] = {}
+    vector_ids: List[str] = []
     for i in range(len(docs[0])):
-        hits.append({"document": docs[0][i], "id": ids[0][i] if ids and ids[0] else None, "metadata": metas[0][i] if metas and metas[0] else {}})
-    return hits
-
-
-def _detect_placeholders_or_gaps(text: str) -> bool:
-    # Simple gap detection from placeholders and common missing items
-    patterns = [
-        r"\[[^\]]+\]",  # [placeholder]
-        r"Invoice\s*#\s*\[", r"\b[0-9]{4}-[0-9]{2}-[0-9]{2}\b",  # date formats OK, but still run clarifier optionally
-        r"\bamount\b.*\b\[", r"\bdue date\b.*\b\[", r"\bcontract\b.*\bdate\b.*\b\[",
-        r"\bproperty address\b.*\b\[", r"\btrademark\b.*\b\[", r"\bregistration\b.*\b\[",
-        r"\bplatform\b.*\b\[", r"\bURL\b.*\b\[", r"\bjurisdiction\b.*\b\[",
-    ]
-    for p in patterns:
-        if re.search(p, text, flags=re.IGNORECASE):
-            return True
-    # Also short or very generic prompts
-    return len(text.strip()) < 80
+        doc_id = ids[0][i]
+        by_id[doc_id] = {"document": docs[0][i], "id": doc_id, "metadata": metas[0][i] if metas and metas[0] else {},
+                         "embedding": embs[i] if embs is not None else None}
+        vector_ids.append(doc_id)
+    if not hybrid:
+        return [by_id[d] for d in vector_ids[:k]]
+
+    # Regex fast path: explicit "Section 138" / "Article 21A" references go straight to those chunks
+    section_ids = lexical_index.section_matches(query, k=k)
+    lexical_ids = [d for d, _ in lexical_index.search(query, k=n_candidates)]
+    fused = bm25.reciprocal_rank_fusion([section_ids, vector_ids, lexical_ids], weights=[2.0, 1.0, 1.0], k=RRF_K)[:k]
+    missing = [d for d in fused if d not in by_id]
+    if missing:
+        extra = collection.get(ids=missing, include=["documents", "metadatas", "embeddings"])
+        extra_embs = extra.get("embeddings")
+        for i, doc_id in enumerate(extra.get("ids") or []):
+            by_id[doc_id] = {"document": extra["documents"][i], "id": doc_id, "metadata": (extra.get("metadatas") or [{}])[i] or {},
+                             "embedding": extra_embs[i] if extra_embs is not None else None}
+    return [by_id[d] for d in fused if d in by_id]
+
+
+async def _query_embedding(query: str) -> List[float]:
+    """Embedding for an already-normalized query, through the embedding cache."""
+    embedding = _embedding_cache.get(query)
+    if embedding is None:
+        with metrics.timed("embed"):
+            embedding = await embed_batcher.embed(query)
+        _embedding_cache.set(query, embedding)
+    return embedding
+
+
+async def _retrieve(prompt: str, k: int = 4):
+    if _store_changed():
+        await _run_blocking("retrieve", _sync_store)
+    query = _normalize_query(prompt)
+    cache_key = (query, k, _store_version)
+    cached = _retrieval_cache.get(cache_key)
+    if cached is not None:
+        return [dict(h) for h in cached]
+    try:
+        embedding = await _query_embedding(query)
+        with metrics.timed("retrieve"):
+            hits = await _run_blocking("retrieve", _search_store, query, embedding, k)
+    except Exception:
+        return []
+    # Only cache under the version the query ran against; an ingest in between makes it stale
+    if cache_key[2] == _store_version:
+        _retrieval_cache.set(cache_key, hits)
+    return [dict(h) for h in hits]
 
 
 def _sanitize_questions(raw_questions: Any) -> List[Dict[str, Any]]:
@@ -228,12 +994,19 @@ def _sanitize_questions(raw_questions: Any) -> List[Dict[str, Any]]:
     return out[:10]
 
 
-def _llm_clarify(prompt: str, hits: List[dict], user_details: Dict[str, str], k: int = 4) -> List[Dict[str, Any]]:
+def _heuristic_questions(prompt: str) -> List[Dict[str, Any]]:
+    # Fallback minimal heuristics
+    matter = classifier.keyword_matter(prompt)
+    return classifier.questions_for(matter)[:8] if matter else []
+
+
+async def _llm_clarify(prompt: str, hits: List[dict], user_details: Dict[str, str], use_cache: bool = True) -> List[Dict[str, Any]]:
     """
     Ask the LLM to return JSON-only list of clarification questions required to draft a formal legal notice.
     Each item: { "id": "string", "label": "string", "placeholder": "string", "required": true, "type": "text"|"date"|"number"|"url" }
+    Raises on model or parse errors; callers fall back to _heuristic_questions.
     """
-    context_block = _format_context_for_prompt(hits) if hits else ""
+    context_block = (await _packed_context(hits, prompt, CLARIFY_CONTEXT_TOKEN_BUDGET))["text"] if hits else ""
     today = datetime.now().strftime("%d %B %Y")
     clarify_prompt = f"""You are an Indian legal assistant preparing to draft a formal legal notice. Given the user's matter description and limited details, identify any essential factual details that are typically required BEFORE drafting.
 
@@ -264,124 +1037,115 @@ Current Date: {today}
 {prompt}
 """
 
+    text = await _chat_complete(
+        messages=[{"role": "system", "content": "Return JSON only. No commentary."},
+                  {"role": "user", "content": clarify_prompt}],
+        max_tokens=700,
+        cache_task="clarify",
+        use_cache=use_cache,
+        json_mode=True,
+    )
+    data = _loads_llm_json(text, "clarify")
+    return _sanitize_questions(data.get("questions") or [])
+
+
+async def _classify(prompt: str) -> Dict[str, Any]:
     try:
-        resp = groq_client.chat.completions.create(
-            messages=[{"role": "system", "content": "Return JSON only. No commentary."},
-                      {"role": "user", "content": clarify_prompt}],
-            model=GROQ_MODEL,
-            max_tokens=700,
-            temperature=0.1,
-            top_p=0.9,
-        )
-        text = (resp.choices[0].message.content or "").strip()
-        # Extract JSON if model wrapped it
-        match = re.search(r"\{.*\}\s*$", text, flags=re.S)
-        json_text = match.group(0) if match else text
-        data = json.loads(json_text)
-        questions = data.get("questions") or []
-        # Sanitize
-        out = []
-        for q in questions:
-            if not isinstance(q, dict): continue
-            qid = str(q.get("id") or q.get("label") or f"q_{len(out)+1}")[:64]
-            out.append({
-                "id": qid,
-                "label": str(q.get("label") or "").strip()[:300] or "Additional detail",
-                "placeholder": str(q.get("placeholder") or "").strip()[:300],
-                "required": bool(q.get("required", True)),
-                "type": q.get("type") if q.get("type") in ("text", "date", "number", "url") else "text",
-            })
-        return out[:10]
+        embedding = await _query_embedding(_normalize_query(prompt))
     except Exception:
-        # Fallback minimal heuristics
-        qs: List[Dict[str, Any]] = []
-        p = prompt.lower()
-        def add(id, label, placeholder="", t="text", required=True):
-            qs.append({"id": id, "label": label, "placeholder": placeholder, "type": t, "required": required})
-        if any(x in p for x in ["invoice", "payment", "overdue"]):
-            add("invoice_number", "Invoice Number", "e.g., INV-2024-001")
-            add("amount_due", "Total Amount Due (currency + amount)", "e.g., INR 45,000", "text")
-            add("original_due", "Original Due Date", "YYYY-MM-DD", "date")
-            add("goods_services", "Goods/Services Description", "e.g., Web design for July")
-        elif any(x in p for x in ["lease", "tenant", "rent", "evict"]):
-            add("property_address", "Property Address", "e.g., Flat 301, ...")
-            add("violation_detail", "Specific Lease Violation(s)", "e.g., late rent for May, unauthorized pet")
-            add("cure_deadline", "Cure Period (days)", "e.g., 7", "number", False)
-        elif any(x in p for x in ["copyright", "dmca"]):
-            add("work_description", "Describe the Copyrighted Work", "e.g., 10 product photos, SKU set A")
-            add("infringement_location", "Where is it Infringing (URL/platform/store)?", "URL or platform", "url")
-            add("first_noticed", "When did you first notice the infringement?", "YYYY-MM-DD", "date", False)
-        elif "trademark" in p:
-            add("mark", "Trademark Name or Mark", "e.g., LEGALMIND")
-            add("registration_no", "Registration Number (if any)", "e.g., 1234567", "text", False)
-            add("infringement_location", "Where is it used (URL/platform/marketplace)?", "URL or location", "url")
-        elif any(x in p for x in ["contract", "breach"]):
-            add("contract_title", "Contract Title/Description", "e.g., Services Agreement")
-            add("contract_date", "Contract Date", "YYYY-MM-DD", "date")
-            add("breach_details", "Breach Details", "e.g., failed delivery by 2024-08-10")
-        elif any(x in p for x in ["harass", "stalk", "threat"]):
-            add("incident_dates", "Incident Dates/Range", "e.g., 2025-08-01 to 2025-08-10", "text")
-            add("channels", "Communication Channels Used", "e.g., phone calls, WhatsApp")
-            add("location", "Location(s) of Incidents", "e.g., outside residence", "text", False)
-
-        return qs[:8]
+        embedding = None
+    return await _run_blocking("embed", matter_classifier.classify, prompt, embedding)
+
+
+async def _clarify_questions(
+    prompt: str,
+    hits: List[dict],
+    user_details: Dict[str, str],
+    facts: Optional[Dict[str, str]] = None,
+    use_cache: bool = True,
+    scan: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Clarification questions, answered locally when the matter type is classified with enough confidence.
+    `scan` is the prompt's gaps.scan() result when the caller already has it.
+    Returns {"questions", "clarifier_source": "local"|"llm"|"heuristic", "matter_type", "confidence", "extracted", "placeholders"}.
+    """
+    scan = scan or gaps.scan(prompt)
+    extracted = gaps.filled(scan)
+    local = await _classify(prompt) if LOCAL_CLARIFIER else {"matter_type": None, "confidence": 0.0}
+    info = {
+        "matter_type": local["matter_type"],
+        "confidence": local["confidence"],
+        "extracted": extracted,
+        "placeholders": [{"text": p["text"], "field": p["field"]} for p in scan["placeholders"]],
+    }
+    if local["matter_type"] and local["confidence"] >= CLASSIFIER_MIN_CONFIDENCE:
+        known = {**extracted, **notice_templates.normalize_facts(facts)}
+        # Only ask when something required is missing; then also offer the optional fields
+        questions = classifier.questions_for(local["matter_type"], known)
+        if not any(q["required"] for q in questions):
+            questions = []
+        return {"questions": questions, "clarifier_source": "local", **info}
+    try:
+        questions = await _llm_clarify(prompt, hits, user_details, use_cache=use_cache)
+        source = "llm"
+    except Exception:
+        questions = _heuristic_questions(prompt)
+        source = "heuristic"
+    return {"questions": questions, "clarifier_source": source, **info}
 
 
 @app.post("/clarify")
-async def clarify(body: ClarifyRequest):
+async def clarify(body: ClarifyRequest, request: Request):
     # If the prompt looks complete, return no questions
-    hits = _retrieve(body.prompt, k=int(body.k or 4))
-    needs = _detect_placeholders_or_gaps(body.prompt)
-    questions = _llm_clarify(
-        body.prompt,
-        hits,
-        {
-            "senderName": body.senderName or "",
-            "recipientName": body.recipientName or "",
-            "jurisdiction": body.jurisdiction or "",
-            "deadline": body.deadline or "",
-            "urgency": body.urgency or "",
-        },
-        k=int(body.k or 4),
-    ) if needs else []
-    return {"needed": len(questions) > 0, "questions": questions}
+    if not gaps.needs_clarification(body.prompt):
+        return {"needed": False, "questions": [], "clarifier_source": None}
+    hits = await _retrieve(body.prompt, k=int(body.k or 4))
+    result = await _clarify_questions(body.prompt, hits, _request_details(body), use_cache=_llm_cache_allowed(request), scan=gaps.scan(body.prompt, needs=True))
+    return {"needed": len(result["questions"]) > 0, **result}
 
 
-@app.post("/generate-notice")
-async def generate_notice(data: NoticeRequest):
+async def _notice_preflight(data: NoticeRequest, use_cache: bool = True) -> Tuple[List[dict], Optional[Dict[str, Any]]]:
+    """
+    Validate, retrieve context and run the gap check shared by the notice endpoints.
+    Returns (hits, gaps.scan() result, or None when the prompt never needed a full scan).
+    """
     # Input validation
     if not data.prompt or len(data.prompt.strip()) < 20:
         raise HTTPException(status_code=400, detail="Prompt is too short. Provide more details.")
 
     # Retrieve context
     k = max(1, min(int(data.k or 6), 10))
-    hits = _retrieve(data.prompt, k=k)
+    hits = await _retrieve(data.prompt, k=k)
 
     # If user didn't provide clarifications and we detect gaps, return questions (interactive flow)
+    scan = None
     if not data.clarifications or len(data.clarifications) == 0:
-        if _detect_placeholders_or_gaps(data.prompt):
-            qs = _llm_clarify(
-                data.prompt,
-                hits,
-                {
-                    "senderName": data.senderName or "",
-                    "recipientName": data.recipientName or "",
-                    "jurisdiction": data.jurisdiction or "",
-                    "deadline": data.deadline or "",
-                    "urgency": data.urgency or "",
-                },
-                k=k,
-            )
-            if qs:
+        if gaps.needs_clarification(data.prompt):
+            scan = gaps.scan(data.prompt, needs=True)
+            result = await _clarify_questions(data.prompt, hits, _request_details(data), use_cache=use_cache, scan=scan)
+            if result["questions"]:
                 # 422 with a structured payload the frontend can handle
                 raise HTTPException(
                     status_code=422,
-                    detail={"code": "NEED_CLARIFICATION", "questions": qs}
+                    detail={"code": "NEED_CLARIFICATION", **result}
                 )
+    return hits, scan
+
 
+def _notice_metadata(data: NoticeRequest, today: str) -> Dict[str, Any]:
+    return {
+        "senderName": data.senderName,
+        "recipientName": data.recipientName,
+        "jurisdiction": data.jurisdiction,
+        "deadline": data.deadline,
+        "urgency": data.urgency,
+        "date": today
+    }
+
+
+def _build_notice_messages(data: NoticeRequest, context_block: str, today: str) -> List[Dict[str, str]]:
     # Build prompt
-    context_block = _format_context_for_prompt(hits) if hits else ""
-    today = datetime.now().strftime("%d %B %Y")
     sender = (data.senderName or "").strip()
     recipient = (data.recipientName or "").strip()
     jurisdiction = (data.jurisdiction or "").strip()
@@ -480,87 +1244,557 @@ Signature:
 Jurisdiction:
 {jurisdiction or '<Jurisdiction>'}
 """
+    return [
+        {"role": "system", "content": "You are a meticulous Indian legal assistant. Draft professional legal notices based on provided context and queries."},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def _request_details(data: Any) -> Dict[str, str]:
+    keys = ("senderName", "recipientName", "senderAddress", "recipientAddress", "jurisdiction", "deadline", "urgency")
+    return {key: (getattr(data, key, "") or "").strip() for key in keys}
+
+
+async def _template_notice(
+    data: Any,
+    facts: Optional[Dict[str, str]],
+    context_block: str,
+    today: str,
+    use_cache: bool = True,
+    prompt: Optional[str] = None,
+    details: Optional[Dict[str, str]] = None,
+    scan: Optional[Dict[str, Any]] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Render the notice from a fixed template when the matter type is known and `facts` cover its required fields.
+    `prompt`/`details` override the ones on `data` (session turns); `scan` is the prompt's gaps.scan() result
+    when the caller already has it. Returns {"notice", "metadata"} or None when the regular LLM path should be used.
+    """
+    prompt = prompt if prompt is not None else data.prompt
+    mode = (getattr(data, "template_mode", None) or TEMPLATE_MODE).lower()
+    if mode not in ("hybrid", "strict"):
+        return None
+    matter = getattr(data, "matter_type", None)
+    if matter not in notice_templates.MATTERS:
+        local = await _classify(prompt)
+        if local["confidence"] < CLASSIFIER_MIN_CONFIDENCE:
+            return None
+        matter = local["matter_type"]
+    if matter not in notice_templates.MATTERS:
+        return None
+    facts = {**gaps.filled(scan or gaps.scan(prompt)), **notice_templates.normalize_facts(facts)}
+    if notice_templates.missing_fields(matter, facts):
+        return None
+
+    background = legal_basis = None
+    if mode == "hybrid":
+        try:
+            text = await _chat_complete(
+                notice_templates.free_text_messages(matter, facts, prompt, context_block),
+                max_tokens=TEMPLATE_LLM_MAX_TOKENS,
+                cache_task="notice",
+                use_cache=use_cache,
+            )
+            background, legal_basis = notice_templates.parse_free_text(text)
+        except Exception:
+            # The stock sections still make a complete notice
+            pass
+    notice = notice_templates.render(matter, facts, details or _request_details(data), today, background, legal_basis)
+    metadata = {"template": matter, "template_mode": mode, "template_llm_sections": bool(background or legal_basis)}
+    flagged = notice_templates.warnings(matter, facts, datetime.now().date())
+    if flagged:
+        metadata["template_warnings"] = flagged
+    return {"notice": notice, "metadata": metadata}
+
+
+# Archive writes still in flight; the loop holds tasks weakly, so they are kept here until done
+_archive_tasks: set = set()
+
+
+def _archive_notice(
+    endpoint: str,
+    prompt: str,
+    notice: str,
+    details: Dict[str, str],
+    metadata: Dict[str, Any],
+    clarifications: Optional[Dict[str, Any]],
+    hits: List[dict],
+    session_id: Optional[str] = None,
+) -> Optional[str]:
+    """
+    Keep a generated notice in the archive. Returns its id at once, or None when archiving is off; the
+    record (embedding, matter type, SQLite insert) is written in the background, off the response path.
+    """
+    if archive is None or not notice.strip():
+        return None
+    notice_id = notice_archive.NoticeArchive.new_id()
+    record = {
+        "id": notice_id,
+        "created_at": time.time(),
+        "endpoint": endpoint,
+        "prompt": prompt,
+        "notice": notice,
+        "matter_type": metadata.get("template"),
+        "sender": details.get("senderName") or "",
+        "recipient": details.get("recipientName") or "",
+        "jurisdiction": details.get("jurisdiction") or "",
+        "metadata": dict(metadata),
+        "clarifications": dict(clarifications or {}),
+        "context_ids": [h["id"] for h in hits if h.get("id")],
+        "session_id": session_id,
+    }
+    task = asyncio.get_running_loop().create_task(_write_archive_record(record))
+    _archive_tasks.add(task)
+    task.add_done_callback(_archive_tasks.discard)
+    return notice_id
+
+
+async def _write_archive_record(record: Dict[str, Any]) -> None:
     try:
-        chat_completion = groq_client.chat.completions.create(
-            messages=[
-                {"role": "system", "content": "You are a meticulous Indian legal assistant. Draft professional legal notices based on provided context and queries."},
-                {"role": "user", "content": prompt}
-            ],
-            model=GROQ_MODEL,
+        embedding = await _query_embedding(_normalize_query(record["prompt"]))
+        if not record["matter_type"]:
+            local = await _classify(record["prompt"])
+            if local["confidence"] >= CLASSIFIER_MIN_CONFIDENCE:
+                record["matter_type"] = local["matter_type"]
+    except Exception:
+        embedding = None
+    try:
+        await _run_blocking("archive", archive.add, record, embedding)
+    except Exception:
+        # Archiving is best effort; the notice has already been sent
+        pass
+
+
+@app.post("/generate-notice")
+async def generate_notice(data: NoticeRequest, request: Request):
+    use_cache = _llm_cache_allowed(request)
+    hits, scan = await _notice_preflight(data, use_cache)
+    today = datetime.now().strftime("%d %B %Y")
+    packed = await _packed_context(hits, data.prompt, data.context_budget)
+    templated = await _template_notice(data, data.clarifications, packed["text"], today, use_cache, scan=scan)
+    if templated:
+        metadata = {**_notice_metadata(data, today), **_context_metadata(packed), **templated["metadata"]}
+        archive_id = _archive_notice("generate-notice", data.prompt, templated["notice"], _request_details(data), metadata, data.clarifications, hits)
+        return {
+            "notice": templated["notice"],
+            "context": _public_hits(hits),
+            "metadata": metadata,
+            "archive_id": archive_id,
+        }
+    try:
+        notice_text = await _chat_complete(
+            messages=_build_notice_messages(data, packed["text"], today),
             max_tokens=int(data.max_tokens or 2048),
-            temperature=0.1,
-            top_p=0.9,
+            cache_task="notice",
+            use_cache=use_cache,
         )
-        notice_text = (chat_completion.choices[0].message.content or "").strip()
         if not notice_text:
             raise RuntimeError("Empty response from model.")
     except HTTPException:
         raise
+    except llm_gateway.LLMUnavailable as e:
+        raise _llm_unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Generation failed: {e}")
 
+    metadata = {**_notice_metadata(data, today), **_context_metadata(packed)}
+    archive_id = _archive_notice("generate-notice", data.prompt, notice_text, _request_details(data), metadata, data.clarifications, hits)
     return {
         "notice": notice_text,
-        "context": hits,
-        "metadata": {
-            "senderName": data.senderName,
-            "recipientName": data.recipientName,
-            "jurisdiction": data.jurisdiction,
-            "deadline": data.deadline,
-            "urgency": data.urgency,
-            "date": today
-        }
+        "context": _public_hits(hits),
+        "metadata": metadata,
+        "archive_id": archive_id,
+    }
+
+
+@app.post("/generate-notice/stream")
+async def generate_notice_stream(data: NoticeRequest, request: Request):
+    """
+    Same as /generate-notice, streamed as Server-Sent Events:
+      event: context  -> {context, metadata}   (sent before the model starts)
+      event: token    -> {text}                (one per model delta)
+      event: done     -> {notice, metadata, archive_id}
+      event: error    -> {detail}
+    Validation and clarification errors are still returned as plain 400/422 responses.
+    """
+    use_cache = _llm_cache_allowed(request)
+    hits, scan = await _notice_preflight(data, use_cache)
+    today = datetime.now().strftime("%d %B %Y")
+    packed = await _packed_context(hits, data.prompt, data.context_budget)
+    metadata = {**_notice_metadata(data, today), **_context_metadata(packed)}
+    messages = _build_notice_messages(data, packed["text"], today)
+
+    async def events():
+        yield _sse("context", {"context": _public_hits(hits), "metadata": metadata})
+        templated = await _template_notice(data, data.clarifications, packed["text"], today, use_cache, scan=scan)
+        if templated:
+            done = {**metadata, **templated["metadata"]}
+            archive_id = _archive_notice("generate-notice", data.prompt, templated["notice"], _request_details(data), done, data.clarifications, hits)
+            yield _sse("token", {"text": templated["notice"]})
+            yield _sse("done", {"notice": templated["notice"], "metadata": done, "archive_id": archive_id})
+            return
+        parts: List[str] = []
+        try:
+            async for delta in _chat_stream(messages, max_tokens=int(data.max_tokens or 2048), cache_task="notice", use_cache=use_cache):
+                parts.append(delta)
+                yield _sse("token", {"text": delta})
+            notice_text = "".join(parts).strip()
+            if not notice_text:
+                raise RuntimeError("Empty response from model.")
+        except Exception as e:
+            yield _sse("error", {"detail": f"Generation failed: {e}"})
+            return
+        archive_id = _archive_notice("generate-notice", data.prompt, notice_text, _request_details(data), metadata, data.clarifications, hits)
+        yield _sse("done", {"notice": notice_text, "metadata": metadata, "archive_id": archive_id})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+def _retry_after_seconds(error: Exception, attempt: int) -> float:
+    server = llm_gateway.retry_after_seconds(error)
+    if server is None and isinstance(error, llm_gateway.LLMUnavailable):
+        server = error.retry_after
+    return server if server is not None else min(30.0, 2.0 ** attempt)
+
+
+def _llm_unavailable(error: llm_gateway.LLMUnavailable) -> HTTPException:
+    # Upstream overloaded or down after retries and fallbacks: a retryable 503, not a 500
+    headers = {"Retry-After": str(max(1, int(error.retry_after)))} if error.retry_after else None
+    return HTTPException(status_code=503, detail={"code": "LLM_UNAVAILABLE", "message": str(error)}, headers=headers)
+
+
+def _batch_item_request(data: BatchNoticeRequest, item: BatchNoticeItem) -> NoticeRequest:
+    facts = {**(data.clarifications or {}), **(item.fields or {})}
+    return NoticeRequest(
+        prompt=data.prompt,
+        senderName=data.senderName,
+        recipientName=item.recipientName,
+        senderAddress=data.senderAddress,
+        recipientAddress=item.recipientAddress,
+        jurisdiction=data.jurisdiction,
+        deadline=item.deadline if item.deadline is not None else data.deadline,
+        urgency=data.urgency,
+        max_tokens=data.max_tokens,
+        clarifications=facts or None,
+        template_mode=data.template_mode,
+        matter_type=data.matter_type,
+    )
+
+
+@app.post("/generate-notice/batch")
+async def generate_notice_batch(data: BatchNoticeRequest, request: Request):
+    """
+    Generate one notice per item for a shared matter, streamed as NDJSON (one JSON object per line):
+      {"type": "batch", "batch_id", "items", "context", "metadata"}   first line
+      {"type": "item", "index", "id", "status": "ok", "notice", "metadata", "archive_id"}
+      {"type": "item", "index", "id", "status": "error", "error"}
+      {"type": "summary", "batch_id", "ok", "failed", "seconds"}       last line
+    Retrieval and context packing run once for the batch; items are generated concurrently and
+    reported as they finish. A call still rate limited after the LLM gateway's own retries pauses every
+    worker for its retry-after, then the item is retried.
+    A failed item does not stop the batch. There is no clarification round, so per-recipient facts go in `fields`.
+    """
+    if not data.prompt or len(data.prompt.strip()) < 20:
+        raise HTTPException(status_code=400, detail="Prompt is too short. Provide more details.")
+    if not data.items:
+        raise HTTPException(status_code=400, detail="No items provided.")
+    if len(data.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Too many items (max {BATCH_MAX_ITEMS}).")
+
+    use_cache = _llm_cache_allowed(request)
+    k = max(1, min(int(data.k or 6), 10))
+    hits = await _retrieve(data.prompt, k=k)
+    packed = await _packed_context(hits, data.prompt, data.context_budget)
+    today = datetime.now().strftime("%d %B %Y")
+    batch_id = uuid.uuid4().hex
+    concurrency = max(1, min(int(data.concurrency or BATCH_CONCURRENCY), BATCH_CONCURRENCY))
+    max_tokens = int(data.max_tokens or 2048)
+    # Every item shares the prompt, so its facts are extracted once for the batch
+    scan = gaps.scan(data.prompt) if (data.template_mode or TEMPLATE_MODE).lower() in ("hybrid", "strict") else None
+
+    async def events():
+        started = time.perf_counter()
+        yield json.dumps({
+            "type": "batch",
+            "batch_id": batch_id,
+            "items": len(data.items),
+            "context": _public_hits(hits),
+            "metadata": {**_context_metadata(packed), "concurrency": concurrency},
+        }) + "\n"
+
+        pending: asyncio.Queue = asyncio.Queue()
+        for index, item in enumerate(data.items):
+            pending.put_nowait((index, item))
+        finished: asyncio.Queue = asyncio.Queue()
+        resume_at = 0.0  # monotonic time until which workers hold off after a 429
+
+        def archived(notice_data: NoticeRequest, item: BatchNoticeItem, notice: str, metadata: Dict[str, Any]) -> Dict[str, Any]:
+            archive_id = _archive_notice(
+                "generate-notice/batch", data.prompt, notice, _request_details(notice_data),
+                {**metadata, "batch_id": batch_id, "batch_item_id": item.id}, notice_data.clarifications, hits,
+            )
+            return {"notice": notice, "metadata": metadata, "archive_id": archive_id}
+
+        async def generate(item: BatchNoticeItem) -> Dict[str, Any]:
+            nonlocal resume_at
+            notice_data = _batch_item_request(data, item)
+            templated = await _template_notice(notice_data, notice_data.clarifications, packed["text"], today, use_cache, scan=scan)
+            if templated:
+                return archived(notice_data, item, templated["notice"], {**_notice_metadata(notice_data, today), **templated["metadata"]})
+            messages = _build_notice_messages(notice_data, packed["text"], today)
+            attempt = 0
+            while True:
+                delay = resume_at - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                try:
+                    text = await _chat_complete(messages, max_tokens=max_tokens, cache_task="notice", use_cache=use_cache)
+                    break
+                except llm_gateway.LLMUnavailable as e:
+                    if attempt >= BATCH_MAX_RETRIES:
+                        raise
+                    resume_at = max(resume_at, time.monotonic() + _retry_after_seconds(e, attempt))
+                    attempt += 1
+            if not text:
+                raise RuntimeError("Empty response from model.")
+            return archived(notice_data, item, text, {**_notice_metadata(notice_data, today), "attempts": attempt + 1})
+
+        async def worker():
+            while True:
+                try:
+                    index, item = pending.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                line: Dict[str, Any] = {"type": "item", "index": index, "id": item.id}
+                try:
+                    line.update({"status": "ok", **await generate(item)})
+                except Exception as e:
+                    line.update({"status": "error", "error": f"Generation failed: {e}"})
+                await finished.put(line)
+
+        workers = [asyncio.create_task(worker()) for _ in range(min(concurrency, len(data.items)))]
+        ok = failed = 0
+        try:
+            for _ in range(len(data.items)):
+                line = await finished.get()
+                if line["status"] == "ok":
+                    ok += 1
+                else:
+                    failed += 1
+                yield json.dumps(line) + "\n"
+        finally:
+            # If the client disconnects, stop issuing LLM calls for the remaining items
+            for w in workers:
+                w.cancel()
+        yield json.dumps({
+            "type": "summary",
+            "batch_id": batch_id,
+            "ok": ok,
+            "failed": failed,
+            "seconds": round(time.perf_counter() - started, 3),
+        }) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson", headers=SSE_HEADERS)
+
+
+# job_id -> job dict; oldest finished jobs are dropped past INGEST_JOB_HISTORY
+_ingest_jobs: Dict[str, Dict[str, Any]] = {}
+
+
+def _public_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in job.items() if not k.startswith("_")}
+
+
+def _run_ingest_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    job["status"] = "running"
+    job["started_at"] = datetime.now().isoformat(timespec="seconds")
+
+    def progress(counters: Dict[str, Any]):
+        job["pages_done"] = counters.get("pages", 0)
+        job["chunks_written"] = counters.get("chunks", 0)
+
+    try:
+        result = _ingest_pdf(Path(job.get("_upload") or job["source"]), source_label=job["label"], progress=progress, source=job["source"])
+        job["result"] = result
+        job["chunks_written"] = result.get("chunks", 0)
+        job["status"] = "done"
+        return result
+    except Exception as e:
+        job["errors"].append(str(e))
+        job["status"] = "error"
+        raise
+    finally:
+        job["finished_at"] = datetime.now().isoformat(timespec="seconds")
+        if job.get("_upload"):
+            shutil.rmtree(Path(job["_upload"]).parent, ignore_errors=True)
+
+
+def _submit_ingest_job(source: Path, label: Optional[str], job_id: Optional[str] = None, upload: Optional[Path] = None) -> Dict[str, Any]:
+    """Queue an ingest of `source`. For uploads, `upload` is the job's own copy of the file, read from and deleted by the job."""
+    active = sum(1 for j in _ingest_jobs.values() if j["status"] in ("queued", "running"))
+    if active >= INGEST_QUEUE_LIMIT:
+        raise HTTPException(status_code=429, detail=f"Too many ingestion jobs in flight ({active}). Try again later.")
+    job = {
+        "id": job_id or uuid.uuid4().hex,
+        "status": "queued",
+        "source": str(source),
+        "label": label,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "pages_done": 0,
+        "chunks_written": 0,
+        "errors": [],
+        "result": None,
     }
+    if upload is not None:
+        job["_upload"] = str(upload)
+    _ingest_jobs[job["id"]] = job
+    finished = [jid for jid, j in _ingest_jobs.items() if j["status"] in ("done", "error")]
+    for jid in finished[:max(0, len(_ingest_jobs) - INGEST_JOB_HISTORY)]:
+        _ingest_jobs.pop(jid, None)
+    job["_future"] = _ingest_pool.submit(_run_ingest_job, job)
+    return job
 
 
 class IngestPathRequest(BaseModel):
     path: str
     label: Optional[str] = None
+    background: Optional[bool] = False  # return a job id instead of waiting for the ingest
 
 
 @app.post("/ingest-path")
 async def ingest_path(body: IngestPathRequest):
     pdf_path = Path(body.path).expanduser().resolve()
+    if not pdf_path.is_file():
+        return {"status": "error", "error": f"No file found at: {pdf_path}"}
+    job = _submit_ingest_job(pdf_path, body.label)
+    if body.background:
+        return {"status": "queued", "job_id": job["id"], "source": str(pdf_path)}
+    try:
+        result = await asyncio.wrap_future(job["_future"])
+        return {"status": "ok", "chunks": result["chunks"], "source": str(pdf_path), "throughput": result, "job_id": job["id"]}
+    except Exception as e:
+        return {"status": "error", "error": str(e), "job_id": job["id"]}
+
+
+class DeleteSourceRequest(BaseModel):
+    path: str
+
+
+@app.post("/delete-source")
+async def delete_source(body: DeleteSourceRequest):
+    source = str(Path(body.path).expanduser().resolve())
     try:
-        count = _ingest_pdf(pdf_path, source_label=body.label)
-        return {"status": "ok", "chunks": count, "source": str(pdf_path)}
+        removed = await _run_blocking("ingest", _remove_source, source)
+        return {"status": "ok", "source": source, "chunks_removed": removed}
     except Exception as e:
         return {"status": "error", "error": str(e)}
 
 
 @app.post("/ingest-file")
 async def ingest_file(file: UploadFile = File(...), label: Optional[str] = Form(None)):
+    """Streams the upload to disk and queues it for ingestion. Poll /ingest-jobs/{job_id} for progress."""
     try:
         tmp_dir = Path(os.getenv("UPLOAD_TMP_DIR", str(Path(__file__).parent / "uploads")))
         tmp_dir.mkdir(parents=True, exist_ok=True)
-        dest = tmp_dir / file.filename
-        with dest.open("wb") as f:
-            f.write(await file.read())
-        count = _ingest_pdf(dest, source_label=label)
-        return {"status": "ok", "chunks": count, "source": str(dest)}
+        name = Path(file.filename or "upload.pdf").name
+        job_id = uuid.uuid4().hex
+        # Each upload keeps its own copy until its job has run, so a later upload with the same name
+        # can't replace bytes a queued job has yet to read
+        job_dir = tmp_dir / job_id
+        job_dir.mkdir()
+        stored = job_dir / name
+        try:
+            partial = job_dir / f"{name}.part"
+            with partial.open("wb") as f:
+                while True:
+                    block = await file.read(UPLOAD_CHUNK_BYTES)
+                    if not block:
+                        break
+                    await _run_blocking("upload", f.write, block)
+            os.replace(partial, stored)
+            # Indexed under the upload's name, so uploading a new version of a file replaces the old one
+            job = _submit_ingest_job(tmp_dir / name, label or stored.stem, job_id, upload=stored)
+        except BaseException:
+            shutil.rmtree(job_dir, ignore_errors=True)
+            raise
+        return {"status": "queued", "job_id": job["id"], "source": job["source"]}
+    except HTTPException:
+        raise
     except Exception as e:
         return {"status": "error", "error": str(e)}
 
 
+@app.get("/ingest-jobs")
+async def list_ingest_jobs():
+    return {"jobs": [_public_job(j) for j in _ingest_jobs.values()]}
+
+
+@app.get("/ingest-jobs/{job_id}")
+async def get_ingest_job(job_id: str):
+    job = _ingest_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown ingestion job.")
+    return _public_job(job)
+
+
+def _sqlite_stats() -> Dict[str, Any]:
+    """Stats of the SQLite-backed stores (sessions, LLM cache, notice archive); these run COUNT queries."""
+    return {
+        "sessions": session_store.stats(),
+        "llm": llm_cache.stats() if llm_cache is not None else None,
+        "notice_archive": archive.stats() if archive is not None else None,
+    }
+
+
 @app.get("/stats")
 async def stats():
     try:
-        results = collection.query(query_texts=["__stat__"], n_results=10)
-        approx = len(results.get("ids", [[]])[0]) if results.get("ids") else 0
-        return {"approx_samples": approx, "db_path": str(Path(DB_DIR).resolve())}
+        store = await _run_blocking("retrieve", _store_stats)
+        persisted = await _run_blocking("retrieve", _sqlite_stats)
+        return {
+            **store,
+            "db_path": str(Path(DB_DIR).resolve()),
+            "store_version": _store_version,
+            "embed_batcher": embed_batcher.stats(),
+            "llm_routes": llm_router.stats(),
+            "notice_archive": persisted["notice_archive"],
+            "cache": {
+                "embeddings": _embedding_cache.stats(),
+                "retrieval": _retrieval_cache.stats(),
+                "llm": persisted["llm"],
+                "sessions": persisted["sessions"],
+            },
+        }
     except Exception as e:
         return {"status": "error", "error": str(e)}
 
 
-def _llm_decide_or_draft(prompt: str, hits: List[dict], user_details: Dict[str, str], answers: Optional[Dict[str, str]] = None, max_tokens: int = 2048) -> Dict[str, Any]:
-    """
-    One-shot controller: the model decides whether more info is required (stage='ask') or can draft now (stage='draft').
-    Returns a dict like:
-      { "stage": "ask", "questions": [...], "missing_fields": [...], "rationale": "..." }
-    or
-      { "stage": "draft", "notice": "text", "used_answers": {...} }
-    """
-    context_block = _format_context_for_prompt(hits) if hits else "No retrieved legal context."
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus text format: stage and request histograms, token and error counters, cache and batcher gauges."""
+    persisted = await _run_blocking("retrieve", _sqlite_stats)
+    caches = {
+        "embeddings": _embedding_cache.stats(),
+        "retrieval": _retrieval_cache.stats(),
+        "sessions": persisted["sessions"],
+    }
+    if persisted["llm"] is not None:
+        caches["llm"] = persisted["llm"]
+    batcher = embed_batcher.stats()
+    extra = [
+        ("legalmind_cache_hits_total", "counter", "Cache hits", [({"cache": n}, c["hits"]) for n, c in caches.items()]),
+        ("legalmind_cache_misses_total", "counter", "Cache misses", [({"cache": n}, c["misses"]) for n, c in caches.items()]),
+        ("legalmind_cache_hit_ratio", "gauge", "Cache hit ratio since start", [({"cache": n}, c["hit_rate"]) for n, c in caches.items()]),
+        ("legalmind_embed_queue_depth", "gauge", "Query encodes waiting for a batch", [({}, batcher["queue_depth"])]),
+        ("legalmind_embed_batches_total", "counter", "Batched query encodes", [({}, batcher["batches"])]),
+        ("legalmind_embed_requests_total", "counter", "Query encodes requested", [({}, batcher["requests"])]),
+        ("legalmind_store_version", "gauge", "Bumped on every store write", [({}, _store_version)]),
+    ]
+    return PlainTextResponse(metrics.REGISTRY.render(extra), media_type="text/plain; version=0.0.4")
+
+
+def _build_controller_messages(prompt: str, context_block: str, user_details: Dict[str, str], answers: Optional[Dict[str, str]] = None) -> List[Dict[str, str]]:
+    context_block = context_block or "No retrieved legal context."
     today = datetime.now().strftime("%d %B %Y")
     answers_block = ""
     if answers:
@@ -658,64 +1892,169 @@ Current Date: {today}
 {answers_block}=== MATTER DESCRIPTION ===
 {prompt}
 """
+    return [
+        {"role": "system", "content": "Return JSON only. No commentary. Ensure valid JSON."},
+        {"role": "user", "content": controller_prompt},
+    ]
+
+
+def _loads_llm_json(text: str, task: str, scanner: Optional[json_repair.ObjectScanner] = None) -> Dict[str, Any]:
+    """First JSON object in an LLM reply, repaired locally when malformed. Raises json_repair.MalformedJSON."""
+    data, repaired = json_repair.parse_scanned(scanner) if scanner is not None else json_repair.loads_object(text)
+    if repaired:
+        metrics.REGISTRY.inc(metrics.JSON_REPAIRS, task=task)
+    return data
+
 
+@metrics.timed("json_parse")
+def _parse_controller_output(raw: str, scanner: Optional[json_repair.ObjectScanner] = None) -> Dict[str, Any]:
+    """
+    Parse the controller JSON into an 'ask' or 'draft' result. Raises on malformed output.
+    `scanner` is the stream's ObjectScanner when the reply was streamed, so it isn't scanned twice.
+    """
+    data = _loads_llm_json(raw, "controller", scanner)
+
+    stage = str(data.get("stage") or "").strip().lower()
+    if stage == "ask":
+        data["questions"] = _sanitize_questions(data.get("questions"))
+        data["missing_fields"] = [str(x)[:64] for x in (data.get("missing_fields") or [])][:12]
+        data["rationale"] = str(data.get("rationale") or "")[:500]
+        return {"stage": "ask", **data}
+    elif stage == "draft":
+        notice_text = str(data.get("notice") or "").strip()
+        if not notice_text:
+            raise ValueError("Empty 'notice' in draft stage.")
+        used_answers = data.get("used_answers") or {}
+        return {"stage": "draft", "notice": notice_text, "used_answers": used_answers}
+    else:
+        # Fallback to ask if stage is unclear
+        return {"stage": "ask", "rationale": "Stage not determinable; asking for essential facts.", "questions": _sanitize_questions([]), "missing_fields": []}
+
+
+async def _controller_fallback(prompt: str, hits: List[dict], user_details: Dict[str, str], error: Exception, use_cache: bool = True) -> Dict[str, Any]:
+    # As a safe fallback, trigger a clarification round with the local/LLM clarifier
+    reason = "parse" if isinstance(error, ValueError) else "llm_error"
+    metrics.REGISTRY.inc(metrics.CONTROLLER_FALLBACKS, step="clarifier", reason=reason)
+    result = await _clarify_questions(prompt, hits, user_details, use_cache=use_cache)
+    return {
+        "stage": "ask",
+        "rationale": f"Parser/LLM error or insufficient info: {str(error)[:120]}",
+        "missing_fields": [q["id"] for q in result["questions"] if q["required"]],
+        "questions": _sanitize_questions(result["questions"]),
+        "clarifier_source": result["clarifier_source"],
+    }
+
+
+async def _llm_decide_or_draft(prompt: str, hits: List[dict], user_details: Dict[str, str], messages: List[Dict[str, str]], max_tokens: int = 2048, use_cache: bool = True) -> Tuple[Dict[str, Any], Optional[str]]:
+    """
+    One-shot controller: the model decides whether more info is required (stage='ask') or can draft now (stage='draft').
+    Returns (result, raw model output or None on fallback); result is a dict like:
+      { "stage": "ask", "questions": [...], "missing_fields": [...], "rationale": "..." }
+    or
+      { "stage": "draft", "notice": "text", "used_answers": {...} }
+    """
     try:
-        resp = groq_client.chat.completions.create(
-            messages=[
-                {"role": "system", "content": "Return JSON only. No commentary. Ensure valid JSON."},
-                {"role": "user", "content": controller_prompt},
-            ],
-            model=GROQ_MODEL,
+        raw = await _chat_complete(
+            messages=messages,
             max_tokens=max_tokens,
-            temperature=0.1,
-            top_p=0.9,
+            cache_task="controller",
+            use_cache=use_cache,
+            json_mode=True,
         )
-        raw = (resp.choices[0].message.content or "").strip()
-        # Try to extract JSON if the model wrapped it
-        m = re.search(r"\{[\s\S]*\}\s*$", raw)
-        json_text = m.group(0) if m else raw
-        data = json.loads(json_text)
-
-        stage = str(data.get("stage") or "").strip().lower()
-        if stage == "ask":
-            data["questions"] = _sanitize_questions(data.get("questions"))
-            data["missing_fields"] = [str(x)[:64] for x in (data.get("missing_fields") or [])][:12]
-            data["rationale"] = str(data.get("rationale") or "")[:500]
-            return {"stage": "ask", **data}
-        elif stage == "draft":
-            notice_text = str(data.get("notice") or "").strip()
-            if not notice_text:
-                raise ValueError("Empty 'notice' in draft stage.")
-            used_answers = data.get("used_answers") or {}
-            return {"stage": "draft", "notice": notice_text, "used_answers": used_answers}
-        else:
-            # Fallback to ask if stage is unclear
-            return {"stage": "ask", "rationale": "Stage not determinable; asking for essential facts.", "questions": _sanitize_questions([]), "missing_fields": []}
     except Exception as e:
-        # As a safe fallback, trigger a clarification round with heuristics/clarifier
-        qs = _llm_clarify(prompt, hits, user_details, k=4)
-        return {
-            "stage": "ask",
-            "rationale": f"Parser/LLM error or insufficient info: {str(e)[:120]}",
-            "missing_fields": [],
-            "questions": _sanitize_questions(qs),
-        }
+        return await _controller_fallback(prompt, hits, user_details, e, use_cache=use_cache), None
+    return await _controller_result(prompt, hits, user_details, raw, use_cache=use_cache)
+
+
+async def _controller_result(
+    prompt: str,
+    hits: List[dict],
+    user_details: Dict[str, str],
+    raw: str,
+    use_cache: bool = True,
+    scanner: Optional[json_repair.ObjectScanner] = None,
+) -> Tuple[Dict[str, Any], Optional[str]]:
+    """
+    (result, raw) for a controller reply. Malformed JSON is repaired locally; when that fails the
+    clarifier takes over, so a bad reply costs at most the one clarifier call.
+    """
+    try:
+        return _parse_controller_output(raw, scanner), raw
+    except ValueError as e:
+        return await _controller_fallback(prompt, hits, user_details, e, use_cache=use_cache), None
 
 
-@app.post("/dynamic-draft")
-async def dynamic_draft(data: DynamicRequest):
+class _ControllerStreamParser:
     """
-    Multi-turn endpoint.
-    - Call with prompt + base details. If info is missing, returns 422 NEED_INFO with {questions, missing_fields, rationale}.
-    - Call again with 'answers' merged from user input; when sufficient, returns 200 with {notice, context, metadata}.
+    Incrementally scans streamed controller JSON. Reports the stage as soon as the
+    "stage" key is seen and, for drafts, decodes the "notice" string as it arrives.
+    The ObjectScanner tracks the reply's JSON object as it streams, for the final parse.
     """
-    if not data.prompt or len(data.prompt.strip()) < 20:
-        raise HTTPException(status_code=400, detail="Prompt is too short. Provide more details.")
-
-    k = max(1, min(int(data.k or 6), 10))
-    hits = _retrieve(data.prompt, k=k)
+    _STAGE_RE = re.compile(r'"stage"\s*:\s*"(ask|draft)"', re.IGNORECASE)
+    _NOTICE_RE = re.compile(r'"notice"\s*:\s*"')
+    _ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+    def __init__(self):
+        self.scanner = json_repair.ObjectScanner()
+        self.stage: Optional[str] = None
+        self._pos: Optional[int] = None  # read position inside the notice string
+        self._notice_closed = False
+
+    def feed(self, delta: str) -> Dict[str, Any]:
+        """Returns {"stage": str} the first time the stage is known and {"text": str} for decoded notice text."""
+        self.scanner.feed(delta)
+        out: Dict[str, Any] = {}
+        if self.stage is None:
+            m = self._STAGE_RE.search(self.buffer)
+            if m:
+                self.stage = m.group(1).lower()
+                out["stage"] = self.stage
+        if self._pos is None:
+            m = self._NOTICE_RE.search(self.buffer)
+            if m:
+                self._pos = m.end()
+        if self._pos is not None and not self._notice_closed:
+            text = self._decode_available()
+            if text:
+                out["text"] = text
+        return out
 
-    user_details = {
+    @property
+    def buffer(self) -> str:
+        return self.scanner.buffer
+
+    def _decode_available(self) -> str:
+        buf, i, parts = self.buffer, self._pos, []
+        while i < len(buf):
+            ch = buf[i]
+            if ch == '"':
+                self._notice_closed = True
+                i += 1
+                break
+            if ch != "\\":
+                parts.append(ch)
+                i += 1
+                continue
+            if i + 1 >= len(buf):
+                break  # wait for the rest of the escape
+            esc = buf[i + 1]
+            if esc == "u":
+                if i + 6 > len(buf):
+                    break
+                try:
+                    parts.append(chr(int(buf[i + 2:i + 6], 16)))
+                except ValueError:
+                    pass
+                i += 6
+            else:
+                parts.append(self._ESCAPES.get(esc, esc))
+                i += 2
+        self._pos = i
+        return "".join(parts)
+
+
+def _dynamic_user_details(data: DynamicRequest) -> Dict[str, str]:
+    return {
         "senderName": data.senderName or "",
         "recipientName": data.recipientName or "",
         "senderAddress": data.senderAddress or "",          # NEW
@@ -725,44 +2064,271 @@ async def dynamic_draft(data: DynamicRequest):
         "urgency": data.urgency or "",
     }
 
-    result = _llm_decide_or_draft(
-        prompt=data.prompt,
+
+def _dynamic_metadata(user_details: Dict[str, str], today: str, used_answers: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    return {
+        **user_details,
+        "date": today,
+        "used_answers": used_answers or {},
+    }
+
+
+def _need_info_detail(result: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "code": "NEED_INFO",
+        "rationale": result.get("rationale") or "",
+        "missing_fields": result.get("missing_fields") or [],
+        "questions": result.get("questions") or [],
+        "clarifier_source": result.get("clarifier_source") or "llm",
+    }
+
+
+def _answers_delta_message(new_answers: Dict[str, str]) -> Dict[str, str]:
+    lines = [f"- {k}: {v}" for k, v in new_answers.items()]
+    return {
+        "role": "user",
+        "content": "New answers provided by the user (earlier answers still apply):\n"
+                   + ("\n".join(lines) if lines else "- (none)")
+                   + "\n\nDecide again with the same rules and return ONLY the JSON object.",
+    }
+
+
+async def _dynamic_session_turn(data: DynamicRequest) -> Tuple[Dict[str, Any], List[Dict[str, str]]]:
+    """
+    Load or start the session for this turn and return (a working copy of the session, controller messages).
+    A new session runs retrieval and builds the full controller prompt. A continued one reuses its
+    context and appends only the new answers to the stored conversation.
+    """
+    answers = {str(k): str(v).strip() for k, v in (data.answers or {}).items() if str(v).strip()}
+    # A private copy: the stored session only changes in _record_turn, once the turn has completed, and
+    # concurrent turns on one session don't write into each other's state
+    session = copy.deepcopy(session_store.get(data.session_id)) if data.session_id else None
+    if data.session_id and session is None:
+        raise HTTPException(status_code=404, detail={"code": "SESSION_NOT_FOUND", "session_id": data.session_id})
+
+    if session is None:
+        if not data.prompt or len(data.prompt.strip()) < 20:
+            raise HTTPException(status_code=400, detail="Prompt is too short. Provide more details.")
+        k = max(1, min(int(data.k or 6), 10))
+        hits = await _retrieve(data.prompt, k=k)
+        packed = await _packed_context(hits, data.prompt, data.context_budget)
+        user_details = _dynamic_user_details(data)
+        session = {
+            "session_id": session_store.new_id(),
+            "created_at": time.time(),
+            "prompt": data.prompt,
+            "user_details": user_details,
+            "context": _public_hits(hits),
+            "context_block": packed["text"],
+            "context_metadata": _context_metadata(packed),
+            # The prompt never changes, so its facts are extracted once for every template attempt
+            "scan": gaps.scan(data.prompt),
+            "answers": answers,
+            "questions": [],
+            "messages": [],
+            "turns": 0,
+        }
+        return session, _build_controller_messages(data.prompt, packed["text"], user_details, answers)
+
+    if "scan" not in session:
+        # Sessions stored before the scan was kept
+        session["scan"] = gaps.scan(session["prompt"])
+    new_answers = {k: v for k, v in answers.items() if session["answers"].get(k) != v}
+    session["answers"].update(new_answers)
+    if session["turns"] >= SESSION_MAX_TURNS or not session["messages"]:
+        # Start the conversation over with everything folded into one prompt
+        messages = _build_controller_messages(session["prompt"], session["context_block"], session["user_details"], session["answers"])
+    else:
+        messages = session["messages"] + [_answers_delta_message(new_answers)]
+    return session, messages
+
+
+def _record_turn(session: Dict[str, Any], messages: List[Dict[str, str]], raw: Optional[str], result: Dict[str, Any]) -> None:
+    if raw is not None:
+        # A rebuilt prompt is just system + user; a continued one carries the earlier turns
+        session["turns"] = 1 if len(messages) <= 2 else session["turns"] + 1
+        session["messages"] = messages + [{"role": "assistant", "content": raw}]
+    else:
+        # The model's reply was unusable, so this turn's answers never entered the conversation; rebuild next time
+        session["messages"] = []
+    session["stage"] = result.get("stage")
+    if result.get("stage") == "ask":
+        session["questions"] = (session["questions"] + (result.get("questions") or []))[-50:]
+    session_store.put(session["session_id"], session)
+
+
+@app.post("/dynamic-draft")
+async def dynamic_draft(data: DynamicRequest, request: Request):
+    """
+    Multi-turn endpoint.
+    - Call with prompt + base details. If info is missing, returns 422 NEED_INFO with {questions, missing_fields, rationale, session_id}.
+    - Call again with session_id and just the new 'answers'; when sufficient, returns 200 with {notice, context, metadata, session_id}.
+      (Calling with the prompt and all accumulated answers and no session_id still works and starts a new session.)
+    """
+    session, messages = await _dynamic_session_turn(data)
+    user_details = session["user_details"]
+    hits = session["context"]
+    today = datetime.now().strftime("%d %B %Y")
+    use_cache = _llm_cache_allowed(request)
+    context_metadata = session["context_metadata"]
+
+    # Answers already cover a known matter type: no need for the controller round trip
+    templated = await _template_notice(
+        data, session["answers"], session["context_block"], today, use_cache,
+        prompt=session["prompt"], details=user_details, scan=session["scan"],
+    )
+    if templated:
+        _record_turn(session, messages, None, {"stage": "draft"})
+        metadata = {**_dynamic_metadata(user_details, today, session["answers"]), **context_metadata, **templated["metadata"]}
+        return {
+            "notice": templated["notice"],
+            "context": hits,
+            "session_id": session["session_id"],
+            "metadata": metadata,
+            "archive_id": _archive_notice("dynamic-draft", session["prompt"], templated["notice"], user_details, metadata, session["answers"], hits, session["session_id"]),
+        }
+
+    result, raw = await _llm_decide_or_draft(
+        prompt=session["prompt"],
         hits=hits,
         user_details=user_details,
-        answers=data.answers or {},
+        messages=messages,
         max_tokens=int(data.max_tokens or 2048),
+        use_cache=use_cache,
     )
+    _record_turn(session, messages, raw, result)
 
     if result.get("stage") == "ask":
-        # Return questions for the client to display and collect answers, then call again with answers included.
-        raise HTTPException(
-            status_code=422,
-            detail={
-                "code": "NEED_INFO",
-                "rationale": result.get("rationale") or "",
-                "missing_fields": result.get("missing_fields") or [],
-                "questions": result.get("questions") or [],
-            },
-        )
+        # Return questions for the client to display and collect answers, then call again with the session_id and answers.
+        raise HTTPException(status_code=422, detail={**_need_info_detail(result), "session_id": session["session_id"]})
 
     # stage == "draft"
     notice_text = result.get("notice") or ""
     if not notice_text.strip():
         raise HTTPException(status_code=500, detail="Draft stage returned empty notice.")
 
-    today = datetime.now().strftime("%d %B %Y")
+    metadata = {**_dynamic_metadata(user_details, today, result.get("used_answers")), **context_metadata}
     return {
         "notice": notice_text,
         "context": hits,
-        "metadata": {
-            "senderName": data.senderName or "",
-            "recipientName": data.recipientName or "",
-            "senderAddress": data.senderAddress or "",          # NEW
-            "recipientAddress": data.recipientAddress or "",    # NEW
-            "jurisdiction": data.jurisdiction or "",
-            "deadline": data.deadline or "",
-            "urgency": data.urgency or "",
-            "date": today,
-            "used_answers": result.get("used_answers") or {},
-        },
+        "session_id": session["session_id"],
+        "metadata": metadata,
+        "archive_id": _archive_notice("dynamic-draft", session["prompt"], notice_text, user_details, metadata, session["answers"], hits, session["session_id"]),
     }
+
+
+@app.post("/dynamic-draft/stream")
+async def dynamic_draft_stream(data: DynamicRequest, request: Request):
+    """
+    Streaming variant of /dynamic-draft (Server-Sent Events):
+      event: context  -> {context, metadata, session_id}
+      event: stage    -> {stage: "ask"|"draft"}  as soon as the model commits to one
+      event: token    -> {text}                  notice text as it is decoded (draft stage only)
+      event: ask      -> NEED_INFO payload       final event when more info is needed
+      event: done     -> {notice, metadata, archive_id}  final event for a draft
+      event: error    -> {detail}
+    """
+    session, messages = await _dynamic_session_turn(data)
+    user_details = session["user_details"]
+    hits = session["context"]
+    today = datetime.now().strftime("%d %B %Y")
+    use_cache = _llm_cache_allowed(request)
+    context_metadata = session["context_metadata"]
+
+    async def events():
+        yield _sse("context", {"context": hits, "session_id": session["session_id"], "metadata": {**_dynamic_metadata(user_details, today), **context_metadata}})
+        templated = await _template_notice(
+            data, session["answers"], session["context_block"], today, use_cache,
+            prompt=session["prompt"], details=user_details, scan=session["scan"],
+        )
+        if templated:
+            _record_turn(session, messages, None, {"stage": "draft"})
+            yield _sse("stage", {"stage": "draft"})
+            yield _sse("token", {"text": templated["notice"]})
+            metadata = {**_dynamic_metadata(user_details, today, session["answers"]), **context_metadata, **templated["metadata"]}
+            archive_id = _archive_notice("dynamic-draft", session["prompt"], templated["notice"], user_details, metadata, session["answers"], hits, session["session_id"])
+            yield _sse("done", {"notice": templated["notice"], "metadata": metadata, "archive_id": archive_id})
+            return
+        parser = _ControllerStreamParser()
+        raw: Optional[str] = None
+        try:
+            async for delta in _chat_stream(messages, max_tokens=int(data.max_tokens or 2048), cache_task="controller", use_cache=use_cache):
+                update = parser.feed(delta)
+                if "stage" in update:
+                    yield _sse("stage", {"stage": update["stage"]})
+                if update.get("text"):
+                    yield _sse("token", {"text": update["text"]})
+        except Exception as e:
+            raw = None
+            result = await _controller_fallback(session["prompt"], hits, user_details, e, use_cache=use_cache)
+        else:
+            result, raw = await _controller_result(
+                session["prompt"], hits, user_details, parser.buffer.strip(), use_cache=use_cache, scanner=parser.scanner,
+            )
+        if result.get("stage") != parser.stage:
+            yield _sse("stage", {"stage": result.get("stage")})
+        _record_turn(session, messages, raw, result)
+
+        if result.get("stage") == "ask":
+            yield _sse("ask", {**_need_info_detail(result), "session_id": session["session_id"]})
+            return
+        notice_text = result.get("notice") or ""
+        if not notice_text.strip():
+            yield _sse("error", {"detail": "Draft stage returned empty notice."})
+            return
+        metadata = {**_dynamic_metadata(user_details, today, result.get("used_answers")), **context_metadata}
+        archive_id = _archive_notice("dynamic-draft", session["prompt"], notice_text, user_details, metadata, session["answers"], hits, session["session_id"])
+        yield _sse("done", {"notice": notice_text, "metadata": metadata, "archive_id": archive_id})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@app.delete("/dynamic-draft/sessions/{session_id}")
+async def delete_dynamic_session(session_id: str):
+    if not session_store.delete(session_id):
+        raise HTTPException(status_code=404, detail={"code": "SESSION_NOT_FOUND", "session_id": session_id})
+    return {"status": "ok", "session_id": session_id}
+
+
+def _require_archive() -> notice_archive.NoticeArchive:
+    if archive is None:
+        raise HTTPException(status_code=404, detail={"code": "ARCHIVE_DISABLED"})
+    return archive
+
+
+@app.get("/notices/search")
+async def search_notices(q: str, limit: int = 20, matter_type: Optional[str] = None):
+    """Keyword search over archived notices (matter description, notice text, parties), best match first."""
+    store = _require_archive()
+    results = await _run_blocking("archive", store.search, q, max(1, min(limit, 100)), matter_type)
+    return {"query": q, "count": len(results), "results": results}
+
+
+@app.post("/notices/similar")
+async def similar_notices(body: SimilarNoticesRequest):
+    """Past notices whose matter description is closest to this one, to adapt instead of drafting from scratch."""
+    store = _require_archive()
+    if not body.prompt or not body.prompt.strip():
+        raise HTTPException(status_code=400, detail="Prompt is required.")
+    embedding = await _query_embedding(_normalize_query(body.prompt))
+    min_score = body.min_score if body.min_score is not None else NOTICE_SIMILAR_MIN_SCORE
+    results = await _run_blocking("archive", store.similar, embedding, max(1, min(int(body.k or 5), 50)), min_score, body.matter_type)
+    return {"count": len(results), "results": results}
+
+
+@app.get("/notices/{notice_id}")
+async def get_notice(notice_id: str):
+    record = await _run_blocking("archive", _require_archive().get, notice_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail={"code": "NOTICE_NOT_FOUND", "notice_id": notice_id})
+    return record
+
+
+@app.delete("/notices/{notice_id}")
+async def delete_notice(notice_id: str):
+    if not await _run_blocking("archive", _require_archive().delete, notice_id):
+        raise HTTPException(status_code=404, detail={"code": "NOTICE_NOT_FOUND", "notice_id": notice_id})
+    return {"status": "ok", "notice_id": notice_id}
+
+
+_startup_timings["import_s"] = round(time.perf_counter() - _import_started, 3)
@@ -0,0 +1,164 @@
+"""
+Request timing and Prometheus-format metrics.
+
+Stage durations (embedding, store query, prompt assembly, LLM time-to-first-token and total
+generation, controller JSON parsing) are recorded into histograms and, for the request being
+served, into a per-request dict that the HTTP middleware turns into a Server-Timing header.
+Counters cover LLM token usage, errors by stage and malformed LLM JSON. render() writes the
+Prometheus text exposition format; no client library is needed.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+STAGE_SECONDS = "legalmind_stage_seconds"
+STAGE_ERRORS = "legalmind_stage_errors_total"
+REQUEST_SECONDS = "legalmind_request_seconds"
+REQUESTS = "legalmind_requests_total"
+LLM_TOKENS = "legalmind_llm_tokens_total"
+JSON_REPAIRS = "legalmind_llm_json_repairs_total"
+CONTROLLER_FALLBACKS = "legalmind_controller_fallbacks_total"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Registry:
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        # name -> labels -> [per-bucket counts..., +Inf count, sum]
+        self._histograms: Dict[str, Dict[Labels, List[float]]] = {}
+
+    def describe(self, name: str, kind: str, help: str) -> None:
+        self._help[name] = (kind, help)
+
+    def inc(self, name: str, value: float = 1.0, **labels: Any) -> None:
+        key = _labels(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        key = _labels(labels)
+        with self._lock:
+            row = self._histograms.setdefault(name, {}).get(key)
+            if row is None:
+                row = self._histograms[name][key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    row[i] += 1
+                    break
+            else:
+                row[len(self.buckets)] += 1
+            row[-1] += value
+
+    def render(self, extra: Iterable[Tuple[str, str, str, List[Tuple[Dict[str, Any], float]]]] = ()) -> str:
+        """
+        Prometheus text format. `extra` adds point-in-time series computed by the caller:
+        (name, "gauge"|"counter", help, [(labels, value), ...]).
+        """
+        lines: List[str] = []
+        with self._lock:
+            counters = {n: dict(s) for n, s in self._counters.items()}
+            histograms = {n: {k: list(r) for k, r in s.items()} for n, s in self._histograms.items()}
+        for name, series in sorted(histograms.items()):
+            self._header(lines, name, "histogram")
+            for key, row in sorted(series.items()):
+                cumulative = 0.0
+                for bound, n in zip(self.buckets, row):
+                    cumulative += n
+                    lines.append(f"{name}_bucket{_fmt(key + (('le', _num(bound)),))} {_num(cumulative)}")
+                count = cumulative + row[len(self.buckets)]
+                lines.append(f"{name}_bucket{_fmt(key + (('le', '+Inf'),))} {_num(count)}")
+                lines.append(f"{name}_sum{_fmt(key)} {row[-1]:.6f}")
+                lines.append(f"{name}_count{_fmt(key)} {_num(count)}")
+        for name, series in sorted(counters.items()):
+            self._header(lines, name, "counter")
+            for key, value in sorted(series.items()):
+                lines.append(f"{name}{_fmt(key)} {_num(value)}")
+        for name, kind, help, points in extra:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in points:
+                lines.append(f"{name}{_fmt(_labels(labels))} {_num(value)}")
+        return "\n".join(lines) + "\n"
+
+    def _header(self, lines: List[str], name: str, default_kind: str) -> None:
+        kind, help = self._help.get(name, (default_kind, name))
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} {kind}")
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _fmt(key: Labels) -> str:
+    if not key:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in key)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(key, escaped)) + "}"
+
+
+def _num(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+REGISTRY = Registry()
+REGISTRY.describe(STAGE_SECONDS, "histogram", "Duration of request stages in seconds")
+REGISTRY.describe(STAGE_ERRORS, "counter", "Errors raised inside a timed stage")
+REGISTRY.describe(REQUEST_SECONDS, "histogram", "HTTP request duration in seconds, until the response starts")
+REGISTRY.describe(REQUESTS, "counter", "HTTP requests by route and status")
+REGISTRY.describe(LLM_TOKENS, "counter", "Tokens reported by the Groq usage field")
+REGISTRY.describe(JSON_REPAIRS, "counter", "LLM replies whose JSON was malformed but repaired locally, by task")
+REGISTRY.describe(CONTROLLER_FALLBACKS, "counter", "Controller replies handed to the clarifier, by step and reason")
+
+# Stage durations of the request being served (seconds, summed when a stage runs more than once)
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+
+def start_request() -> Dict[str, float]:
+    timings: Dict[str, float] = {}
+    _request_timings.set(timings)
+    return timings
+
+
+def record(stage: str, seconds: float) -> None:
+    REGISTRY.observe(STAGE_SECONDS, seconds, stage=stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """Time a block as `stage`; an exception escaping the block is counted against the stage."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    except BaseException as e:
+        if not isinstance(e, GeneratorExit):
+            REGISTRY.inc(STAGE_ERRORS, stage=stage)
+        raise
+    finally:
+        record(stage, time.perf_counter() - t0)
+
+
+def record_usage(usage: Any, task: str) -> None:
+    """Add prompt/completion token counts from a Groq `usage` object (or dict)."""
+    if usage is None:
+        return
+    for kind in ("prompt_tokens", "completion_tokens"):
+        value = usage.get(kind) if isinstance(usage, dict) else getattr(usage, kind, None)
+        if value:
+            REGISTRY.inc(LLM_TOKENS, float(value), task=task, kind=kind.split("_")[0])
+
+
+def server_timing(timings: Dict[str, float]) -> str:
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items())
@@ -0,0 +1,219 @@
+"""
+Persistent archive of generated notices.
+
+Every draft from /generate-notice (single and batch) and /dynamic-draft is kept in SQLite with the
+request details, its metadata, the clarifications that went into it and the ids of the context chunks
+it was drafted from. An FTS5 index over the matter description and notice text serves keyword search
+(falling back to LIKE when the SQLite build has no FTS5). The MiniLM embedding of the matter description is stored
+with each notice, so "similar past notices" is an exact cosine search over an in-memory matrix that
+is loaded once and extended as notices are added (384 float32 values, 1.5 KB, per notice).
+"""
+import json
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from cache import SQLiteHandle
+
+_COLUMNS = (
+    "id, created_at, endpoint, prompt, notice, matter_type, sender, recipient, jurisdiction, "
+    "metadata, clarifications, context_ids, session_id"
+)
+_JSON_COLUMNS = ("metadata", "clarifications", "context_ids")
+
+
+class NoticeArchive:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = SQLiteHandle(path, self._setup)
+        self.fts = True
+        # Similarity index, loaded on first use
+        self._ids: Optional[List[str]] = None
+        self._matters: List[Optional[str]] = []
+        self._vectors: List[np.ndarray] = []
+        self._matrix: Optional[np.ndarray] = None
+
+    def _setup(self, conn: sqlite3.Connection) -> None:
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS notices ("
+            "id TEXT PRIMARY KEY, created_at REAL NOT NULL, endpoint TEXT NOT NULL, prompt TEXT NOT NULL, "
+            "notice TEXT NOT NULL, matter_type TEXT, sender TEXT, recipient TEXT, jurisdiction TEXT, "
+            "metadata TEXT NOT NULL, clarifications TEXT NOT NULL, context_ids TEXT NOT NULL, "
+            "session_id TEXT, embedding BLOB)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS notices_created ON notices (created_at)")
+        try:
+            # External-content index: the text lives once, in notices; triggers keep the index in step
+            conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS notices_fts USING fts5("
+                "prompt, notice, matter_type, sender, recipient, jurisdiction, content='notices', content_rowid='rowid')"
+            )
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS notices_ai AFTER INSERT ON notices BEGIN "
+                "INSERT INTO notices_fts (rowid, prompt, notice, matter_type, sender, recipient, jurisdiction) "
+                "VALUES (new.rowid, new.prompt, new.notice, new.matter_type, new.sender, new.recipient, new.jurisdiction); END"
+            )
+            conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS notices_ad AFTER DELETE ON notices BEGIN "
+                "INSERT INTO notices_fts (notices_fts, rowid, prompt, notice, matter_type, sender, recipient, jurisdiction) "
+                "VALUES ('delete', old.rowid, old.prompt, old.notice, old.matter_type, old.sender, old.recipient, old.jurisdiction); END"
+            )
+        except sqlite3.OperationalError:
+            self.fts = False
+
+    @staticmethod
+    def new_id() -> str:
+        return uuid.uuid4().hex
+
+    def add(self, record: Dict[str, Any], embedding: Optional[Sequence[float]] = None) -> str:
+        """
+        Store one notice. `record` holds endpoint, prompt and notice, and optionally matter_type, sender,
+        recipient, jurisdiction, metadata, clarifications, context_ids and session_id. Returns its id.
+        """
+        notice_id = record.get("id") or self.new_id()
+        vector = _unit(embedding) if embedding is not None else None
+        row = (
+            notice_id,
+            record.get("created_at") or time.time(),
+            record["endpoint"],
+            record["prompt"],
+            record["notice"],
+            record.get("matter_type"),
+            record.get("sender"),
+            record.get("recipient"),
+            record.get("jurisdiction"),
+            json.dumps(record.get("metadata") or {}, ensure_ascii=False, default=str),
+            json.dumps(record.get("clarifications") or {}, ensure_ascii=False, default=str),
+            json.dumps(list(record.get("context_ids") or []), ensure_ascii=False),
+            record.get("session_id"),
+            vector.tobytes() if vector is not None else None,
+        )
+        with self._lock:
+            self._db.connection().execute(f"INSERT INTO notices ({_COLUMNS}, embedding) VALUES ({', '.join('?' * len(row))})", row)
+            if vector is not None and self._ids is not None:
+                self._ids.append(notice_id)
+                self._matters.append(record.get("matter_type"))
+                self._vectors.append(vector)
+                self._matrix = None
+        return notice_id
+
+    def get(self, notice_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.connection().execute(f"SELECT {_COLUMNS} FROM notices WHERE id = ?", (notice_id,)).fetchone()
+        return _record(row) if row else None
+
+    def delete(self, notice_id: str) -> bool:
+        with self._lock:
+            found = self._db.connection().execute("DELETE FROM notices WHERE id = ?", (notice_id,)).rowcount > 0
+            if found and self._ids is not None and notice_id in self._ids:
+                i = self._ids.index(notice_id)
+                del self._ids[i], self._matters[i], self._vectors[i]
+                self._matrix = None
+        return found
+
+    def search(self, query: str, limit: int = 20, matter_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Keyword search over the matter description, notice text and parties, best match first."""
+        terms = re.findall(r"\w+", query or "")
+        if not terms:
+            return []
+        where, params = "", []
+        if matter_type:
+            where, params = " AND n.matter_type = ?", [matter_type]
+        with self._lock:
+            conn = self._db.connection()  # opening it settles self.fts
+            if self.fts:
+                # Each term quoted, so user input can't be read as FTS5 query syntax
+                match = " ".join('"' + t.replace('"', '""') + '"' for t in terms)
+                rows = conn.execute(
+                    f"SELECT {_prefixed('n')}, snippet(notices_fts, -1, '[', ']', '…', 16), bm25(notices_fts) "
+                    f"FROM notices_fts JOIN notices n ON n.rowid = notices_fts.rowid "
+                    f"WHERE notices_fts MATCH ?{where} ORDER BY bm25(notices_fts) LIMIT ?",
+                    [match, *params, limit],
+                ).fetchall()
+            else:
+                like = " AND ".join("(n.prompt LIKE ? OR n.notice LIKE ?)" for _ in terms)
+                rows = conn.execute(
+                    f"SELECT {_prefixed('n')}, substr(n.notice, 1, 200), 0 FROM notices n WHERE {like}{where} "
+                    f"ORDER BY n.created_at DESC LIMIT ?",
+                    [p for t in terms for p in (f"%{t}%", f"%{t}%")] + params + [limit],
+                ).fetchall()
+        return [{**_record(r[:-2]), "snippet": r[-2], "score": round(-float(r[-1]), 4)} for r in rows]
+
+    def similar(
+        self,
+        embedding: Sequence[float],
+        k: int = 5,
+        min_score: float = 0.0,
+        matter_type: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """The k past notices whose matter description is closest (cosine) to `embedding`."""
+        query = _unit(embedding)
+        with self._lock:
+            self._load_vectors()
+            if not self._ids:
+                return []
+            if self._matrix is None:
+                self._matrix = np.vstack(self._vectors)
+            scores = self._matrix @ query
+            if matter_type:
+                scores = np.where(np.array([m == matter_type for m in self._matters]), scores, -np.inf)
+            order = np.argsort(-scores)
+            picked = []
+            for i in order:
+                if len(picked) >= k or scores[i] < min_score:
+                    break
+                picked.append((self._ids[i], float(scores[i])))
+            rows = {
+                r[0]: r for r in self._db.connection().execute(
+                    f"SELECT {_COLUMNS} FROM notices WHERE id IN ({', '.join('?' * len(picked))})", [i for i, _ in picked]
+                ).fetchall()
+            } if picked else {}
+        return [{**_record(rows[i]), "similarity": round(s, 4)} for i, s in picked if i in rows]
+
+    def _load_vectors(self) -> None:
+        if self._ids is not None:
+            return
+        rows = self._db.connection().execute(
+            "SELECT id, matter_type, embedding FROM notices WHERE embedding IS NOT NULL ORDER BY created_at"
+        ).fetchall()
+        self._ids = [r[0] for r in rows]
+        self._matters = [r[1] for r in rows]
+        self._vectors = [np.frombuffer(r[2], dtype=np.float32) for r in rows]
+        self._matrix = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            conn = self._db.connection()
+            count, last = conn.execute("SELECT COUNT(*), MAX(created_at) FROM notices").fetchone()
+            by_endpoint = dict(conn.execute("SELECT endpoint, COUNT(*) FROM notices GROUP BY endpoint").fetchall())
+        return {
+            "path": self.path,
+            "fts": self.fts,
+            "notices": count,
+            "by_endpoint": by_endpoint,
+            "last_created_at": last,
+            "similarity_index_loaded": self._ids is not None,
+        }
+
+
+def _unit(embedding: Sequence[float]) -> np.ndarray:
+    v = np.asarray(embedding, dtype=np.float32).ravel()
+    norm = float(np.linalg.norm(v))
+    return v / norm if norm > 0 else v
+
+
+def _prefixed(alias: str) -> str:
+    return ", ".join(f"{alias}.{c.strip()}" for c in _COLUMNS.split(","))
+
+
+def _record(row: Sequence[Any]) -> Dict[str, Any]:
+    record = dict(zip((c.strip() for c in _COLUMNS.split(",")), row))
+    for key in _JSON_COLUMNS:
+        record[key] = json.loads(record[key]) if record[key] else ({} if key != "context_ids" else [])
+    return record
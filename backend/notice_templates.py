@@ -0,0 +1,309 @@
+"""
+Fixed-skeleton notices for common, well-specified matters (overdue invoice, rent default, cheque bounce).
+
+Once the user's clarifications/answers cover every required field of a matter type, the notice can be
+rendered locally in the same 12-section format the LLM is asked for. In "hybrid" mode the LLM still writes
+the free-text sections (Background / Facts and Legal Basis) with a small token budget; in "strict" mode
+nothing leaves the process.
+"""
+import re
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+
+TEMPLATE_MODES = ("off", "hybrid", "strict")
+
+
+def _field(id: str, label: str, placeholder: str = "", type: str = "text", required: bool = True) -> Dict[str, Any]:
+    return {"id": id, "label": label, "placeholder": placeholder, "type": type, "required": required}
+
+
+# Field ids match the ones the clarifier already asks for, so answers flow straight into templates
+MATTERS: Dict[str, Dict[str, Any]] = {
+    "overdue_invoice": {
+        "label": "Overdue invoice",
+        "fields": [
+            _field("invoice_number", "Invoice Number", "e.g., INV-2024-001"),
+            _field("amount_due", "Total Amount Due (currency + amount)", "e.g., INR 45,000"),
+            _field("original_due", "Original Due Date", "YYYY-MM-DD", "date"),
+            _field("goods_services", "Goods/Services Description", "e.g., Web design for July"),
+            _field("invoice_date", "Invoice Date", "YYYY-MM-DD", "date", False),
+            _field("interest_rate", "Interest on Delayed Payment (% p.a.)", "e.g., 18", "number", False),
+        ],
+        "subject": "Legal Notice for Recovery of Outstanding Dues under Invoice No. {invoice_number}",
+        "facts": [
+            "My client supplied {goods_services} to you and raised Invoice No. {invoice_number}{invoice_date_clause} for {amount_due}.",
+            "The said amount was payable on or before {original_due}. Despite the goods/services having been duly accepted by you, "
+            "the amount remains unpaid as on date, and reminders for payment have gone unanswered.",
+        ],
+        "legal_basis": [
+            "Indian Contract Act, 1872 — Section 73: compensation for loss or damage caused by breach of contract, "
+            "including non-payment of the agreed consideration.",
+            "Where the sender is a registered micro or small enterprise, the Micro, Small and Medium Enterprises Development Act, 2006 "
+            "— Sections 15 and 16: payment within the agreed period (not exceeding 45 days) and compound interest on delayed payments.",
+        ],
+        "demands": [
+            "Pay the outstanding sum of {amount_due} under Invoice No. {invoice_number}{interest_clause}.",
+            "Confirm the payment in writing with the transaction reference.",
+        ],
+        "consequences": "My client shall be constrained to initiate appropriate civil proceedings for recovery of the dues together with "
+                        "interest and costs, entirely at your risk as to costs and consequences.",
+        "deadline": "15 days from receipt of this notice",
+    },
+    "rent_default": {
+        "label": "Rent default",
+        "fields": [
+            _field("property_address", "Property Address", "e.g., Flat 301, ..."),
+            _field("amount_due", "Total Rent Arrears (currency + amount)", "e.g., INR 60,000"),
+            _field("arrears_period", "Period of Unpaid Rent", "e.g., March 2025 to May 2025"),
+            _field("monthly_rent", "Monthly Rent", "e.g., INR 20,000", "text", False),
+            _field("lease_date", "Lease/Rent Agreement Date", "YYYY-MM-DD", "date", False),
+            _field("cure_deadline", "Cure Period (days)", "e.g., 7", "number", False),
+        ],
+        "subject": "Legal Notice for Payment of Rent Arrears in respect of {property_address}",
+        "facts": [
+            "You are in occupation of the premises at {property_address} as a tenant of my client{lease_clause}{monthly_rent_clause}.",
+            "You have failed to pay the rent for the period {arrears_period}, and a sum of {amount_due} is outstanding as on date "
+            "despite repeated requests.",
+        ],
+        "legal_basis": [
+            "Transfer of Property Act, 1882 — Section 108(l): the lessee is bound to pay the rent at the proper time and place.",
+            "Transfer of Property Act, 1882 — Section 111(g) read with Section 106: the lease may be determined on breach of an "
+            "express condition, by notice in writing.",
+        ],
+        "demands": [
+            "Pay the rent arrears of {amount_due} for the period {arrears_period}.",
+            "Pay future rent on time as per the terms of tenancy.",
+        ],
+        "consequences": "My client shall be constrained to terminate the tenancy and initiate proceedings for eviction and recovery of "
+                        "arrears, mesne profits and costs before the appropriate forum.",
+        "deadline": "{cure_deadline_days} from receipt of this notice",
+    },
+    "cheque_bounce": {
+        "label": "Cheque bounce",
+        "fields": [
+            _field("cheque_number", "Cheque Number", "e.g., 004512"),
+            _field("cheque_date", "Cheque Date", "YYYY-MM-DD", "date"),
+            _field("amount_due", "Cheque Amount (currency + amount)", "e.g., INR 1,50,000"),
+            _field("bank_name", "Drawee Bank and Branch", "e.g., HDFC Bank, Andheri East"),
+            _field("dishonour_date", "Date of Dishonour / Return Memo", "YYYY-MM-DD", "date"),
+            _field("dishonour_reason", "Reason for Dishonour", "e.g., Funds Insufficient", "text", False),
+            _field("debt_description", "Debt/Liability the Cheque was Issued For", "e.g., repayment of loan", "text", False),
+        ],
+        "subject": "Statutory Notice under Section 138 of the Negotiable Instruments Act, 1881 — Dishonour of Cheque No. {cheque_number}",
+        "facts": [
+            "Towards discharge of your legally enforceable liability{debt_clause}, you issued Cheque No. {cheque_number} dated "
+            "{cheque_date} for {amount_due}, drawn on {bank_name}, in favour of my client.",
+            "On presentation, the cheque was returned unpaid on {dishonour_date} with the remark \"{dishonour_reason}\".",
+        ],
+        "legal_basis": [
+            "Negotiable Instruments Act, 1881 — Section 138: dishonour of a cheque for insufficiency of funds is an offence where the "
+            "payee demands payment by written notice within 30 days of receiving information of the dishonour and the drawer "
+            "fails to pay within 15 days of receiving that notice.",
+            "Negotiable Instruments Act, 1881 — Section 139: it is presumed that the cheque was issued in discharge of a debt or liability.",
+            "Negotiable Instruments Act, 1881 — Section 142: cognizance of the offence is taken on a written complaint by the payee.",
+        ],
+        "demands": [
+            "Pay the cheque amount of {amount_due} to my client within 15 days of receipt of this notice.",
+        ],
+        "consequences": "On your failure to pay within the statutory period, my client shall file a criminal complaint under "
+                        "Section 138 of the Negotiable Instruments Act, 1881, which is punishable with imprisonment up to two years "
+                        "or a fine up to twice the cheque amount, or both, besides civil proceedings for recovery.",
+        "deadline": "15 days from receipt of this notice (statutory period)",
+    },
+}
+
+# Common alternate names clients use for the same facts
+_ALIASES = {
+    "invoice_no": "invoice_number",
+    "invoice": "invoice_number",
+    "invoice_id": "invoice_number",
+    "amount": "amount_due",
+    "total_amount": "amount_due",
+    "outstanding_amount": "amount_due",
+    "cheque_amount": "amount_due",
+    "rent_arrears": "amount_due",
+    "due_date": "original_due",
+    "services": "goods_services",
+    "description": "goods_services",
+    "address": "property_address",
+    "premises": "property_address",
+    "rent": "monthly_rent",
+    "period": "arrears_period",
+    "months_unpaid": "arrears_period",
+    "check_number": "cheque_number",
+    "cheque_no": "cheque_number",
+    "bank": "bank_name",
+    "return_date": "dishonour_date",
+    "bounce_date": "dishonour_date",
+    "reason": "dishonour_reason",
+}
+
+def normalize_facts(facts: Optional[Dict[str, Any]]) -> Dict[str, str]:
+    out: Dict[str, str] = {}
+    for key, value in (facts or {}).items():
+        value = str(value if value is not None else "").strip()
+        if not value:
+            continue
+        k = re.sub(r"[^a-z0-9]+", "_", str(key).lower()).strip("_")
+        out.setdefault(_ALIASES.get(k, k), value)
+    return out
+
+
+def missing_fields(matter: str, facts: Dict[str, str]) -> List[Dict[str, Any]]:
+    return [dict(f) for f in MATTERS[matter]["fields"] if f["required"] and not facts.get(f["id"])]
+
+
+def questions_for(matter: str, facts: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+    """Clarification questions for the fields of a matter type not already answered."""
+    facts = facts or {}
+    return [dict(f) for f in MATTERS[matter]["fields"] if not facts.get(f["id"])]
+
+
+_DATE_FORMATS = ("%Y-%m-%d", "%d-%m-%Y", "%d/%m/%Y", "%d.%m.%Y", "%d %B %Y", "%d %b %Y", "%B %d, %Y", "%b %d, %Y")
+
+
+def _parse_date(value: str) -> Optional[date]:
+    text = re.sub(r"(\d)(st|nd|rd|th)\b", r"\1", (value or "").strip())
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def warnings(matter: str, facts: Dict[str, str], today: date) -> List[str]:
+    """
+    Problems with the facts the template can't fix, for the drafter to check before the notice is sent.
+    The stock text states the statutory conditions but never asserts that they were met.
+    """
+    out: List[str] = []
+    if matter == "cheque_bounce":
+        dishonoured = _parse_date(facts.get("dishonour_date", ""))
+        if dishonoured is None:
+            out.append("Could not read the dishonour date; confirm the notice goes out within 30 days of the dishonour being reported.")
+        elif dishonoured > today:
+            out.append(f"The dishonour date {dishonoured.isoformat()} is in the future.")
+        elif (today - dishonoured).days > 30:
+            out.append(
+                f"The cheque was dishonoured {(today - dishonoured).days} days ago; a Section 138 notice must be sent within 30 days "
+                "of receiving information of the dishonour, so the statutory remedy may no longer be available."
+            )
+    return out
+
+
+def _values(matter: str, facts: Dict[str, str]) -> Dict[str, str]:
+    v = {f["id"]: facts.get(f["id"], "") for f in MATTERS[matter]["fields"]}
+    v.update(facts)
+    v["invoice_date_clause"] = f" dated {v['invoice_date']}" if v.get("invoice_date") else ""
+    v["interest_clause"] = f", together with interest at {v['interest_rate']}% per annum from {v.get('original_due')} till payment" if v.get("interest_rate") else ""
+    v["lease_clause"] = f" under the rent agreement dated {v['lease_date']}" if v.get("lease_date") else ""
+    v["monthly_rent_clause"] = f", at a monthly rent of {v['monthly_rent']}" if v.get("monthly_rent") else ""
+    v["debt_clause"] = f" towards {v['debt_description']}" if v.get("debt_description") else ""
+    v["dishonour_reason"] = v.get("dishonour_reason") or "Funds Insufficient"
+    days = re.sub(r"\D", "", v.get("cure_deadline") or "")
+    v["cure_deadline_days"] = f"{days} days" if days else "15 days"
+    return v
+
+
+def _bullets(lines: List[str]) -> str:
+    return "\n".join(f"- {l}" for l in lines)
+
+
+def render(
+    matter: str,
+    facts: Dict[str, str],
+    details: Dict[str, str],
+    today: str,
+    background: Optional[str] = None,
+    legal_basis: Optional[str] = None,
+) -> str:
+    """Render the 12-section notice. `background`/`legal_basis` replace the stock text when given."""
+    spec = MATTERS[matter]
+    v = _values(matter, facts)
+    sender = details.get("senderName") or "<Your Name / Firm>"
+    recipient = details.get("recipientName") or "<Recipient Name / Entity>"
+    deadline = details.get("deadline") or spec["deadline"].format(**v)
+    urgency = details.get("urgency") or "Standard"
+    jurisdiction = details.get("jurisdiction") or "<Jurisdiction>"
+    return f"""Date: {today}
+
+From:
+{sender}
+{details.get("senderAddress") or "<Address>"}
+
+To:
+{recipient}
+{details.get("recipientAddress") or "<Address>"}
+
+Subject: {spec["subject"].format(**v)}
+
+Background / Facts:
+{(background or "").strip() or " ".join(s.format(**v) for s in spec["facts"])}
+
+Legal Basis:
+{(legal_basis or "").strip() or _bullets(spec["legal_basis"])}
+
+Demands / Relief Sought:
+{_bullets([d.format(**v) for d in spec["demands"]])}
+
+Response Timeline:
+{deadline} ({urgency})
+
+Consequences of Non-Compliance:
+{spec["consequences"]}
+
+Disclaimer:
+This notice is issued on the basis of the facts and documents made available by my client and without prejudice to all other rights and remedies available to my client in law, all of which are expressly reserved.
+
+Signature:
+{details.get("senderName") or "<Your Name>"}
+<Designation>
+
+Jurisdiction:
+{jurisdiction}"""
+
+
+def free_text_messages(matter: str, facts: Dict[str, str], prompt: str, context_block: str) -> List[Dict[str, str]]:
+    """Prompt for just the free-text sections of a templated notice (hybrid mode)."""
+    fact_lines = "\n".join(f"- {k}: {v}" for k, v in facts.items())
+    stock = _bullets(MATTERS[matter]["legal_basis"])
+    user = f"""Write ONLY the following two sections of a formal Indian legal notice for a {MATTERS[matter]["label"].lower()} matter, in formal legal language. No other sections, no commentary.
+
+Background / Facts:
+<2-4 sentences narrating the facts below in the first person on behalf of "my client">
+
+Legal Basis:
+- <Act Name — Section X: why it applies>
+
+Prefer the provisions below and any precise citations from the context; never invent citations or state that a statutory time limit has been met.
+{stock}
+
+=== CONTEXT ===
+{context_block or "No retrieved legal context."}
+
+=== FACTS ===
+{fact_lines}
+
+=== MATTER DESCRIPTION ===
+{prompt}
+"""
+    return [
+        {"role": "system", "content": "You are a meticulous Indian legal assistant. Output only the requested sections."},
+        {"role": "user", "content": user},
+    ]
+
+
+_SECTION_RE = re.compile(r"^\s*(?:\d+\.\s*)?(Background\s*/\s*Facts|Legal Basis)\s*:?\s*$", re.I | re.M)
+
+
+def parse_free_text(text: str) -> Tuple[Optional[str], Optional[str]]:
+    """Split an LLM reply into (background, legal_basis); either is None when missing."""
+    parts: Dict[str, str] = {}
+    matches = list(_SECTION_RE.finditer(text or ""))
+    for i, m in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        key = "legal" if m.group(1).lower().startswith("legal") else "background"
+        parts[key] = text[m.end():end].strip()
+    return parts.get("background") or None, parts.get("legal") or None
@@ -0,0 +1,76 @@
+"""
+Server-side state for multi-turn /dynamic-draft flows.
+
+A session keeps what the first turn computed (retrieved hits, the packed context, the fixed user
+details) and the running controller conversation, so later turns only send new answers and the
+prompt grows by a delta instead of being rebuilt. Sessions live in an in-process LRU with a TTL;
+with a SQLite path they are also written through to disk, so they survive restarts and can be
+picked up by another worker on the same host.
+"""
+import json
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+from cache import SQLiteHandle, TTLCache
+
+
+class SessionStore:
+    def __init__(self, maxsize: int = 1000, ttl: float = 3600, path: Optional[str] = None):
+        self.ttl = ttl
+        self._memory = TTLCache(maxsize, ttl)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._db: Optional[SQLiteHandle] = SQLiteHandle(path, lambda conn: conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, state TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )) if path else None
+
+    @property
+    def backend(self) -> str:
+        return "sqlite" if self._db is not None else "memory"
+
+    @staticmethod
+    def new_id() -> str:
+        return uuid.uuid4().hex
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        state = self._memory.get(session_id)
+        if state is not None or self._db is None:
+            return state
+        with self._lock:
+            row = self._db.connection().execute("SELECT state, expires_at FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        if row is None or row[1] <= time.time():
+            return None
+        state = json.loads(row[0])
+        self._memory.set(session_id, state)
+        return state
+
+    def put(self, session_id: str, state: Dict[str, Any]) -> None:
+        state["updated_at"] = time.time()
+        self._memory.set(session_id, state)
+        if self._db is None:
+            return
+        now = time.time()
+        with self._lock:
+            self._db.connection().execute(
+                "INSERT OR REPLACE INTO sessions (id, state, expires_at) VALUES (?, ?, ?)",
+                (session_id, json.dumps(state, ensure_ascii=False), now + self.ttl),
+            )
+            self._writes += 1
+            if self._writes % 100 == 0:
+                self._db.connection().execute("DELETE FROM sessions WHERE expires_at <= ?", (now,))
+
+    def delete(self, session_id: str) -> bool:
+        found = self._memory.pop(session_id) is not None
+        if self._db is not None:
+            with self._lock:
+                found = self._db.connection().execute("DELETE FROM sessions WHERE id = ?", (session_id,)).rowcount > 0 or found
+        return found
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {"backend": self.backend, **self._memory.stats()}
+        if self._db is not None:
+            with self._lock:
+                stats["stored"] = self._db.connection().execute("SELECT COUNT(*) FROM sessions WHERE expires_at > ?", (time.time(),)).fetchone()[0]
+        return stats
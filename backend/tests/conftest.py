@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The backend runs from its own directory with flat imports (import gaps, import bm25, ...)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,63 @@
+import pytest
+
+from bm25 import BM25Index, reciprocal_rank_fusion
+
+
+def test_single_ranking_keeps_its_order():
+    assert reciprocal_rank_fusion([["a", "b", "c"]]) == ["a", "b", "c"]
+
+
+def test_documents_ranked_by_several_lists_rise():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["d", "b", "e"]])
+    # b is second in both lists and beats a and d, which are first in one list only; c and e tie last
+    assert fused == ["b", "a", "d", "c", "e"]
+
+
+def test_mirrored_rankings_tie():
+    # Equal scores (1/61 + 1/62 each): ties keep first-seen order
+    assert reciprocal_rank_fusion([["a", "b"], ["b", "a"]]) == ["a", "b"]
+
+
+def test_agreement_beats_a_single_top_rank():
+    # b: 1/(60 + 40) twice = 0.02, against 1/61 = 0.0164 for a
+    rankings = [["a"] + [f"x{i}" for i in range(38)] + ["b"], [f"y{i}" for i in range(39)] + ["b"]]
+    assert reciprocal_rank_fusion(rankings)[:2] == ["b", "a"]
+
+
+def test_weights_favour_a_ranker():
+    rankings = [["vector"], ["lexical"]]
+    assert reciprocal_rank_fusion(rankings, weights=[1.0, 2.0])[0] == "lexical"
+    assert reciprocal_rank_fusion(rankings, weights=[2.0, 1.0])[0] == "vector"
+
+
+def test_smaller_k_favours_top_ranks_over_agreement():
+    rankings = [["a", "x", "y", "b"], ["p", "q", "r", "b"]]
+    assert reciprocal_rank_fusion(rankings, k=60)[0] == "b"  # 2/64 against 1/61
+    assert reciprocal_rank_fusion(rankings, k=1)[0] == "a"  # 2/5 against 1/2
+
+
+@pytest.mark.parametrize("rankings", [[], [[]], [[], []]])
+def test_empty_input(rankings):
+    assert reciprocal_rank_fusion(rankings) == []
+
+
+def test_index_picks_up_another_processes_save(tmp_path):
+    path = tmp_path / "bm25.json"
+    writer, reader = BM25Index(path), BM25Index(path)
+    assert not reader.stale()
+    writer.add("c1", "dishonour of cheque under section 138", source="a.pdf", sections=["138"])
+    writer.save()
+    assert reader.stale() and not writer.stale()
+    assert reader.refresh() and not reader.refresh()
+    assert [d for d, _ in reader.search("cheque dishonour")] == ["c1"]
+    assert reader.section_matches("Section 138") == ["c1"]
+
+
+def test_refresh_keeps_unsaved_changes(tmp_path):
+    path = tmp_path / "bm25.json"
+    writer, reader = BM25Index(path), BM25Index(path)
+    writer.add("c1", "eviction notice", source="a.pdf")
+    writer.save()
+    reader.add("c2", "tenancy deposit", source="b.pdf")
+    assert not reader.refresh()
+    assert [d for d, _ in reader.search("tenancy")] == ["c2"]
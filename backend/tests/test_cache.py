@@ -0,0 +1,87 @@
+import types
+
+import pytest
+
+import cache
+from cache import CompletionCache, MemoryCacheBackend, SQLiteCacheBackend, TTLCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = {"t": 1000.0}
+    monkeypatch.setattr(cache, "time", types.SimpleNamespace(monotonic=lambda: now["t"], time=lambda: now["t"]))
+    return now
+
+
+def test_lru_eviction_keeps_recently_used():
+    c = TTLCache(maxsize=2)
+    c.set("a", 1)
+    c.set("b", 2)
+    assert c.get("a") == 1
+    c.set("c", 3)  # evicts b, the least recently used
+    assert c.get("b") is None and c.get("a") == 1 and c.get("c") == 3
+    assert c.stats()["evictions"] == 1
+
+
+def test_entries_expire(clock):
+    c = TTLCache(maxsize=10, ttl=60)
+    c.set("a", 1)
+    c.set("forever", 2, ttl=0)
+    clock["t"] += 59
+    assert c.get("a") == 1
+    clock["t"] += 1
+    assert c.get("a") is None and c.get("forever") == 2
+    stats = c.stats()
+    assert stats["expirations"] == 1 and stats["hits"] == 2 and stats["misses"] == 1
+
+
+def test_zero_size_cache_stores_nothing():
+    c = TTLCache(maxsize=0)
+    c.set("a", 1)
+    assert len(c) == 0 and c.get("a", "default") == "default"
+
+
+def test_key_covers_model_messages_and_params():
+    messages = [{"role": "user", "content": "Draft a notice"}]
+    key = CompletionCache.make_key("m1", messages, temperature=0.2, max_tokens=100)
+    assert key == CompletionCache.make_key("m1", list(messages), max_tokens=100, temperature=0.2)
+    assert key != CompletionCache.make_key("m2", messages, temperature=0.2, max_tokens=100)
+    assert key != CompletionCache.make_key("m1", messages, temperature=0.3, max_tokens=100)
+    assert key != CompletionCache.make_key("m1", [{"role": "user", "content": "Draft a notice."}], temperature=0.2, max_tokens=100)
+
+
+@pytest.mark.parametrize("make_backend", [lambda tmp: MemoryCacheBackend(8), lambda tmp: SQLiteCacheBackend(str(tmp / "llm.sqlite3"))])
+def test_completion_cache_ttls_per_task(tmp_path, clock, make_backend):
+    completions = CompletionCache(make_backend(tmp_path), ttls={"clarify": 100, "notice": 0})
+    completions.set("k1", "questions", task="clarify")
+    completions.set("k2", "draft", task="notice")  # ttl 0: never cached
+    assert completions.get("k1") == "questions" and completions.get("k2") is None
+    clock["t"] += 101
+    assert completions.get("k1") is None
+    assert completions.stats()["hits"] == 1 and completions.stats()["misses"] == 2
+
+
+def test_sqlite_backend_opens_lazily_and_persists(tmp_path):
+    path = tmp_path / "llm.sqlite3"
+    backend = SQLiteCacheBackend(str(path))
+    assert not path.exists()
+    backend.set("k", "v", ttl=None)
+    assert SQLiteCacheBackend(str(path)).get("k") == "v"
+
+
+def test_broken_backend_never_fails_a_call():
+    class Broken:
+        name = "broken"
+
+        def get(self, key):
+            raise OSError("disk gone")
+
+        def set(self, key, value, ttl):
+            raise OSError("disk gone")
+
+        def size(self):
+            raise OSError("disk gone")
+
+    completions = CompletionCache(Broken())
+    completions.set("k", "v")
+    assert completions.get("k") is None and completions.stats()["size"] is None
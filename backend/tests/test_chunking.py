@@ -0,0 +1,61 @@
+import chunking
+
+SEPARATOR = " " * 30
+NI_ACT = [
+    (0, "THE NEGOTIABLE INSTRUMENTS ACT, 1881\nCHAPTER XVII\nOF PENALTIES IN CASE OF DISHONOUR\n"
+        "138. Dishonour of cheque for insufficiency, etc., of funds in the account.—Where any cheque drawn by a person\n"
+        "on an account maintained by him is returned by the bank unpaid, such person shall be deemed to have committed an offence.\n"
+        "Provided that nothing contained in this section shall apply unless—\n"
+        "(a) the cheque has been presented to the bank within a period of three months;\n"
+        f"{SEPARATOR}\n1. Subs. by Act 66 of 1988.\n"),
+    (1, "12\n(b) the payee makes a demand for the payment of the said amount of money by giving a notice in writing within thirty days.\n"
+        "139. Presumption in favour of holder.—It shall be presumed, unless the contrary is proved, that the holder received the cheque.\n"
+        "140. Defence which may not be allowed.—It shall not be a defence that the drawer had no reason to believe.\n"),
+]
+
+
+def chunks(pages, **kw):
+    return list(chunking.iter_structured_chunks(pages, **{"max_tokens": 60, "overlap_tokens": 10, "min_tokens": 5, **kw}))
+
+
+def test_provisions_carry_act_chapter_and_section():
+    by_section = {}
+    for c in chunks(NI_ACT):
+        assert c["act"] == "The Negotiable Instruments Act, 1881"
+        by_section.setdefault(c["section"], []).append(c)
+    assert {"138", "139", "140"} <= set(by_section)
+    first = by_section["138"][0]
+    assert first["provision_type"] == "Section" and first["chapter"] == "Chapter XVII"
+    assert first["title"] == "Dishonour of cheque for insufficiency, etc., of funds in the account"
+
+
+def test_provision_continues_across_a_page_break():
+    section_138 = [c for c in chunks(NI_ACT) if c["section"] == "138"]
+    assert section_138[0]["page_start"] == 0 and section_138[-1]["page_end"] == 1
+    # Later chunks repeat the heading so they read on their own
+    assert all(c["text"].startswith("Section 138. Dishonour of cheque") for c in section_138[1:])
+
+
+def test_page_numbers_and_footnotes_are_dropped():
+    text = "\n".join(c["text"] for c in chunks(NI_ACT))
+    assert "Subs. by Act" not in text
+    assert "\n12\n" not in text and not text.startswith("12")
+
+
+def test_chunks_fit_the_budget():
+    assert all(c["tokens"] <= 60 for c in chunks(NI_ACT))
+
+
+def test_small_provisions_merge_with_their_neighbours():
+    pages = [(0, NI_ACT[1][1].split("\n", 2)[2])]  # sections 139 and 140, 27 and 25 tokens
+    (merged,) = chunks(pages, min_tokens=30)
+    assert merged["sections"] == "139,140" and merged["section"] == "139"
+    assert merged["title"] == "Presumption in favour of holder"
+
+
+def test_constitution_provisions_are_articles():
+    pages = [(0, "THE CONSTITUTION OF INDIA\n21. Protection of life and personal liberty.—No person shall be deprived of "
+                 "his life or personal liberty except according to procedure established by law.\n")]
+    (chunk,) = chunks(pages, min_tokens=48)  # the act heading is merged into the article
+    assert chunk["act"] == "The Constitution of India"
+    assert chunk["provision_type"] == "Article" and chunk["section"] == "21"
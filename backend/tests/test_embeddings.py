@@ -0,0 +1,73 @@
+import asyncio
+import gc
+
+from embeddings import EmbeddingBatcher
+
+
+def encode(texts):
+    return [[float(len(t))] for t in texts]
+
+
+async def run(fn, *args):
+    await asyncio.sleep(0)
+    return fn(*args)
+
+
+def test_concurrent_requests_share_one_encode():
+    async def main():
+        batcher = EmbeddingBatcher(encode, run, window_ms=5, max_batch=32)
+        rows = await asyncio.gather(*(batcher.embed(t) for t in ["a", "bb", "a", "cccc"]))
+        return batcher, rows
+
+    batcher, rows = asyncio.run(main())
+    assert rows == [[1.0], [2.0], [1.0], [4.0]]
+    assert batcher.batches == 1 and batcher.items == 3  # the repeated "a" is encoded once
+    assert batcher.max_queue_depth == 4
+
+
+def test_full_batch_flushes_without_waiting_for_the_window():
+    async def main():
+        batcher = EmbeddingBatcher(encode, run, window_ms=10_000, max_batch=2)
+        rows = await asyncio.wait_for(asyncio.gather(batcher.embed("a"), batcher.embed("bb")), 1)
+        return batcher, rows
+
+    batcher, rows = asyncio.run(main())
+    assert rows == [[1.0], [2.0]] and batcher.largest_batch == 2
+
+
+def test_disabled_batcher_encodes_each_call():
+    async def main():
+        batcher = EmbeddingBatcher(encode, run, window_ms=0)
+        await asyncio.gather(batcher.embed("a"), batcher.embed("b"))
+        return batcher
+
+    assert asyncio.run(main()).batches == 2
+
+
+def test_encode_failure_reaches_every_caller():
+    def failing(texts):
+        raise RuntimeError("model unavailable")
+
+    async def main():
+        batcher = EmbeddingBatcher(failing, run, window_ms=1)
+        return await asyncio.gather(batcher.embed("a"), batcher.embed("b"), return_exceptions=True)
+
+    assert all(isinstance(r, RuntimeError) for r in asyncio.run(main()))
+
+
+def test_running_batches_are_held_until_done():
+    async def slow_run(fn, *args):
+        gc.collect()  # a batch task nothing refers to would be collected here
+        await asyncio.sleep(0.01)
+        return fn(*args)
+
+    async def main():
+        batcher = EmbeddingBatcher(encode, slow_run, window_ms=1)
+        pending = asyncio.ensure_future(batcher.embed("a"))
+        await asyncio.sleep(0.005)
+        held = len(batcher._tasks)
+        row = await asyncio.wait_for(pending, 1)
+        return held, row, len(batcher._tasks)
+
+    held, row, after = asyncio.run(main())
+    assert held == 1 and row == [1.0] and after == 0
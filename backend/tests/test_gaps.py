@@ -0,0 +1,85 @@
+import re
+
+import pytest
+
+import gaps
+
+
+def legacy_detect(text: str) -> bool:
+    # The detector gaps.needs_clarification replaced, verbatim
+    patterns = [
+        r"\[[^\]]+\]",  # [placeholder]
+        r"Invoice\s*#\s*\[", r"\b[0-9]{4}-[0-9]{2}-[0-9]{2}\b",  # date formats OK, but still run clarifier optionally
+        r"\bamount\b.*\b\[", r"\bdue date\b.*\b\[", r"\bcontract\b.*\bdate\b.*\b\[",
+        r"\bproperty address\b.*\b\[", r"\btrademark\b.*\b\[", r"\bregistration\b.*\b\[",
+        r"\bplatform\b.*\b\[", r"\bURL\b.*\b\[", r"\bjurisdiction\b.*\b\[",
+    ]
+    for p in patterns:
+        if re.search(p, text, flags=re.IGNORECASE):
+            return True
+    # Also short or very generic prompts
+    return len(text.strip()) < 80
+
+
+LONG = (
+    "My client supplied web design and hosting services to the recipient under a services agreement. "
+    "Invoice no. INV-2024-117 for Rs. 1,45,000 was raised on 12 March 2025 and remains unpaid despite reminders. "
+)
+
+PROMPTS = [
+    "",
+    "   ",
+    "Send a legal notice",
+    "Unpaid invoice [invoice number] for web design work",
+    LONG,
+    LONG + "It was due on 2025-04-11.",
+    LONG + "The contract date is [contract date].",
+    LONG + "The jurisdiction is [city] and the amount is [amount].",
+    LONG + "Invoice # [number] is still pending.",
+    LONG + "The amount is [ and nothing else",
+    LONG + "Empty brackets [] do not count.",
+    LONG + "Nested [[brackets]] and a stray ] here.",
+    LONG + "The trademark registration no. is pending, see [registration no].",
+    LONG + "The platform URL is https://example.com/shop",
+    LONG + "PLATFORM listing at [url]",
+    LONG * 40,
+    LONG * 40 + "Property address: [address]",
+]
+
+
+@pytest.mark.parametrize("prompt", PROMPTS)
+def test_needs_clarification_matches_legacy_detector(prompt):
+    assert gaps.needs_clarification(prompt) == legacy_detect(prompt)
+
+
+@pytest.mark.parametrize("prompt", PROMPTS)
+def test_scan_reports_the_same_trigger(prompt):
+    assert gaps.scan(prompt)["needs_clarification"] == legacy_detect(prompt)
+
+
+def test_scan_extracts_filled_facts():
+    result = gaps.scan(LONG + "Payment was due on 11 April 2025.")
+    assert result["placeholders"] == []
+    filled = gaps.filled(result)
+    assert filled["amount_due"].startswith("INR 1,45,000")
+    assert filled["invoice_number"] == "INV-2024-117"
+
+
+def test_scan_finds_placeholders_with_spans():
+    prompt = LONG + "The amount is [amount] and the due date is [due date]."
+    result = gaps.scan(prompt)
+    texts = [p["text"] for p in result["placeholders"]]
+    assert texts == ["[amount]", "[due date]"]
+    for p in result["placeholders"]:
+        start, end = p["span"]
+        assert prompt[start:end] == p["text"]
+
+
+def test_placeholder_needs_closing_bracket():
+    assert gaps.scan(LONG + "The amount is [amount and more text")["placeholders"] == []
+
+
+def test_scan_reuses_a_known_trigger_result():
+    prompt = "Tenant owes rent. Amount: [amount]."
+    assert gaps.scan(prompt, needs=True) == gaps.scan(prompt)
+    assert gaps.scan(prompt, needs=False)["needs_clarification"] is False
@@ -0,0 +1,160 @@
+from pathlib import Path
+
+import pytest
+from pypdf import PdfReader, PdfWriter
+
+import bm25
+import ingestion
+
+BARE_ACT = Path(__file__).resolve().parent.parent / "bare_act.pdf"
+
+
+class FakeCollection:
+    """The slice of the Chroma collection API ingest_pdf uses."""
+
+    def __init__(self):
+        self.rows = {}
+        self.upserts = 0
+
+    def upsert(self, ids, documents, embeddings, metadatas):
+        assert len(ids) == len(documents) == len(embeddings) == len(metadatas)
+        self.upserts += 1
+        for cid, doc, meta in zip(ids, documents, metadatas):
+            self.rows[cid] = (doc, meta)
+
+    def delete(self, ids=None, where=None):
+        for cid in list(ids or []):
+            self.rows.pop(cid, None)
+        if where:
+            for cid, (_, meta) in list(self.rows.items()):
+                if all(meta.get(k) == v for k, v in where.items()):
+                    del self.rows[cid]
+
+    def count(self):
+        return len(self.rows)
+
+
+def encode(texts, batch_size):
+    return [[float(len(t)), 1.0] for t in texts]
+
+
+def pdf_pages(tmp_path, name, pages):
+    writer = PdfWriter()
+    reader = PdfReader(str(BARE_ACT))
+    for i in pages:
+        writer.add_page(reader.pages[i])
+    path = tmp_path / name
+    with open(path, "wb") as f:
+        writer.write(f)
+    return path
+
+
+@pytest.fixture
+def store(tmp_path):
+    return FakeCollection(), ingestion.IngestManifest(tmp_path / "manifest.json"), bm25.BM25Index()
+
+
+def ingest(path, store, **kw):
+    collection, manifest, lexical = store
+    return ingestion.ingest_pdf(path, collection, encode, manifest, lexical=lexical, workers=1, add_batch_size=8, **kw)
+
+
+def manifest_ids(manifest, source):
+    return set(ingestion.indexed_ids(manifest.get(source)).values())
+
+
+def test_first_ingest_indexes_every_chunk(tmp_path, store):
+    collection, manifest, lexical = store
+    path = pdf_pages(tmp_path, "act.pdf", range(10, 14))
+    result = ingest(path, store, source_label="Constitution")
+    assert not result["skipped"] and result["pages"] == 4
+    assert result["chunks"] == collection.count() == len(lexical) > 0
+    assert set(collection.rows) == manifest_ids(manifest, str(path))
+    assert {meta["source_label"] for _, meta in collection.rows.values()} == {"Constitution"}
+
+
+def test_unchanged_file_is_skipped(tmp_path, store):
+    collection, manifest, _ = store
+    path = pdf_pages(tmp_path, "act.pdf", range(10, 14))
+    ingest(path, store)
+    upserts = collection.upserts
+    again = ingest(path, store)
+    assert again["skipped"] and again["indexed_as"] == str(path)
+    # The same bytes under another name are not indexed twice either
+    copy = tmp_path / "copy.pdf"
+    copy.write_bytes(path.read_bytes())
+    assert ingest(copy, store)["indexed_as"] == str(path)
+    assert collection.upserts == upserts
+
+
+def test_changed_file_only_rewrites_changed_chunks(tmp_path, store):
+    collection, manifest, lexical = store
+    path = pdf_pages(tmp_path, "act.pdf", range(10, 14))
+    ingest(path, store)
+    before = set(collection.rows)
+    path = pdf_pages(tmp_path, "act.pdf", range(10, 16))  # two pages appended
+    result = ingest(path, store)
+    assert result["chunks_unchanged"] > 0
+    assert result["chunks"] > 0
+    assert set(collection.rows) == manifest_ids(manifest, str(path))
+    assert len(lexical) == collection.count()
+    assert result["chunks_deleted"] == len(before - set(collection.rows))
+
+
+def test_explicit_source_key(tmp_path, store):
+    collection, manifest, _ = store
+    path = pdf_pages(tmp_path, "upload.pdf", range(10, 12))
+    ingest(path, store, source="uploads/act.pdf")
+    assert manifest.get("uploads/act.pdf") is not None and manifest.get(str(path)) is None
+    assert {meta["source"] for _, meta in collection.rows.values()} == {"uploads/act.pdf"}
+
+
+def test_failed_ingest_of_changed_file_leaves_previous_version(tmp_path, store):
+    collection, manifest, lexical = store
+    path = pdf_pages(tmp_path, "act.pdf", range(10, 14))
+    ingest(path, store)
+    rows, entry, indexed = dict(collection.rows), manifest.get(str(path)), len(lexical)
+
+    calls = []
+
+    def failing_encode(texts, batch_size):
+        calls.append(len(texts))
+        if len(calls) > 1:
+            raise RuntimeError("embedder crashed")
+        return encode(texts, batch_size)
+
+    changed = pdf_pages(tmp_path, "act.pdf", range(20, 30))
+    with pytest.raises(RuntimeError, match="embedder crashed"):
+        ingestion.ingest_pdf(changed, collection, failing_encode, manifest, lexical=lexical, workers=1, add_batch_size=8)
+    assert len(calls) > 1  # at least one batch was written before the failure
+    assert collection.rows == rows
+    assert manifest.get(str(path)) == entry
+    assert len(lexical) == indexed
+
+
+def test_remove_source(tmp_path, store):
+    collection, manifest, lexical = store
+    path = pdf_pages(tmp_path, "act.pdf", range(10, 12))
+    ingest(path, store)
+    removed = ingestion.remove_source(str(path), collection, manifest, lexical=lexical)
+    assert removed > 0
+    assert collection.count() == 0 and len(lexical) == 0 and manifest.get(str(path)) is None
+
+
+def test_manifest_picks_up_another_processes_save(tmp_path):
+    writer = ingestion.IngestManifest(tmp_path / "manifest.json")
+    reader = ingestion.IngestManifest(tmp_path / "manifest.json")
+    writer.put("a.pdf", {"file_hash": "abc", "chunks": {"h1": "abc-000000"}})
+    assert reader.get("a.pdf") is None and reader.stale()
+    assert reader.refresh() and not reader.refresh()
+    assert reader.find_hash("abc") == "a.pdf"
+
+
+def test_file_lock_excludes_other_holders(tmp_path):
+    lock = tmp_path / "ingest.lock"
+    with ingestion.file_lock(lock) as held:
+        assert held
+        with ingestion.file_lock(lock, blocking=False) as other:
+            assert not other
+    with ingestion.file_lock(lock, blocking=False) as other:
+        assert other
@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+import json_repair
+from json_repair import MalformedJSON, ObjectScanner, loads_object, repair
+
+
+def test_valid_object_is_not_repaired():
+    assert loads_object('{"stage": "ask", "questions": []}') == ({"stage": "ask", "questions": []}, False)
+
+
+def test_code_fence_and_commentary_are_ignored():
+    text = 'Here is the JSON:\n```json\n{"stage": "draft", "notice": "Dear Sir"}\n```\nLet me know if you need changes.'
+    assert loads_object(text) == ({"stage": "draft", "notice": "Dear Sir"}, False)
+
+
+def test_trailing_commas():
+    data, repaired = loads_object('{"stage": "ask", "questions": [{"id": "a"}, {"id": "b"},], "missing_fields": ["a",],}')
+    assert repaired
+    assert data == {"stage": "ask", "questions": [{"id": "a"}, {"id": "b"}], "missing_fields": ["a"]}
+
+
+def test_raw_newlines_and_tabs_inside_strings():
+    data, repaired = loads_object('{"notice": "Date: today\nFrom:\tA\r\nTo: B"}')
+    assert repaired
+    assert data["notice"] == "Date: today\nFrom:\tA\r\nTo: B"
+
+
+def test_unescaped_quotes_inside_strings():
+    data, repaired = loads_object('{"stage": "draft", "notice": "The cheque was returned "Funds Insufficient" on 2 May.", "used_answers": {}}')
+    assert repaired
+    assert data == {"stage": "draft", "notice": 'The cheque was returned "Funds Insufficient" on 2 May.', "used_answers": {}}
+
+
+def test_quote_followed_by_comma_inside_a_string():
+    # '"Sir", pay' is prose, not the end of the string: what follows the comma isn't a key
+    data, _ = loads_object('{"notice": "Dear "Sir", pay within 15 days.", "stage": "draft"}')
+    assert data == {"notice": 'Dear "Sir", pay within 15 days.', "stage": "draft"}
+
+
+def test_invalid_escapes_are_kept_literally():
+    data, repaired = loads_object(r'{"ref": "Sec. 138 \ NI Act", "pattern": "\d+"}')
+    assert repaired
+    assert data == {"ref": r"Sec. 138 \ NI Act", "pattern": r"\d+"}
+
+
+def test_repair_leaves_valid_json_unchanged():
+    text = json.dumps({"a": ["x, y", {"b": "c\"d"}], "e": 1})
+    assert repair(text) == text
+
+
+def test_no_object_raises():
+    with pytest.raises(MalformedJSON):
+        loads_object("I could not draft the notice.")
+
+
+def test_unreadable_object_raises():
+    with pytest.raises(MalformedJSON):
+        loads_object('{"stage": ask}')
+
+
+def test_scanner_finds_object_across_fed_pieces():
+    scanner = ObjectScanner()
+    pieces = ['Sure! {"stage": "dr', 'aft", "notice": "a } in', ' text"}', " trailing words"]
+    done = [scanner.feed(p) for p in pieces]
+    assert done == [False, False, True, True]
+    assert json_repair.parse_scanned(scanner) == ({"stage": "draft", "notice": "a } in text"}, False)
@@ -0,0 +1,152 @@
+import asyncio
+import contextlib
+
+import httpx
+from groq import APIConnectionError
+
+from llm_gateway import LLMGateway, TaskRouter
+
+ROUTES = {
+    "draft": {"model": "big", "max_tokens": 4096, "timeout": 60.0, "concurrency": 4},
+    "clarify": {"model": "small", "max_tokens": 700, "timeout": 20.0, "concurrency": 4},
+}
+
+
+def router(**kw):
+    return TaskRouter(ROUTES, fallbacks=["small", "backup"], **{"min_samples": 10, "floor": 256, "headroom": 1.25, **kw})
+
+
+def test_model_list_is_route_then_fallbacks_without_duplicates():
+    r = router()
+    assert r.models("draft") == ["big", "small", "backup"]
+    assert r.models("clarify") == ["small", "backup"]
+
+
+def test_no_cap_until_min_samples():
+    r = router()
+    for _ in range(9):
+        r.observe("draft", 800, "stop", 4096, 4096)
+    assert r.learned_cap("draft") is None
+    assert r.max_tokens("draft", 2048) == 2048
+
+
+def test_cap_is_p99_times_headroom():
+    r = router()
+    for n in range(1, 101):
+        r.observe("draft", n * 10, "stop", 4096, 4096)
+    # p99 of 10..1000 by index int(0.99 * 99) = 98 -> 990 tokens, * 1.25
+    assert r.learned_cap("draft") == 1238
+    assert r.max_tokens("draft") == 1238
+    assert r.max_tokens("draft", 1000) == 1000  # never above what the caller asked for
+    assert r.max_tokens("clarify") == 700  # learned per task
+
+
+def test_cap_never_below_floor():
+    r = router()
+    for _ in range(10):
+        r.observe("draft", 20, "stop", 4096, 4096)
+    assert r.learned_cap("draft") == 256
+
+
+def test_limit_is_clamped_to_route_ceiling():
+    r = router()
+    assert r.limit("clarify", 2000) == 700
+    assert r.limit("clarify") == 700
+    assert r.limit("draft", 1024) == 1024
+
+
+def test_truncation_by_learned_cap_raises_it():
+    r = router()
+    for _ in range(10):
+        r.observe("draft", 400, "stop", 4096, 4096)
+    sent = r.max_tokens("draft", 4096)
+    assert sent == 500
+    # Cut off by the cap, not the caller: reported, and recorded at the full requested length
+    assert r.observe("draft", sent, "length", sent, 4096) is True
+    assert r.stats()["draft"]["truncated"] == 1
+    # p99 by index leaves out the single longest sample of a small window; a second cut-off lifts the cap
+    assert r.learned_cap("draft") == 500
+    assert r.observe("draft", sent, "length", sent, 4096) is True
+    assert r.learned_cap("draft") == 5120
+    assert r.max_tokens("draft", 4096) == 4096
+
+
+def test_truncation_at_callers_limit_is_not_the_caps_fault():
+    r = router()
+    assert r.observe("draft", 1024, "length", 1024, 1024) is False
+    assert r.stats()["draft"]["truncated"] == 0
+
+
+def test_adaptive_off_never_caps():
+    r = router(adaptive=False)
+    for _ in range(50):
+        r.observe("draft", 100, "stop", 4096, 4096)
+    assert r.learned_cap("draft") is None
+    assert r.max_tokens("draft") == 4096
+
+
+class _Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class _FakeStream:
+    def __init__(self, parts, fail_first=False):
+        self.parts = parts
+        self.fail_first = fail_first
+        self.closed = False
+
+    def __aiter__(self):
+        return self._gen()
+
+    async def _gen(self):
+        if self.fail_first:
+            raise APIConnectionError(request=httpx.Request("POST", "http://llm"))
+        for p in self.parts:
+            yield _Chunk(p)
+
+    async def close(self):
+        self.closed = True
+
+
+def _gateway(streams):
+    gw = LLMGateway("test-key", models=["m1"], backoff_base=0, backoff_max=0)
+    opened = []
+
+    async def create(**kw):
+        opened.append(streams.pop(0))
+        return opened[-1]
+
+    gw.client.chat.completions.create = create
+    return gw, opened
+
+
+def _collect(gw, stop_after=None):
+    async def run():
+        got = []
+        async with contextlib.aclosing(gw.stream([{"role": "user", "content": "hi"}], max_tokens=10)) as chunks:
+            async for chunk in chunks:
+                got.append(chunk.text)
+                if stop_after and len(got) >= stop_after:
+                    break
+        await gw.aclose()
+        return got
+    return asyncio.run(run())
+
+
+def test_stream_is_closed_after_full_read():
+    gw, opened = _gateway([_FakeStream(["a", "b"])])
+    assert _collect(gw) == ["a", "b"]
+    assert opened[0].closed
+
+
+def test_stream_is_closed_when_consumer_stops_early():
+    gw, opened = _gateway([_FakeStream(["a", "b", "c"])])
+    assert _collect(gw, stop_after=1) == ["a"]
+    assert opened[0].closed
+
+
+def test_failed_attempt_is_closed_before_retry():
+    gw, opened = _gateway([_FakeStream([], fail_first=True), _FakeStream(["ok"])])
+    assert _collect(gw) == ["ok"]
+    assert [s.closed for s in opened] == [True, True]
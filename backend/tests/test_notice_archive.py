@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from notice_archive import NoticeArchive
+
+
+def _record(prompt, notice, **extra):
+    return {"endpoint": "generate-notice", "prompt": prompt, "notice": notice, **extra}
+
+
+@pytest.fixture
+def archive(tmp_path):
+    a = NoticeArchive(str(tmp_path / "notices.sqlite3"))
+    a.add(_record("Overdue invoice INV-7 for web design", "Pay INR 45,000 within 15 days", matter_type="overdue_invoice",
+                  recipient="Bharat Traders", metadata={"template": "overdue_invoice"}, context_ids=["c1", "c2"]),
+          embedding=[1.0, 0.0, 0.0])
+    a.add(_record("Tenant has not paid rent for three months", "Vacate the premises", matter_type="rent_default"),
+          embedding=[0.0, 1.0, 0.0])
+    a.add(_record("Cheque returned unpaid by the bank", "Pay the cheque amount", matter_type="cheque_bounce"),
+          embedding=[0.6, 0.8, 0.0])
+    return a
+
+
+def test_add_uses_given_id_and_round_trips_json_columns(archive):
+    notice_id = archive.add(_record("Trademark misuse", "Cease and desist", id="fixed-id", clarifications={"mark": "ACME"}))
+    assert notice_id == "fixed-id"
+    stored = archive.get("fixed-id")
+    assert stored["clarifications"] == {"mark": "ACME"}
+    assert stored["metadata"] == {} and stored["context_ids"] == []
+
+
+def test_keyword_search(archive):
+    results = archive.search("invoice bharat")
+    assert [r["matter_type"] for r in results] == ["overdue_invoice"]
+    assert results[0]["context_ids"] == ["c1", "c2"]
+    assert results[0]["metadata"] == {"template": "overdue_invoice"}
+    assert archive.search("premises", matter_type="overdue_invoice") == []
+    # FTS5 syntax in user input is matched as plain words
+    assert archive.search('"AND OR NEAR( *') == []
+    assert archive.search("") == []
+
+
+def test_similar_ranks_by_cosine(archive):
+    results = archive.similar([0.9, 0.1, 0.0], k=2)
+    assert [r["matter_type"] for r in results] == ["overdue_invoice", "cheque_bounce"]
+    assert results[0]["similarity"] == pytest.approx(0.9 / np.hypot(0.9, 0.1), abs=1e-4)
+    assert [r["matter_type"] for r in archive.similar([0.9, 0.1, 0.0], matter_type="rent_default")] == ["rent_default"]
+    assert archive.similar([0.0, 0.0, 1.0], min_score=0.5) == []
+
+
+def test_delete_removes_from_search_and_similarity(archive):
+    archive.similar([1.0, 0.0, 0.0])  # load the similarity index first
+    target = archive.search("invoice")[0]["id"]
+    assert archive.delete(target)
+    assert archive.get(target) is None
+    assert archive.search("invoice") == []
+    assert target not in [r["id"] for r in archive.similar([1.0, 0.0, 0.0], k=5)]
+    assert not archive.delete(target)
+
+
+def test_notices_added_after_loading_are_searchable_by_similarity(archive):
+    archive.similar([1.0, 0.0, 0.0])
+    archive.add(_record("New matter", "Notice"), embedding=[0.0, 0.0, 1.0])
+    assert archive.similar([0.0, 0.0, 1.0], k=1)[0]["prompt"] == "New matter"
+
+
+def test_reopened_archive_sees_stored_notices(archive):
+    reopened = NoticeArchive(archive.path)
+    stats = reopened.stats()
+    assert stats["notices"] == 3
+    assert stats["by_endpoint"] == {"generate-notice": 3}
+    assert reopened.similar([0.0, 1.0, 0.0], k=1)[0]["matter_type"] == "rent_default"
@@ -0,0 +1,73 @@
+from datetime import date
+
+import pytest
+
+import notice_templates as nt
+
+# The 12 section headings the LLM is asked for, in order
+SECTIONS = [
+    "Date:", "From:", "To:", "Subject:", "Background / Facts:", "Legal Basis:", "Demands / Relief Sought:",
+    "Response Timeline:", "Consequences of Non-Compliance:", "Disclaimer:", "Signature:", "Jurisdiction:",
+]
+INVOICE = {"invoice_number": "INV-7", "amount_due": "INR 45,000", "original_due": "2026-03-31", "goods_services": "web design"}
+DETAILS = {"senderName": "Asha Rao", "recipientName": "Acme Pvt Ltd", "jurisdiction": "Pune"}
+
+
+def headings(notice):
+    return [line.split(":")[0] + ":" for line in notice.splitlines() if line.split(":")[0] + ":" in SECTIONS]
+
+
+@pytest.mark.parametrize("matter", list(nt.MATTERS))
+def test_every_matter_renders_all_sections(matter):
+    facts = {f["id"]: f"<{f['id']}>" for f in nt.MATTERS[matter]["fields"]}
+    notice = nt.render(matter, facts, DETAILS, "18 October 2026")
+    assert headings(notice) == SECTIONS
+    assert "{" not in notice  # every placeholder was filled
+
+
+def test_render_uses_facts_and_details():
+    notice = nt.render("overdue_invoice", {**INVOICE, "interest_rate": "18"}, DETAILS, "18 October 2026")
+    assert "Subject: Legal Notice for Recovery of Outstanding Dues under Invoice No. INV-7" in notice
+    assert "together with interest at 18% per annum from 2026-03-31" in notice
+    assert notice.startswith("Date: 18 October 2026\n\nFrom:\nAsha Rao")
+    assert notice.endswith("Jurisdiction:\nPune")
+
+
+def test_free_text_sections_replace_the_stock_text():
+    notice = nt.render("overdue_invoice", INVOICE, DETAILS, "today", background="Custom facts.", legal_basis="- Custom basis")
+    assert "Background / Facts:\nCustom facts.\n" in notice and "Legal Basis:\n- Custom basis\n" in notice
+    assert "Section 73" not in notice
+
+
+def test_normalize_facts_maps_aliases_and_drops_blanks():
+    facts = nt.normalize_facts({"Cheque No": "001234", "bank": "SBI", "Reason": " ", "amount_due": None})
+    assert facts == {"cheque_number": "001234", "bank_name": "SBI"}
+
+
+def test_missing_fields_and_questions():
+    assert nt.missing_fields("overdue_invoice", INVOICE) == []
+    missing = nt.missing_fields("overdue_invoice", {"invoice_number": "INV-7"})
+    assert [f["id"] for f in missing] == ["amount_due", "original_due", "goods_services"]
+    # Questions also cover the optional fields still unanswered
+    assert [f["id"] for f in nt.questions_for("overdue_invoice", INVOICE)] == ["invoice_date", "interest_rate"]
+
+
+@pytest.mark.parametrize("dishonoured, expected", [
+    ("2026-10-01", None),
+    ("1st October 2026", None),
+    ("2026-08-01", "dishonoured 78 days ago"),
+    ("2026-11-01", "in the future"),
+    ("soon after", "Could not read the dishonour date"),
+])
+def test_cheque_bounce_warnings(dishonoured, expected):
+    found = nt.warnings("cheque_bounce", {"dishonour_date": dishonoured}, date(2026, 10, 18))
+    if expected is None:
+        assert found == []
+    else:
+        assert len(found) == 1 and expected in found[0]
+
+
+def test_parse_free_text():
+    reply = "1. Background / Facts:\nMy client supplied goods.\n\n2. Legal Basis:\n- Contract Act — Section 73\n"
+    assert nt.parse_free_text(reply) == ("My client supplied goods.", "- Contract Act — Section 73")
+    assert nt.parse_free_text("Just some prose.") == (None, None)
@@ -0,0 +1,46 @@
+import time
+
+from sessions import SessionStore
+
+
+def _state():
+    return {"session_id": "s1", "prompt": "overdue invoice", "answers": {"invoice_number": "INV-1"}, "messages": [], "turns": 0}
+
+
+def test_memory_round_trip():
+    store = SessionStore(maxsize=10, ttl=60)
+    store.put("s1", _state())
+    assert store.backend == "memory"
+    assert store.get("s1")["answers"] == {"invoice_number": "INV-1"}
+    assert store.delete("s1")
+    assert store.get("s1") is None
+    assert not store.delete("s1")
+
+
+def test_sqlite_round_trip_survives_a_new_store(tmp_path):
+    path = str(tmp_path / "sessions.sqlite3")
+    first = SessionStore(maxsize=10, ttl=60, path=path)
+    first.put("s1", _state())
+    # A restart, or another worker on the same host, reads it from disk
+    second = SessionStore(maxsize=10, ttl=60, path=path)
+    state = second.get("s1")
+    assert state["answers"] == {"invoice_number": "INV-1"}
+    assert state["updated_at"] <= time.time()
+    assert second.stats()["stored"] == 1
+    assert second.delete("s1")
+    assert SessionStore(maxsize=10, ttl=60, path=path).get("s1") is None
+
+
+def test_sqlite_sessions_expire(tmp_path):
+    path = str(tmp_path / "sessions.sqlite3")
+    SessionStore(maxsize=10, ttl=-1, path=path).put("s1", _state())
+    assert SessionStore(maxsize=10, ttl=60, path=path).get("s1") is None
+
+
+def test_sqlite_connection_opens_on_first_use(tmp_path):
+    path = tmp_path / "sessions.sqlite3"
+    store = SessionStore(maxsize=10, ttl=60, path=str(path))
+    assert store.backend == "sqlite"
+    assert not path.exists()
+    store.put("s1", _state())
+    assert path.exists()